@@ -8,6 +8,12 @@ import os
 if os.path.exists(".env"):
     load_environment()
 
+# Warm up the self-hosted model at app start so the first request doesn't pay for a cold load
+from classes.ai_engines.ollama_client import ollama_model_manager
+from classes.ai_engines.circuit_breaker import circuit_breakers
+if os.getenv("OLLAMA_URL") or os.getenv("OLLAMA_MODEL"):
+    ollama_model_manager.start()
+
 db_path = "/workspaces/ACPN2025/classes/db/pies.db"
 
 if not os.path.exists(db_path):
@@ -87,3 +93,25 @@ Feel free to reach out to either Ryan with any questions!
 [Ryan Henderson](https://www.linkedin.com/in/ryan-andrew-henderson/)
          
 We've open sourced this project on GitHub. [You can find the code here.](https://github.com/ryexdev/ACPN2025)""")
+
+# Backend health, shared by every session through the circuit breakers
+status_classes = {"closed": "status-operational", "half_open": "status-issue", "open": "status-error"}
+status_labels = {"closed": "Operational", "half_open": "Recovering", "open": "Unavailable"}
+backends = {"openai": "OpenAI"}
+if os.getenv("OLLAMA_URL") or os.getenv("OLLAMA_MODEL"):
+    backends["ollama"] = "Ollama"
+status_html = ""
+for backend, label in backends.items():
+    status = circuit_breakers.get(backend).status()
+    status_html += f'<span class="status-indicator {status_classes[status["state"]]}"></span>{label}: {status_labels[status["state"]]}&nbsp;&nbsp;'
+st.markdown(f'<div class="status-container">{status_html}</div>', unsafe_allow_html=True)
+
+# Where time and money went, from the per-call telemetry in generation_logs
+try:
+    from classes.db import db
+    usage_summary = db.get_generation_log_summary(hours=24)
+except Exception:
+    usage_summary = []
+if usage_summary:
+    with st.expander("LLM Usage (last 24 hours)"):
+        st.dataframe(usage_summary, hide_index=True, use_container_width=True)
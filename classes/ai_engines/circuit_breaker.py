@@ -0,0 +1,179 @@
+import os
+import time
+import logging
+import threading
+
+import requests
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("circuit_breaker")
+
+class Circuit_Open_Error(requests.exceptions.RequestException):
+    """Raised instead of sending a request to a backend whose circuit is open"""
+
+class Circuit_Breaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, probe=None):
+        """
+        Track the health of one backend and fail fast while it is down
+
+        Args:
+            name (str): Backend name
+            failure_threshold (int): Consecutive failures that open the circuit
+            recovery_timeout (float): Seconds to wait before probing an open circuit
+            probe (callable, optional): Returns True if the backend looks healthy again
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.probe = probe
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self._trial_in_flight = False
+        self._prober = None
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        """
+        Decide whether a request may go to the backend
+
+        An open circuit lets one trial request through once the recovery
+        timeout has passed (half-open); everything else fails fast.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def check(self):
+        """Raise Circuit_Open_Error if a request may not be sent"""
+        if not self.allow_request():
+            raise Circuit_Open_Error(
+                f"{self.name} is unavailable (circuit open after {self.failures} failures: {self.last_error}). "
+                f"Retrying in {self.retry_in():.0f}s."
+            )
+
+    def record_success(self):
+        """Close the circuit after a successful request"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed, backend recovered")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.last_error = None
+            self._trial_in_flight = False
+
+    def record_failure(self, error=None):
+        """Count a failed request and open the circuit once the threshold is reached"""
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error else None
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit for {self.name} opened after {self.failures} failures: {error}")
+                self.state = self.OPEN
+                self.opened_at = time.time()
+                self._start_prober()
+
+    def end_trial(self, error=None):
+        """
+        Settle a half-open trial that ended without an answer from the backend
+
+        A request can fail for reasons other than the transport (an error while
+        encoding it, an interrupted caller). Left unsettled, the trial would
+        stay in flight and the circuit would never let another request through,
+        so the trial counts as failed and the circuit opens again.
+        """
+        with self._lock:
+            unsettled = self.state == self.HALF_OPEN and self._trial_in_flight
+        if unsettled:
+            self.record_failure(error)
+
+    def _start_prober(self):
+        """Probe the backend in the background until it recovers (called with the lock held)"""
+        if self.probe is None or (self._prober and self._prober.is_alive()):
+            return
+        self._prober = threading.Thread(target=self._probe_until_recovered, daemon=True, name=f"{self.name}_probe")
+        self._prober.start()
+
+    def _probe_until_recovered(self):
+        """Background loop that closes the circuit as soon as a probe succeeds"""
+        while True:
+            time.sleep(self.recovery_timeout)
+            with self._lock:
+                if self.state == self.CLOSED:
+                    return
+            try:
+                healthy = self.probe()
+            except Exception as e:
+                logger.info(f"Probe for {self.name} failed: {e}")
+                healthy = False
+            if healthy:
+                self.record_success()
+                return
+            with self._lock:
+                self.opened_at = time.time()
+
+    def retry_in(self):
+        """Seconds until an open circuit lets a trial request through"""
+        if self.state != self.OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.recovery_timeout - (time.time() - self.opened_at))
+
+    def status(self):
+        """Return the state of the circuit for display"""
+        with self._lock:
+            state = self.state
+        return {
+            "name": self.name,
+            "state": state,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "retry_in": self.retry_in()
+        }
+
+class Circuit_Breaker_Registry:
+    def __init__(self):
+        """Process-wide circuit breakers, one per backend, shared by every session"""
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, backend):
+        """Return the breaker for a backend, configured from {BACKEND}_BREAKER_THRESHOLD / {BACKEND}_BREAKER_TIMEOUT"""
+        with self._lock:
+            breaker = self._breakers.get(backend)
+            if breaker is None:
+                breaker = Circuit_Breaker(
+                    backend,
+                    failure_threshold=int(os.getenv(f"{backend.upper()}_BREAKER_THRESHOLD", "5")),
+                    recovery_timeout=float(os.getenv(f"{backend.upper()}_BREAKER_TIMEOUT", "30"))
+                )
+                self._breakers[backend] = breaker
+            return breaker
+
+    def set_probe(self, backend, probe):
+        """Register the health probe used to detect that a backend has recovered"""
+        self.get(backend).probe = probe
+
+    def statuses(self):
+        """Return the status of every known breaker"""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return [breaker.status() for breaker in breakers]
+
+circuit_breakers = Circuit_Breaker_Registry()
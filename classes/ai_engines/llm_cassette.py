@@ -0,0 +1,316 @@
+import os
+import json
+import gzip
+import time
+import hashlib
+import logging
+import datetime
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from classes.db.database import DB_DIR
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("llm_cassette")
+
+# Only the response headers the transport acts on are kept, everything else is noise in a cassette
+KEPT_HEADERS = ("content-type", "retry-after")
+KEPT_HEADER_PREFIXES = ("x-ratelimit-",)
+
+class Cassette_Miss_Error(requests.exceptions.RequestException):
+    """Raised in replay mode for a request the cassette has no recording of"""
+
+class Recording_Body:
+    def __init__(self, raw, on_done):
+        """Wrap a streamed response body and note when each chunk arrived"""
+        self._raw = raw
+        self._on_done = on_done
+        self._start = time.perf_counter()
+        self.chunks = []
+        self._done = False
+
+    def read(self, amt=None, *args, **kwargs):
+        # Recorded decompressed, the replayed response carries no content-encoding
+        kwargs.setdefault("decode_content", True)
+        data = self._raw.read(amt, *args, **kwargs)
+        if data:
+            self.chunks.append([round(time.perf_counter() - self._start, 4), data.decode("latin-1")])
+        else:
+            self._finish(truncated=False)
+        return data
+
+    def close(self):
+        # Closed before the end of the body, e.g. a cancelled stream
+        self._finish(truncated=True)
+        self._raw.close()
+
+    def _finish(self, truncated):
+        if not self._done:
+            self._done = True
+            self._on_done(self.chunks, truncated)
+
+    def __getattr__(self, name):
+        # Without a stream() method requests falls back to read(), which is what gets recorded
+        if name == "stream":
+            raise AttributeError(name)
+        return getattr(self._raw, name)
+
+class Replay_Body:
+    def __init__(self, chunks, scale):
+        """A response body that hands out recorded chunks at their recorded offsets"""
+        self._chunks = list(chunks)
+        self._scale = scale
+        self._start = time.perf_counter()
+        self._buffer = b""
+
+    def read(self, amt=None, *args, **kwargs):
+        if not self._buffer and self._chunks:
+            offset, data = self._chunks.pop(0)
+            delay = offset * self._scale - (time.perf_counter() - self._start)
+            if delay > 0:
+                time.sleep(delay)
+            self._buffer = data.encode("latin-1")
+        if amt is None:
+            data, self._buffer = self._buffer + b"".join(chunk[1].encode("latin-1") for chunk in self._chunks), b""
+            self._chunks = []
+            return data
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def close(self):
+        self._chunks = []
+        self._buffer = b""
+
+class LLM_Cassette:
+    def __init__(self):
+        """Initialize LLM traffic recording and replay"""
+        # "off", "record" or "replay"
+        self.MODE = os.getenv("LLM_CASSETTE_MODE", "off").lower()
+        self.PATH = os.getenv("LLM_CASSETTE_PATH", os.path.join(DB_DIR, "cassettes", "llm.jsonl.gz"))
+        # "original" replays the recorded timing, "compressed" divides it by LLM_CASSETTE_SPEEDUP, "none" answers at once
+        self.TIMING = os.getenv("LLM_CASSETTE_TIMING", "original").lower()
+        self.SPEEDUP = float(os.getenv("LLM_CASSETTE_SPEEDUP", "10"))
+
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._entries = None
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.MODE in ("record", "replay")
+
+    @property
+    def scale(self):
+        """Factor applied to recorded delays"""
+        if self.TIMING == "none":
+            return 0.0
+        if self.TIMING == "compressed":
+            return 1.0 / self.SPEEDUP if self.SPEEDUP > 0 else 0.0
+        return 1.0
+
+    @staticmethod
+    def make_key(method, url, body=None):
+        """
+        Identify a request by its method, path and body
+
+        The host is left out so a cassette recorded against one Ollama server
+        replays against another, and the API key is never part of the key.
+        """
+        if isinstance(body, (bytes, str)) and body:
+            try:
+                body = json.loads(body)
+            except ValueError:
+                body = body.decode("latin-1") if isinstance(body, bytes) else body
+        canonical = json.dumps([method.upper(), urlparse(url).path, body or None], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _kept_headers(headers):
+        return {
+            name.lower(): value for name, value in headers.items()
+            if name.lower() in KEPT_HEADERS or name.lower().startswith(KEPT_HEADER_PREFIXES)
+        }
+
+    # --- Recording ------------------------------------------------------------
+
+    def _write(self, entry):
+        """Append one interaction to the cassette file"""
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.PATH), exist_ok=True)
+            # Every append becomes its own gzip member, which gzip reads back as one stream
+            with gzip.open(self.PATH, "at", encoding="utf-8") as f:
+                f.write(line)
+            self.recorded += 1
+
+    def _entry(self, key, method, url, body, status, headers, ttfb):
+        model = body.get("model") if isinstance(body, dict) else None
+        return {
+            "key": key,
+            "method": method.upper(),
+            "path": urlparse(url).path,
+            "model": model,
+            "status": status,
+            "headers": self._kept_headers(headers),
+            "ttfb": round(ttfb, 4),
+            "recorded_at": time.time()
+        }
+
+    # --- Replay ---------------------------------------------------------------
+
+    def _load(self):
+        """Read the cassette into recordings per request key, in recorded order"""
+        if self._entries is None:
+            entries = {}
+            try:
+                with gzip.open(self.PATH, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries.setdefault(entry["key"], []).append(entry)
+            except FileNotFoundError:
+                logger.warning(f"Cassette {self.PATH} does not exist, every request will miss")
+            self._entries = entries
+            logger.info(f"Loaded {sum(len(v) for v in entries.values())} recordings for {len(entries)} requests from {self.PATH}")
+        return self._entries
+
+    def next_entry(self, key):
+        """
+        Return the next recording for a request
+
+        Repeated identical requests get the recordings in the order they were
+        made (e.g. a 429 and then the retried 200); once used up, the last one
+        is repeated.
+        """
+        with self._lock:
+            recordings = self._load().get(key)
+            if not recordings:
+                self.misses += 1
+                return None
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+            self.replayed += 1
+            return recordings[min(position, len(recordings) - 1)]
+
+    def rewind(self):
+        """Replay the cassette from the start again and reread the file"""
+        with self._lock:
+            self._entries = None
+            self._positions = {}
+
+    def stats(self):
+        return {"mode": self.MODE, "path": self.PATH, "timing": self.TIMING, "recorded": self.recorded, "replayed": self.replayed, "misses": self.misses}
+
+    # --- requests -------------------------------------------------------------
+
+    def send(self, session, method, url, **kwargs):
+        """
+        Send a request through a requests session, recording or replaying it
+
+        Args:
+            session (requests.Session): The session used outside replay mode
+            method (str): HTTP method
+            url (str): Full request URL
+            **kwargs: Passed through to requests
+
+        Returns:
+            requests.Response: The live, recorded or replayed response
+
+        Raises:
+            Cassette_Miss_Error: In replay mode, for a request that was never recorded
+        """
+        body = kwargs.get("json", kwargs.get("data"))
+        key = self.make_key(method, url, body)
+
+        if self.MODE == "replay":
+            entry = self.next_entry(key)
+            if entry is None:
+                raise Cassette_Miss_Error(f"No recording for {method.upper()} {urlparse(url).path} in {self.PATH}")
+            return self._replay_response(entry, url)
+
+        start = time.perf_counter()
+        response = session.request(method, url, **kwargs)
+        ttfb = time.perf_counter() - start
+        entry = self._entry(key, method, url, body, response.status_code, response.headers, ttfb)
+
+        if kwargs.get("stream"):
+            def on_done(chunks, truncated):
+                self._write(dict(entry, chunks=chunks, truncated=truncated))
+            response.raw = Recording_Body(response.raw, on_done)
+        else:
+            total = time.perf_counter() - start
+            self._write(dict(entry, chunks=[[round(total - ttfb, 4), response.content.decode("latin-1")]]))
+        return response
+
+    def _replay_response(self, entry, url):
+        """Build a requests.Response from a recording"""
+        scale = self.scale
+        if entry["ttfb"] * scale > 0:
+            time.sleep(entry["ttfb"] * scale)
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = "OK" if entry["status"] < 400 else "Replayed Error"
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = url
+        response.raw = Replay_Body(entry["chunks"], scale)
+        response.elapsed = datetime.timedelta(seconds=entry["ttfb"] * scale)
+        return response
+
+    # --- httpx (OpenAI SDK) -----------------------------------------------------
+
+    def httpx_transport(self, transport):
+        """Wrap an httpx transport so OpenAI SDK calls are recorded and replayed too"""
+        import httpx
+
+        cassette = self
+
+        class Cassette_HTTPX_Transport(httpx.BaseTransport):
+            def handle_request(self, request):
+                if cassette.MODE not in ("record", "replay"):
+                    return transport.handle_request(request)
+                url = str(request.url)
+                content = request.read()
+                key = cassette.make_key(request.method, url, content)
+
+                if cassette.MODE == "replay":
+                    entry = cassette.next_entry(key)
+                    if entry is None:
+                        raise httpx.ConnectError(f"No recording for {request.method} {request.url.path} in {cassette.PATH}", request=request)
+                    scale = cassette.scale
+                    time.sleep((entry["ttfb"] + sum(chunk[0] for chunk in entry["chunks"][-1:])) * scale)
+                    return httpx.Response(
+                        entry["status"],
+                        headers=entry["headers"],
+                        content=b"".join(chunk[1].encode("latin-1") for chunk in entry["chunks"]),
+                        request=request
+                    )
+
+                start = time.perf_counter()
+                response = transport.handle_request(request)
+                ttfb = time.perf_counter() - start
+                data = response.read()
+                total = time.perf_counter() - start
+                try:
+                    body = json.loads(content) if content else None
+                except ValueError:
+                    body = None
+                entry = cassette._entry(key, request.method, url, body, response.status_code, response.headers, ttfb)
+                cassette._write(dict(entry, chunks=[[round(total - ttfb, 4), data.decode("latin-1")]]))
+                # The body was read here, hand the SDK a response it can read again
+                headers = [(name, value) for name, value in response.headers.items() if name.lower() not in ("content-encoding", "transfer-encoding", "content-length")]
+                return httpx.Response(response.status_code, headers=headers, content=data, request=request)
+
+            def close(self):
+                transport.close()
+
+        return Cassette_HTTPX_Transport()
+
+llm_cassette = LLM_Cassette()
@@ -0,0 +1,259 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from classes.ai_engines.openai_client import openai_client
+from classes.ai_engines.ollama_client import ollama_client
+from classes.ai_engines.circuit_breaker import circuit_breakers
+from classes.ai_engines.llm_telemetry import llm_telemetry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("llm_router")
+
+class Latency_Tracker:
+    def __init__(self, window=50):
+        """Rolling latency and error window for one backend/model pair"""
+        self.samples = deque(maxlen=window)
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        """Add the outcome of one request"""
+        with self._lock:
+            self.samples.append((latency, ok))
+
+    def percentile(self, pct):
+        """Latency percentile of successful requests, or None without data"""
+        with self._lock:
+            latencies = sorted(latency for latency, ok in self.samples if ok)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(pct / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+    def error_rate(self):
+        """Share of failed requests in the window"""
+        with self._lock:
+            if not self.samples:
+                return 0.0
+            return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def stats(self):
+        """Return the rolling statistics for display"""
+        return {
+            "requests": len(self.samples),
+            "in_flight": self.in_flight,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "error_rate": self.error_rate()
+        }
+
+class LLM_Router:
+    POLICIES = ["local_first", "fastest", "openai_only", "ollama_only"]
+
+    def __init__(self):
+        """Initialize the latency-aware router between Ollama and OpenAI"""
+        # local_first: Ollama for base load, OpenAI on overflow, errors or slow requests
+        self.POLICY = os.getenv("LLM_ROUTING_POLICY", "local_first")
+        self.WINDOW = int(os.getenv("LLM_ROUTER_WINDOW", "50"))
+        # Requests Ollama may have in flight before new ones overflow to OpenAI
+        self.OLLAMA_CAPACITY = int(os.getenv("LLM_ROUTER_OLLAMA_CAPACITY", "2"))
+        # Backends failing more often than this are skipped
+        self.MAX_ERROR_RATE = float(os.getenv("LLM_ROUTER_MAX_ERROR_RATE", "0.5"))
+        # Send a backup request when the primary takes longer than its p95 (or HEDGE_DEFAULT without history)
+        self.HEDGE = os.getenv("LLM_ROUTER_HEDGE", "true").lower() == "true"
+        self.HEDGE_MIN = float(os.getenv("LLM_ROUTER_HEDGE_MIN", "1.0"))
+        self.HEDGE_DEFAULT = float(os.getenv("LLM_ROUTER_HEDGE_DEFAULT", "15"))
+
+        self._trackers = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_ROUTER_WORKERS", "16")), thread_name_prefix="llm_router")
+
+    def _default_models(self, models=None):
+        """Fill in the default model for each backend"""
+        models = dict(models or {})
+        models.setdefault("openai", openai_client.DEFAULT_MODEL)
+        models.setdefault("ollama", ollama_client.DEFAULT_MODEL)
+        return models
+
+    def tracker(self, backend, model):
+        """Return the latency tracker for a backend/model pair"""
+        with self._lock:
+            key = (backend, model)
+            if key not in self._trackers:
+                self._trackers[key] = Latency_Tracker(self.WINDOW)
+            return self._trackers[key]
+
+    def is_healthy(self, backend, model):
+        """A backend is usable if its circuit isn't open and its recent error rate is acceptable"""
+        if circuit_breakers.get(backend).status()["state"] == "open":
+            return False
+        tracker = self.tracker(backend, model)
+        return len(tracker.samples) < 5 or tracker.error_rate() <= self.MAX_ERROR_RATE
+
+    def candidates(self, models=None, policy=None):
+        """
+        Order the backends to try for the next request
+
+        Returns:
+            list: (backend, model) tuples, best first
+        """
+        models = self._default_models(models)
+        policy = policy or self.POLICY
+        if policy == "openai_only":
+            order = ["openai"]
+        elif policy == "ollama_only":
+            order = ["ollama"]
+        elif policy == "fastest":
+            def expected_latency(backend):
+                p50 = self.tracker(backend, models[backend]).percentile(50)
+                return p50 if p50 is not None else 0.0
+            order = sorted(["ollama", "openai"], key=expected_latency)
+        else:
+            order = ["ollama", "openai"]
+            # Overflow to OpenAI once the local box is busy
+            if self.tracker("ollama", models["ollama"]).in_flight >= self.OLLAMA_CAPACITY:
+                order = ["openai", "ollama"]
+
+        healthy = [(backend, models[backend]) for backend in order if self.is_healthy(backend, models[backend])]
+        # If everything looks unhealthy still try in policy order, the circuit breaker fails fast
+        return healthy or [(backend, models[backend]) for backend in order]
+
+    def _call(self, backend, model, prompt, use_cache, params):
+        """Run one request against a backend and record its latency"""
+        tracker = self.tracker(backend, model)
+        with self._lock:
+            tracker.in_flight += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            if backend == "ollama":
+                result = ollama_client.generate_with_ollama(prompt, model, use_cache=use_cache, **params)
+            else:
+                result = openai_client.generate_with_openai(prompt, model, use_cache=use_cache, **params)
+            ok = bool(result) and not result.startswith("Error")
+            return result, ok
+        except Exception as e:
+            return f"Error generating description: {e}", False
+        finally:
+            tracker.record(time.perf_counter() - start, ok)
+            with self._lock:
+                tracker.in_flight -= 1
+
+    def hedge_delay(self, backend, model):
+        """Seconds to wait on a request before sending a backup to the next backend"""
+        p95 = self.tracker(backend, model).percentile(95)
+        return max(self.HEDGE_MIN, p95) if p95 is not None else self.HEDGE_DEFAULT
+
+    def generate_with_route(self, prompt, models=None, policy=None, use_cache=True, **params):
+        """
+        Generate text on the best available backend, failing over and hedging slow requests
+
+        Args:
+            prompt (str): The prompt to send
+            models (dict, optional): Model per backend, e.g. {"openai": "gpt-4.1-nano", "ollama": "llama3.2"}
+            policy (str, optional): One of POLICIES, defaults to LLM_ROUTING_POLICY
+            use_cache (bool): Allow responses from the LLM response cache
+            **params: Extra client parameters (response_format, max_tokens, temperature, timeout)
+
+        Returns:
+            tuple: (text, backend, model) of the winning request
+        """
+        order = self.candidates(models, policy)
+        pending = {}
+        result = None
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            backend, model = order[next_index]
+            next_index += 1
+            future = self._executor.submit(llm_telemetry.bind(self._call), backend, model, prompt, use_cache, params)
+            pending[future] = (backend, model)
+            return backend, model
+
+        backend, model = launch()
+        while pending:
+            can_hedge = self.HEDGE and next_index < len(order)
+            timeout = self.hedge_delay(backend, model) if can_hedge else None
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slower than usual, race it against the next backend
+                logger.info(f"Hedging slow {backend} request with {order[next_index][0]}")
+                backend, model = launch()
+                continue
+            for future in done:
+                route = pending.pop(future)
+                text, ok = future.result()
+                if ok:
+                    return (text, route[0], route[1])
+                result = (text, route[0], route[1])
+                logger.warning(f"{route[0]} failed, failing over: {text[:100]}")
+            # Everything in flight failed, fail over to the next backend
+            if not pending and next_index < len(order):
+                backend, model = launch()
+        return result
+
+    def generate(self, prompt, models=None, policy=None, use_cache=True, **params):
+        """Generate text on the best available backend and return only the text"""
+        return self.generate_with_route(prompt, models, policy, use_cache, **params)[0]
+
+    def stream(self, prompt, models=None, policy=None, max_chars=None, use_cache=True, **params):
+        """
+        Stream text from the best available backend
+
+        Fails over to the next backend if a stream errors before producing text.
+        The latency recorded for a stream is its time to first token, so it is
+        recorded even when the caller stops reading early.
+
+        Yields:
+            str: Text fragments
+        """
+        last_error = None
+        for backend, model in self.candidates(models, policy):
+            tracker = self.tracker(backend, model)
+            with self._lock:
+                tracker.in_flight += 1
+            start = time.perf_counter()
+            recorded = False
+            fragments = None
+            try:
+                if backend == "ollama":
+                    fragments = ollama_client.stream_with_ollama(prompt, model, max_chars=max_chars, use_cache=use_cache, **params)
+                else:
+                    fragments = openai_client.stream_with_openai(prompt, model, max_chars=max_chars, use_cache=use_cache, **params)
+                first = next(fragments, None)
+                ok = bool(first) and not first.startswith("Error")
+                tracker.record(time.perf_counter() - start, ok)
+                recorded = True
+                if not ok:
+                    logger.warning(f"{backend} stream failed, failing over: {first}")
+                    last_error = first
+                    continue
+                yield first
+                yield from fragments
+                return
+            finally:
+                # Runs on failover, at the end of the stream and when the caller closes it early
+                if not recorded:
+                    tracker.record(time.perf_counter() - start, False)
+                if fragments is not None:
+                    fragments.close()
+                with self._lock:
+                    tracker.in_flight -= 1
+        yield last_error or "Error generating description: no backend available"
+
+    def stats(self):
+        """Return rolling statistics for every backend/model pair"""
+        with self._lock:
+            trackers = dict(self._trackers)
+        return [
+            dict(backend=backend, model=model, healthy=self.is_healthy(backend, model), **tracker.stats())
+            for (backend, model), tracker in trackers.items()
+        ]
+
+llm_router = LLM_Router()
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import datetime
+import threading
+import functools
+import contextvars
+from urllib.parse import urlparse
+
+from classes.db.database import DB_PATH
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("llm_telemetry")
+
+# Page the current LLM calls are made for, set once at the top of every page
+current_page = contextvars.ContextVar("llm_page", default=None)
+
+COLUMNS = (
+    "page", "backend", "model", "endpoint", "status", "wall_time_ms", "ttft_ms",
+    "prompt_tokens", "completion_tokens", "cached_tokens", "retry_count", "cache_hit",
+    "cost_usd", "error", "created_at"
+)
+
+def usage_from_body(data):
+    """
+    Read token counts from an OpenAI or Ollama response body
+
+    Returns:
+        tuple: (prompt_tokens, completion_tokens, cached_tokens), None where the body has no count
+    """
+    if not isinstance(data, dict):
+        return None, None, None
+    usage = data.get("usage")
+    if isinstance(usage, dict):
+        # Chat completions use prompt/completion, the responses API input/output
+        details = usage.get("prompt_tokens_details") or usage.get("input_tokens_details") or {}
+        return (
+            usage.get("prompt_tokens", usage.get("input_tokens")),
+            usage.get("completion_tokens", usage.get("output_tokens")),
+            details.get("cached_tokens")
+        )
+    if "prompt_eval_count" in data or "eval_count" in data:
+        return data.get("prompt_eval_count"), data.get("eval_count"), None
+    return None, None, None
+
+class Telemetry_Body:
+    def __init__(self, raw, on_done, start):
+        """Wrap a streamed response body to time the first chunk and read the usage from the last ones"""
+        self._raw = raw
+        self._on_done = on_done
+        self._start = start
+        self._tail = b""
+        self._done = False
+        self.ttft = None
+
+    def read(self, amt=None, *args, **kwargs):
+        kwargs.setdefault("decode_content", True)
+        data = self._raw.read(amt, *args, **kwargs)
+        if data:
+            if self.ttft is None:
+                self.ttft = time.perf_counter() - self._start
+            # Usage arrives in the final event, a few kilobytes of tail are enough to find it
+            self._tail = (self._tail + data)[-16384:]
+        else:
+            self._finish(None)
+        return data
+
+    def close(self):
+        # Clients stop reading after the final event, only a close before it is a cancellation
+        complete = b"[DONE]" in self._tail or b'"done": true' in self._tail or b'"done":true' in self._tail
+        self._finish(None if complete else "Cancelled by client")
+        self._raw.close()
+
+    def _finish(self, error):
+        if self._done:
+            return
+        self._done = True
+        usage = (None, None, None)
+        for line in reversed(self._tail.split(b"\n")):
+            line = line.strip()
+            if line.startswith(b"data:"):
+                line = line[len(b"data:"):].strip()
+            if not line.startswith(b"{"):
+                continue
+            try:
+                usage = usage_from_body(json.loads(line))
+            except ValueError:
+                continue
+            if usage != (None, None, None):
+                break
+        self._on_done(self.ttft, usage, error)
+
+    def __getattr__(self, name):
+        # Without a stream() method requests reads the body through read()
+        if name == "stream":
+            raise AttributeError(name)
+        return getattr(self._raw, name)
+
+class LLM_Telemetry:
+    def __init__(self, db_path=None):
+        """Initialize the non-blocking generation_logs writer"""
+        self.db_path = db_path or os.getenv("LLM_TELEMETRY_PATH", DB_PATH)
+        self.ENABLED = os.getenv("LLM_TELEMETRY_ENABLED", "true").lower() == "true"
+        # Rows are written in batches of this size, or after FLUSH_INTERVAL seconds
+        self.BATCH_SIZE = int(os.getenv("LLM_TELEMETRY_BATCH_SIZE", "100"))
+        self.FLUSH_INTERVAL = float(os.getenv("LLM_TELEMETRY_FLUSH_INTERVAL", "2"))
+        # Rows beyond this are dropped rather than slowing down the LLM calls
+        self.QUEUE_SIZE = int(os.getenv("LLM_TELEMETRY_QUEUE_SIZE", "10000"))
+        # Longest flush() waits for the writer, so a stuck database can't hold up interpreter shutdown
+        self.FLUSH_TIMEOUT = float(os.getenv("LLM_TELEMETRY_FLUSH_TIMEOUT", "10"))
+        default_pricing = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'model_pricing.json')
+        self.PRICING_PATH = os.getenv("LLM_PRICING_PATH", default_pricing)
+
+        self.written = 0
+        self.dropped = 0
+        # Prompt tokens reported since start, and how many of them the provider served from its prompt cache
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pricing = self._load_pricing()
+
+    def _load_pricing(self):
+        try:
+            with open(self.PRICING_PATH, "r", encoding="utf-8") as f:
+                return json.load(f).get("models", {})
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Could not load model pricing from {self.PRICING_PATH}: {e}")
+            return {}
+
+    # --- Page context ---------------------------------------------------------
+
+    def set_page(self, page):
+        """Attribute the LLM calls made from here on (in this thread or context) to a page"""
+        current_page.set(page)
+
+    def bind(self, fn):
+        """Wrap a callable so it runs with the caller's page when submitted to a thread pool"""
+        return functools.partial(contextvars.copy_context().run, fn)
+
+    # --- Recording ------------------------------------------------------------
+
+    def cost(self, backend, model, prompt_tokens, completion_tokens, cached_tokens):
+        """Estimated cost in USD, 0 for self-hosted models and None for unknown ones"""
+        if backend == "ollama":
+            return 0.0
+        matches = [name for name in self._pricing if model and model.startswith(name)]
+        if not matches or prompt_tokens is None:
+            return None
+        price = self._pricing[max(matches, key=len)]
+        cached = cached_tokens or 0
+        return (
+            (prompt_tokens - cached) * price["input"]
+            + cached * price.get("cached_input", price["input"])
+            + (completion_tokens or 0) * price["output"]
+        ) / 1_000_000
+
+    def record(self, backend, model, endpoint, wall_time, ttft=None, prompt_tokens=None, completion_tokens=None, cached_tokens=None, retry_count=0, cache_hit=False, status=None, error=None, page=None):
+        """
+        Queue one LLM call for the generation_logs table; never blocks the caller
+
+        Args:
+            backend (str): 'openai' or 'ollama'
+            model (str): The model that answered
+            endpoint (str): API path, e.g. /v1/chat/completions
+            wall_time (float): Seconds from sending the request to the end of the answer
+            ttft (float, optional): Seconds to the first streamed chunk
+            prompt_tokens, completion_tokens, cached_tokens (int, optional): Token usage reported by the API
+            retry_count (int): Retries spent on 429/5xx responses and dropped connections
+            cache_hit (bool): Answered from the local response cache
+            status (int, optional): HTTP status of the final response
+            error (str, optional): Error message for failed calls
+            page (str, optional): Defaults to the page set with set_page()
+        """
+        if not self.ENABLED:
+            return
+        if prompt_tokens and not cache_hit:
+            with self._lock:
+                self.prompt_tokens += prompt_tokens
+                self.cached_tokens += cached_tokens or 0
+        row = (
+            page or current_page.get(),
+            backend,
+            model,
+            endpoint,
+            status,
+            round(wall_time * 1000, 1),
+            round(ttft * 1000, 1) if ttft is not None else None,
+            prompt_tokens,
+            completion_tokens,
+            cached_tokens,
+            retry_count or 0,
+            int(bool(cache_hit)),
+            self.cost(backend, model, prompt_tokens, completion_tokens, cached_tokens),
+            str(error)[:500] if error else None,
+            datetime.datetime.now().isoformat()
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_writer()
+
+    def track_response(self, response, backend, payload, url, start, stream=False):
+        """
+        Record a transport response, once its body has been read for streams
+
+        Returns:
+            requests.Response: The same response
+        """
+        if not self.ENABLED:
+            return response
+        model = payload.get("model") if isinstance(payload, dict) else None
+        endpoint = urlparse(url).path
+        retry_count = getattr(response, "retry_count", 0)
+
+        if stream and response.status_code < 400:
+            def on_done(ttft, usage, error):
+                self.record(
+                    backend, model, endpoint, time.perf_counter() - start,
+                    ttft=ttft,
+                    prompt_tokens=usage[0], completion_tokens=usage[1], cached_tokens=usage[2],
+                    retry_count=retry_count, status=response.status_code, error=error
+                )
+            response.raw = Telemetry_Body(response.raw, on_done, start)
+            return response
+
+        try:
+            data = response.json() if response.status_code < 400 else None
+        except ValueError:
+            data = None
+        prompt_tokens, completion_tokens, cached_tokens = usage_from_body(data)
+        self.record(
+            backend, model, endpoint, time.perf_counter() - start,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cached_tokens=cached_tokens,
+            retry_count=retry_count, status=response.status_code,
+            error=None if response.status_code < 400 else f"{response.status_code} {response.reason}"
+        )
+        return response
+
+    # --- Writer ---------------------------------------------------------------
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="llm_telemetry", daemon=True)
+                    self._thread.start()
+
+    def _connect(self):
+        # Creates pies.db from db_setup.sql if needed and applies the generation_logs migration
+        from classes.db.initalize_database import initialize_database
+        if self.db_path == DB_PATH:
+            initialize_database.create_database()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA journal_mode = WAL")
+        if self.db_path != DB_PATH:
+            # A separate log database only needs generation_logs; the other migrations change the parts tables
+            path = next(path for _, path in initialize_database.get_migrations() if path.endswith("_generation_logs.sql"))
+            with open(path, "r") as f:
+                conn.executescript(f.read())
+        return conn
+
+    def _run(self):
+        """Drain the queue into generation_logs with one executemany per batch"""
+        conn = None
+        insert = f"INSERT INTO generation_logs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})"
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                if conn is None:
+                    conn = self._connect()
+                conn.executemany(insert, batch)
+                conn.commit()
+                self.written += len(batch)
+            except Exception as e:
+                # Any error, including one while opening the database, drops the batch but keeps the writer alive
+                self.dropped += len(batch)
+                logger.error(f"Error writing {len(batch)} generation logs: {e}")
+                if conn is not None:
+                    conn.close()
+                    conn = None
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued row has been written
+
+        Args:
+            timeout (float, optional): Seconds to wait at most. Defaults to LLM_TELEMETRY_FLUSH_TIMEOUT
+
+        Returns:
+            bool: True if the queue was drained in time
+        """
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + (self.FLUSH_TIMEOUT if timeout is None else timeout)
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    logger.warning(f"{self._queue.unfinished_tasks} generation logs were not written before the flush timeout")
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens
+        }
+
+llm_telemetry = LLM_Telemetry()
+atexit.register(llm_telemetry.flush)
@@ -0,0 +1,369 @@
+import os
+import json
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from classes.ai_engines.response_cache import llm_response_cache
+from classes.ai_engines.rate_limiter import rate_limiters, retry_policy, parse_retry_after, estimate_tokens
+from classes.ai_engines.circuit_breaker import circuit_breakers
+from classes.ai_engines.llm_cassette import llm_cassette
+from classes.ai_engines.llm_telemetry import llm_telemetry
+from classes.ai_engines.single_flight import single_flight
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("llm_transport")
+
+class LLM_Transport:
+    def __init__(self):
+        """Initialize the process-wide LLM transport"""
+        self.OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+        # Number of per-host connection pools to keep and connections kept alive per host
+        self.POOL_CONNECTIONS = int(os.getenv("LLM_POOL_CONNECTIONS", "10"))
+        self.POOL_MAXSIZE = int(os.getenv("LLM_POOL_MAXSIZE", "20"))
+        # Block instead of opening throwaway connections once a host's pool is exhausted
+        self.POOL_BLOCK = os.getenv("LLM_POOL_BLOCK", "true").lower() == "true"
+        # Per-host overrides, e.g. "api.openai.com=32,localhost:11434=4"
+        self.HOST_LIMITS = self._parse_host_limits(os.getenv("LLM_HOST_LIMITS", ""))
+        self.DEFAULT_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+        self._session = None
+        self._openai_clients = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _parse_host_limits(value):
+        """Parse a "host=limit,host=limit" string into a dictionary"""
+        limits = {}
+        for entry in value.split(","):
+            if "=" not in entry:
+                continue
+            host, limit = entry.split("=", 1)
+            try:
+                limits[host.strip().lower()] = int(limit)
+            except ValueError:
+                logger.warning(f"Ignoring invalid host limit: {entry}")
+        return limits
+
+    def host_limit(self, url):
+        """Return the maximum number of pooled connections for the host of a URL"""
+        return self.HOST_LIMITS.get(urlparse(url).netloc.lower(), self.POOL_MAXSIZE)
+
+    def _build_session(self):
+        """Create a requests session with keep-alive connection pools"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_CONNECTIONS,
+            pool_maxsize=self.POOL_MAXSIZE,
+            pool_block=self.POOL_BLOCK
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        # Hosts with their own limit get a dedicated adapter
+        for host, limit in self.HOST_LIMITS.items():
+            host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=limit, pool_block=self.POOL_BLOCK)
+            session.mount(f"http://{host}", host_adapter)
+            session.mount(f"https://{host}", host_adapter)
+
+        logger.info(f"Created LLM session (pools: {self.POOL_CONNECTIONS}, per host: {self.POOL_MAXSIZE}, overrides: {self.HOST_LIMITS})")
+        return session
+
+    @property
+    def session(self):
+        """Shared requests session, created on first use"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def request(self, method, url, backend=None, **kwargs):
+        """
+        Send an HTTP request through the pooled session
+
+        When a backend is given the request is paced by that backend's rate limiter
+        and 429/5xx responses and dropped connections are retried with jittered
+        exponential backoff, honoring retry-after headers. The backend's circuit
+        breaker makes the request fail fast while the backend is down.
+
+        Args:
+            method (str): HTTP method
+            url (str): Full request URL
+            backend (str, optional): Backend name used for rate limiting ('openai', 'ollama')
+            **kwargs: Passed through to requests (json, headers, timeout, stream, ...)
+
+        Returns:
+            requests.Response: The raw response, with the number of retries in retry_count
+
+        Raises:
+            Circuit_Open_Error: If the backend's circuit is open
+        """
+        kwargs.setdefault("timeout", self.DEFAULT_TIMEOUT)
+        if backend is None:
+            return self._send(method, url, **kwargs)
+
+        # Every backend call ends up in generation_logs with its timing, tokens and retries
+        payload = kwargs.get("json")
+        start = time.perf_counter()
+        try:
+            response = self._request_with_retries(method, url, backend, **kwargs)
+        except Exception as e:
+            llm_telemetry.record(backend, payload.get("model") if isinstance(payload, dict) else None, urlparse(url).path, time.perf_counter() - start, error=e)
+            raise
+        return llm_telemetry.track_response(response, backend, payload, url, start, stream=kwargs.get("stream", False))
+
+    def _request_with_retries(self, method, url, backend, **kwargs):
+        """Send a backend request with rate limiting, retries and the circuit breaker"""
+        limiter = rate_limiters.get(backend)
+        breaker = circuit_breakers.get(backend)
+        estimated_tokens = estimate_tokens(kwargs.get("json"))
+        attempt = 0
+        while True:
+            breaker.check()
+            try:
+                limiter.acquire(estimated_tokens)
+                response = self._send(method, url, **kwargs)
+            except requests.exceptions.ConnectionError as e:
+                breaker.record_failure(e)
+                if attempt >= retry_policy.MAX_RETRIES:
+                    raise
+                delay = retry_policy.backoff(attempt)
+                logger.warning(f"Connection to {backend} failed ({e}). Retrying in {delay:.2f}s (attempt {attempt + 1}/{retry_policy.MAX_RETRIES})")
+                attempt += 1
+                time.sleep(delay)
+                continue
+            except requests.exceptions.Timeout as e:
+                breaker.record_failure(e)
+                raise
+            except BaseException as e:
+                # Not the backend's fault, but a half-open trial must not stay in flight forever
+                breaker.end_trial(e)
+                raise
+
+            # A rate-limited backend is still healthy, only server errors count against it
+            if response.status_code >= 500:
+                breaker.record_failure(f"{response.status_code} {response.reason}")
+            else:
+                breaker.record_success()
+
+            limiter.update_from_headers(response.headers)
+            if response.status_code not in retry_policy.RETRY_STATUSES or attempt >= retry_policy.MAX_RETRIES:
+                response.retry_count = attempt
+                return response
+
+            delay = retry_policy.backoff(attempt, parse_retry_after(response.headers))
+            logger.warning(f"{backend} returned {response.status_code}. Retrying in {delay:.2f}s (attempt {attempt + 1}/{retry_policy.MAX_RETRIES})")
+            response.close()
+            attempt += 1
+            if response.status_code == 429:
+                # Hold back every caller of this backend, the wait happens in acquire()
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+    def _send(self, method, url, **kwargs):
+        """Send one HTTP attempt, through the cassette when recording or replaying"""
+        if llm_cassette.active:
+            return llm_cassette.send(self.session, method, url, **kwargs)
+        return self.session.request(method, url, **kwargs)
+
+    def probe_openai(self):
+        """Health probe for the OpenAI circuit breaker: a model list, or 401 for the unauthenticated probe, means the API is up"""
+        response = self.session.get(f"{self.OPENAI_BASE_URL}/models", timeout=5)
+        # 429 and other 4xx answers can come from a proxy or an overloaded API, so they don't close the circuit
+        return response.status_code == 401 or 200 <= response.status_code < 300
+
+    def get(self, url, **kwargs):
+        """Send a GET request through the pooled session"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request through the pooled session"""
+        return self.request("POST", url, **kwargs)
+
+    def openai_headers(self, api_key):
+        """Build the headers for an OpenAI-compatible request"""
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}"
+        }
+
+    def post_chat_completion(self, payload, api_key, timeout=None):
+        """
+        POST a payload to the OpenAI chat completions endpoint
+
+        Args:
+            payload (dict): The chat completions request body
+            api_key (str): OpenAI API key
+            timeout (float, optional): Request timeout in seconds
+
+        Returns:
+            requests.Response: The raw response
+        """
+        return self.post(
+            f"{self.OPENAI_BASE_URL}/chat/completions",
+            backend="openai",
+            headers=self.openai_headers(api_key),
+            json=payload,
+            timeout=timeout or self.DEFAULT_TIMEOUT,
+            # Read streamed answers as they arrive instead of buffering the whole body
+            stream=bool(payload.get("stream"))
+        )
+
+    def chat_completion(self, payload, api_key, timeout=None, use_cache=True):
+        """
+        Run a chat completion and return the parsed JSON body
+
+        Args:
+            payload (dict): The chat completions request body
+            api_key (str): OpenAI API key
+            timeout (float, optional): Request timeout in seconds
+            use_cache (bool): Serve identical requests from the response cache
+
+        Raises:
+            requests.exceptions.RequestException: On connection errors or non-2xx responses
+        """
+        cache_key = None
+        if use_cache:
+            cache_key = self.cache_key_for(payload, backend="openai")
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for model {payload.get('model')}")
+                llm_telemetry.record("openai", payload.get("model"), urlparse(self.OPENAI_BASE_URL).path + "/chat/completions", 0.0, cache_hit=True)
+                return cached
+
+        def fetch():
+            response = self.post_chat_completion(payload, api_key, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+            if cache_key:
+                llm_response_cache.set(cache_key, result, model=payload.get("model"))
+            return result
+
+        # Identical requests already in flight (e.g. another session clicking the same example) share one call
+        return single_flight.do(cache_key, fetch)
+
+    def stream_chat_completion(self, payload, api_key, timeout=None, use_cache=True):
+        """
+        Stream a chat completion, yielding content fragments as they arrive
+
+        Closing the generator early (e.g. breaking out of the loop) closes the
+        connection, which stops the generation on the server.
+
+        Args:
+            payload (dict): The chat completions request body
+            api_key (str): OpenAI API key
+            timeout (float, optional): Request timeout in seconds
+            use_cache (bool): Replay a cached response and cache completed streams
+
+        Yields:
+            str: Content fragments
+
+        Raises:
+            requests.exceptions.RequestException: On connection errors or non-2xx responses
+        """
+        cache_key = None
+        if use_cache:
+            cache_key = self.cache_key_for(payload, backend="openai")
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for model {payload.get('model')}")
+                llm_telemetry.record("openai", payload.get("model"), urlparse(self.OPENAI_BASE_URL).path + "/chat/completions", 0.0, cache_hit=True)
+                yield cached["choices"][0]["message"]["content"]
+                return
+
+        # Sessions streaming the same request at the same time read one shared stream
+        yield from single_flight.stream(cache_key, lambda: self._stream_chat_completion_live(payload, api_key, timeout, cache_key))
+
+    def _stream_chat_completion_live(self, payload, api_key, timeout, cache_key):
+        """Send a streamed chat completion and yield its content fragments, caching the complete answer"""
+        # The final event then carries the token usage for generation_logs
+        stream_payload = dict(payload, stream=True, stream_options={"include_usage": True})
+        response = self.post_chat_completion(stream_payload, api_key, timeout=timeout)
+        try:
+            response.raise_for_status()
+            content = ""
+            finished = False
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    finished = True
+                    break
+                chunk = json.loads(data)
+                if not chunk.get("choices"):
+                    continue
+                fragment = chunk["choices"][0].get("delta", {}).get("content")
+                if fragment:
+                    content += fragment
+                    yield fragment
+            # Only complete streams are worth caching
+            if cache_key and finished:
+                llm_response_cache.set(
+                    cache_key,
+                    {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                    model=payload.get("model")
+                )
+        finally:
+            response.close()
+
+    @staticmethod
+    def cache_key_for(payload, backend):
+        """Build the response cache key for a chat completions payload"""
+        params = {k: v for k, v in payload.items() if k not in ("model", "messages", "temperature", "response_format", "stream")}
+        return llm_response_cache.make_key(
+            payload.get("model"),
+            payload.get("messages"),
+            payload.get("temperature"),
+            payload.get("response_format"),
+            backend=backend,
+            **params
+        )
+
+    def get_openai_client(self, api_key):
+        """
+        Return a cached OpenAI SDK client backed by a pooled HTTP client
+
+        Args:
+            api_key (str): OpenAI API key
+
+        Returns:
+            OpenAI: SDK client reused across calls with the same key
+        """
+        with self._lock:
+            client = self._openai_clients.get(api_key)
+            if client is None:
+                import httpx
+                from openai import OpenAI
+
+                limit = self.host_limit(self.OPENAI_BASE_URL)
+                limits = httpx.Limits(max_connections=limit, max_keepalive_connections=limit)
+                # SDK calls such as responses.create are recorded and replayed like the pooled session's
+                http_client = httpx.Client(
+                    transport=llm_cassette.httpx_transport(httpx.HTTPTransport(limits=limits)),
+                    limits=limits,
+                    timeout=self.DEFAULT_TIMEOUT
+                )
+                client = OpenAI(api_key=api_key, base_url=self.OPENAI_BASE_URL, http_client=http_client)
+                self._openai_clients[api_key] = client
+            return client
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+            for client in self._openai_clients.values():
+                client.close()
+            self._openai_clients = {}
+
+llm_transport = LLM_Transport()
+circuit_breakers.set_probe("openai", llm_transport.probe_openai)
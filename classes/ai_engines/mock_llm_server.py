@@ -0,0 +1,552 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from collections import OrderedDict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("mock_llm_server")
+
+# Words the mock answers are built from, so the pages get plausible part descriptions
+VOCABULARY = [
+    "premium", "front", "rear", "brake", "pad", "set", "ceramic", "rotor", "sensor", "assembly",
+    "direct", "fit", "replacement", "durable", "steel", "housing", "quiet", "reliable", "performance",
+    "engine", "mount", "filter", "oil", "pump", "gasket", "kit", "includes", "hardware", "vehicle",
+    "tested", "OE", "quality", "corrosion", "resistant", "coated", "easy", "installation", "long", "life"
+]
+
+class Latency_Distribution:
+    def __init__(self, spec):
+        """
+        Parse a latency spec such as "fixed:0.2", "uniform:0.1,0.5",
+        "normal:0.4,0.1" or "lognormal:-1,0.5" (all in seconds)
+        """
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind.strip().lower() or "fixed"
+        self.params = [float(value) for value in params.split(",") if value.strip()]
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng):
+        """Draw one latency in seconds, never negative"""
+        if self.kind == "uniform":
+            low, high = (self.params + [0.0, 0.0])[:2]
+            return rng.uniform(low, high)
+        if self.kind == "normal":
+            mean, sd = (self.params + [0.0, 0.0])[:2]
+            return max(0.0, rng.gauss(mean, sd))
+        if self.kind == "lognormal":
+            mu, sigma = (self.params + [0.0, 0.0])[:2]
+            return rng.lognormvariate(mu, sigma)
+        return self.params[0] if self.params else 0.0
+
+class Mock_LLM_Server:
+    def __init__(self, host=None, port=None):
+        """
+        A local stand-in for the OpenAI and Ollama APIs
+
+        Speaks /v1/models, /v1/chat/completions and /v1/responses as well as
+        Ollama's /api/tags, /api/ps, /api/generate and /api/chat, so every page
+        can run without network access. Latency, token rate and injected
+        errors are configured with the MOCK_LLM_* environment variables.
+        """
+        self.HOST = host or os.getenv("MOCK_LLM_HOST", "127.0.0.1")
+        self.PORT = int(port if port is not None else os.getenv("MOCK_LLM_PORT", "11500"))
+        self.MODELS = [model.strip() for model in os.getenv("MOCK_LLM_MODELS", "llama3.2:latest,gpt-4.1-nano,gpt-4o-mini").split(",") if model.strip()]
+        # Time before the first token
+        self.LATENCY = Latency_Distribution(os.getenv("MOCK_LLM_LATENCY", "lognormal:-1.2,0.5"))
+        self.TOKENS_PER_SECOND = float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "80"))
+        # Length of a plain text answer, capped by the request's max_tokens / num_predict
+        self.OUTPUT_TOKENS = int(os.getenv("MOCK_LLM_OUTPUT_TOKENS", "40"))
+        # Share of requests answered with a 500 and with a 429
+        self.ERROR_RATE = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))
+        self.RATE_LIMIT_RATE = float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0"))
+        # Hard requests-per-minute limit answered with 429 and retry-after, 0 disables it
+        self.RPM = int(os.getenv("MOCK_LLM_RPM", "0"))
+        self.RESPONSE = os.getenv("MOCK_LLM_RESPONSE")
+
+        seed = os.getenv("MOCK_LLM_SEED")
+        self._rng = random.Random(int(seed) if seed else None)
+        self._lock = threading.Lock()
+        self._request_times = deque()
+        # Message prefixes seen recently, to report cached prompt tokens like a KV / prompt cache
+        self._prefix_cache = OrderedDict()
+        self._server = None
+        self._thread = None
+        self.reset_stats()
+
+    # --- Statistics -----------------------------------------------------------
+
+    def reset_stats(self):
+        """Clear the request counters"""
+        with self._lock:
+            self._stats = {"requests": 0, "by_path": {}, "by_status": {}, "in_flight": 0, "max_in_flight": 0, "cancelled": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+    def stats(self):
+        """Return a copy of the request counters"""
+        with self._lock:
+            stats = json.loads(json.dumps(self._stats))
+        stats["url"] = self.url
+        return stats
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _enter(self, path):
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["by_path"][path] = self._stats["by_path"].get(path, 0) + 1
+            self._stats["in_flight"] += 1
+            self._stats["max_in_flight"] = max(self._stats["max_in_flight"], self._stats["in_flight"])
+
+    def _leave(self, status):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+            self._stats["by_status"][str(status)] = self._stats["by_status"].get(str(status), 0) + 1
+
+    # --- Simulation -----------------------------------------------------------
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def _latency(self):
+        with self._lock:
+            return self.LATENCY.sample(self._rng)
+
+    def injected_error(self):
+        """
+        Decide whether this request fails
+
+        Returns:
+            tuple: (status, headers) of the error to send, or None to answer normally
+        """
+        now = time.time()
+        if self.RPM > 0:
+            with self._lock:
+                while self._request_times and now - self._request_times[0] >= 60:
+                    self._request_times.popleft()
+                if len(self._request_times) >= self.RPM:
+                    retry_after = max(0.1, 60 - (now - self._request_times[0]))
+                    return 429, {"retry-after": f"{retry_after:.1f}", "x-ratelimit-limit-requests": str(self.RPM), "x-ratelimit-remaining-requests": "0"}
+                self._request_times.append(now)
+        if self.RATE_LIMIT_RATE and self._random() < self.RATE_LIMIT_RATE:
+            return 429, {"retry-after": "1"}
+        if self.ERROR_RATE and self._random() < self.ERROR_RATE:
+            return 500, {}
+        return None
+
+    @staticmethod
+    def count_tokens(text):
+        """Rough token count, about 4 characters per token"""
+        return max(1, len(text or "") // 4)
+
+    def cached_prompt_tokens(self, messages):
+        """
+        Count the prompt tokens of the longest message prefix seen before
+
+        Returns:
+            tuple: (prompt_tokens, cached_tokens)
+        """
+        digest = hashlib.sha256()
+        prefixes = []
+        for message in messages:
+            digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+            prefixes.append((digest.hexdigest(), self.count_tokens(json.dumps(message.get("content")))))
+        prompt_tokens = sum(tokens for _, tokens in prefixes)
+        cached = 0
+        with self._lock:
+            for key, tokens in prefixes:
+                if key not in self._prefix_cache:
+                    break
+                cached += tokens
+            for key, _ in prefixes:
+                self._prefix_cache[key] = True
+                self._prefix_cache.move_to_end(key)
+            while len(self._prefix_cache) > 2000:
+                self._prefix_cache.popitem(last=False)
+        return prompt_tokens, cached
+
+    def reply_words(self, prompt, max_tokens=None):
+        """Build a deterministic answer for a prompt, one word per token"""
+        if self.RESPONSE:
+            return self.RESPONSE.split(" ")
+        count = min(self.OUTPUT_TOKENS, max_tokens or self.OUTPUT_TOKENS)
+        rng = random.Random(hashlib.sha256((prompt or "").encode("utf-8")).hexdigest())
+        words = [rng.choice(VOCABULARY) for _ in range(max(1, count))]
+        words[0] = words[0].capitalize()
+        return words
+
+    def reply_json(self, prompt, schema):
+        """Fill every string property of a JSON schema with a short answer"""
+        properties = (schema or {}).get("properties") or {"response": {}}
+        return json.dumps({
+            name: " ".join(self.reply_words(f"{prompt}\n{name}", max_tokens=6))
+            for name in properties
+        })
+
+    def tokens_for(self, prompt, max_tokens=None, schema=None, json_mode=False):
+        """Split the answer into the fragments a stream would send"""
+        if schema is not None or json_mode:
+            text = self.reply_json(prompt, schema)
+            # Stream JSON in small slices, it has no natural word boundaries
+            return [text[index:index + 8] for index in range(0, len(text), 8)]
+        words = self.reply_words(prompt, max_tokens)
+        return [words[0]] + [f" {word}" for word in words[1:]]
+
+    def start(self):
+        """Serve in a background thread and return the base URL"""
+        self._server = ThreadingHTTPServer((self.HOST, self.PORT), Mock_LLM_Handler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self.PORT = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock_llm_server", daemon=True)
+        self._thread.start()
+        logger.info(f"Mock LLM server listening on {self.url}")
+        return self.url
+
+    def stop(self):
+        """Stop the background server"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve_forever(self):
+        """Serve in the current thread until interrupted"""
+        self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            self.stop()
+
+    @property
+    def url(self):
+        return f"http://{self.HOST}:{self.PORT}"
+
+class Mock_LLM_Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so connection pooling behaves like it does against the real APIs
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def handle(self):
+        # Pooled clients drop idle keep-alive connections, that isn't an error
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            self.close_connection = True
+
+    # --- Response helpers -----------------------------------------------------
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        return status
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        data = data.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_error(self, status, headers, ollama=False):
+        message = "Rate limit reached" if status == 429 else "Injected server error"
+        if ollama:
+            return self._send_json(status, {"error": message}, headers)
+        error_type = "rate_limit_exceeded" if status == 429 else "server_error"
+        return self._send_json(status, {"error": {"message": message, "type": error_type, "code": error_type}}, headers)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _delays(self):
+        """Time to the first token and between tokens for this request"""
+        forced = self.headers.get("X-Mock-Latency")
+        first = float(forced) if forced else self.mock._latency()
+        return first, (1.0 / self.mock.TOKENS_PER_SECOND if self.mock.TOKENS_PER_SECOND > 0 else 0.0)
+
+    def _check_error(self, ollama=False):
+        """Send an injected error if this request should fail, returning its status"""
+        forced = self.headers.get("X-Mock-Status")
+        if forced and forced != "200":
+            headers = {"retry-after": "1"} if forced == "429" else {}
+            return self._send_error(int(forced), headers, ollama)
+        error = self.mock.injected_error()
+        if error:
+            return self._send_error(error[0], error[1], ollama)
+        return None
+
+    # --- Routing --------------------------------------------------------------
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        self.mock._enter(path)
+        status = 200
+        try:
+            if path in ("/v1/models", "/models"):
+                status = self._send_json(200, {"object": "list", "data": [{"id": model, "object": "model", "owned_by": "mock"} for model in self.mock.MODELS]})
+            elif path == "/api/tags":
+                status = self._send_json(200, {"models": [{"name": model, "model": model, "size": 0, "details": {"family": "mock"}} for model in self.mock.MODELS]})
+            elif path == "/api/ps":
+                status = self._send_json(200, {"models": [{"name": model, "model": model, "size_vram": 0} for model in self.mock.MODELS]})
+            elif path == "/mock/stats":
+                status = self._send_json(200, self.mock.stats())
+            elif path in ("", "/"):
+                status = self._send_json(200, {"status": "Mock LLM server is running"})
+            else:
+                status = self._send_json(404, {"error": f"Unknown path {path}"})
+        finally:
+            self.mock._leave(status)
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        body = self._read_body()
+        self.mock._enter(path)
+        status = 200
+        try:
+            if path == "/mock/reset":
+                self.mock.reset_stats()
+                status = self._send_json(200, {"status": "reset"})
+            elif path in ("/v1/chat/completions", "/chat/completions"):
+                status = self._check_error() or self._chat_completions(body)
+            elif path in ("/v1/responses", "/responses"):
+                status = self._check_error() or self._responses(body)
+            elif path == "/api/generate":
+                status = self._check_error(ollama=True) or self._ollama(body, chat=False)
+            elif path == "/api/chat":
+                status = self._check_error(ollama=True) or self._ollama(body, chat=True)
+            else:
+                status = self._send_json(404, {"error": f"Unknown path {path}"})
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early, e.g. a losing candidate or a cancelled request
+            self.mock._count("cancelled")
+            self.close_connection = True
+            status = 499
+        finally:
+            self.mock._leave(status)
+
+    # --- OpenAI ---------------------------------------------------------------
+
+    def _chat_completions(self, body):
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(message.get("content")) for message in messages)
+        response_format = body.get("response_format") or {}
+        schema = (response_format.get("json_schema") or {}).get("schema") if response_format.get("type") == "json_schema" else None
+        json_mode = response_format.get("type") == "json_object"
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+        n = int(body.get("n") or 1)
+        model = body.get("model") or self.mock.MODELS[0]
+        prompt_tokens, cached_tokens = self.mock.cached_prompt_tokens(messages)
+        created = int(time.time())
+        completion_id = f"chatcmpl-mock{self.mock._rng.randrange(10 ** 12)}"
+
+        choices = [self.mock.tokens_for(prompt if index == 0 else f"{prompt}\n#{index}", max_tokens, schema, json_mode) for index in range(n)]
+        completion_tokens = sum(len(tokens) for tokens in choices)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens}
+        }
+        self._record_usage(prompt_tokens, cached_tokens, completion_tokens)
+        first, per_token = self._delays()
+
+        if body.get("stream"):
+            time.sleep(first)
+            self._start_stream("text/event-stream")
+            base = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+            for index, tokens in enumerate(choices):
+                for token in tokens:
+                    self._write_chunk("data: " + json.dumps(dict(base, choices=[{"index": index, "delta": {"content": token}, "finish_reason": None}])) + "\n\n")
+                    time.sleep(per_token)
+                self._write_chunk("data: " + json.dumps(dict(base, choices=[{"index": index, "delta": {}, "finish_reason": "stop"}])) + "\n\n")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                self._write_chunk("data: " + json.dumps(dict(base, choices=[], usage=usage)) + "\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self._end_stream()
+            return 200
+
+        time.sleep(first + per_token * max(len(tokens) for tokens in choices))
+        return self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [
+                {"index": index, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}
+                for index, tokens in enumerate(choices)
+            ],
+            "usage": usage
+        })
+
+    def _responses(self, body):
+        inputs = body.get("input")
+        if isinstance(inputs, str):
+            inputs = [{"role": "user", "content": inputs}]
+        messages = []
+        for item in inputs or []:
+            content = item.get("content")
+            if isinstance(content, list):
+                content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+            messages.append({"role": item.get("role", "user"), "content": content})
+        if body.get("instructions"):
+            messages.insert(0, {"role": "system", "content": body["instructions"]})
+        prompt = "\n".join(str(message["content"]) for message in messages)
+        tokens = self.mock.tokens_for(prompt, body.get("max_output_tokens"))
+        prompt_tokens, cached_tokens = self.mock.cached_prompt_tokens(messages)
+        self._record_usage(prompt_tokens, cached_tokens, len(tokens))
+        first, per_token = self._delays()
+        time.sleep(first + per_token * len(tokens))
+
+        response_id = f"resp_mock{self.mock._rng.randrange(10 ** 12)}"
+        return self._send_json(200, {
+            "id": response_id,
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model") or self.mock.MODELS[0],
+            "output": [{
+                "id": f"msg_{response_id}",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": "".join(tokens), "annotations": []}]
+            }],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {
+                "input_tokens": prompt_tokens,
+                "input_tokens_details": {"cached_tokens": cached_tokens},
+                "output_tokens": len(tokens),
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": prompt_tokens + len(tokens)
+            }
+        })
+
+    # --- Ollama ---------------------------------------------------------------
+
+    def _ollama(self, body, chat):
+        model = body.get("model") or self.mock.MODELS[0]
+        if chat:
+            messages = body.get("messages") or []
+        else:
+            # A request without a prompt only loads the model
+            if not body.get("prompt"):
+                return self._send_json(200, {"model": model, "created_at": self._timestamp(), "response": "", "done": True, "done_reason": "load"})
+            messages = [{"role": "system", "content": body["system"]}] if body.get("system") else []
+            messages.append({"role": "user", "content": body.get("prompt")})
+        prompt = "\n".join(str(message.get("content")) for message in messages)
+
+        response_format = body.get("format")
+        schema = response_format if isinstance(response_format, dict) else None
+        max_tokens = (body.get("options") or {}).get("num_predict")
+        tokens = self.mock.tokens_for(prompt, max_tokens, schema, json_mode=response_format == "json")
+        prompt_tokens, cached_tokens = self.mock.cached_prompt_tokens(messages)
+        self._record_usage(prompt_tokens, cached_tokens, len(tokens))
+        first, per_token = self._delays()
+
+        # Ollama reports only the prompt tokens it had to evaluate, a reused KV cache lowers the count
+        evaluated = prompt_tokens - cached_tokens
+        final = {
+            "model": model,
+            "created_at": self._timestamp(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((first + per_token * len(tokens)) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(first * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(per_token * len(tokens) * 1e9)
+        }
+        stream = body.get("stream", True)
+
+        if stream:
+            time.sleep(first)
+            self._start_stream("application/x-ndjson")
+            for token in tokens:
+                chunk = {"model": model, "created_at": self._timestamp(), "done": False}
+                if chat:
+                    chunk["message"] = {"role": "assistant", "content": token}
+                else:
+                    chunk["response"] = token
+                self._write_chunk(json.dumps(chunk) + "\n")
+                time.sleep(per_token)
+            if chat:
+                final["message"] = {"role": "assistant", "content": ""}
+                self.mock.cached_prompt_tokens(messages + [{"role": "assistant", "content": "".join(tokens)}])
+            else:
+                final["response"] = ""
+            self._write_chunk(json.dumps(final) + "\n")
+            self._end_stream()
+            return 200
+
+        time.sleep(first + per_token * len(tokens))
+        if chat:
+            final["message"] = {"role": "assistant", "content": "".join(tokens)}
+            # The answer stays in the KV cache too, so the next turn of the conversation only evaluates the new message
+            self.mock.cached_prompt_tokens(messages + [final["message"]])
+        else:
+            final["response"] = "".join(tokens)
+        return self._send_json(200, final)
+
+    def _record_usage(self, prompt_tokens, cached_tokens, completion_tokens):
+        self.mock._count("prompt_tokens", prompt_tokens)
+        self.mock._count("cached_tokens", cached_tokens)
+        self.mock._count("completion_tokens", completion_tokens)
+
+    @staticmethod
+    def _timestamp():
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+def main():
+    """Run the mock server from the command line"""
+    parser = argparse.ArgumentParser(description="Local mock of the OpenAI and Ollama APIs for offline benchmarking")
+    parser.add_argument("--host", default=None, help="Interface to listen on (MOCK_LLM_HOST, default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=None, help="Port to listen on (MOCK_LLM_PORT, default 11500)")
+    args = parser.parse_args()
+
+    server = Mock_LLM_Server(host=args.host, port=args.port)
+    print(f"Mock LLM server on {server.url}")
+    print(f"  OLLAMA_URL={server.url}")
+    print(f"  OPENAI_BASE_URL={server.url}/v1")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import os
+import json
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("model_routing")
+
+# Used for anything the routing file doesn't set
+DEFAULT_ROUTE = {
+    "openai_model": None,
+    "ollama_model": None,
+    "max_tokens": 500,
+    "temperature": 0.7,
+    "timeout": 60
+}
+
+class Model_Routing_Policy:
+    def __init__(self):
+        """Load the per description code / per task model settings"""
+        default_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'model_routing.json')
+        self.ROUTING_PATH = os.getenv("MODEL_ROUTING_PATH", default_path)
+        self.ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+        self.reload()
+
+    def reload(self):
+        """Read the routing table from MODEL_ROUTING_PATH"""
+        self.default = dict(DEFAULT_ROUTE)
+        self.codes = {}
+        self.tasks = {}
+        try:
+            with open(self.ROUTING_PATH, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            self.default.update(table.get("default", {}))
+            self.codes = table.get("codes", {})
+            self.tasks = table.get("tasks", {})
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"Could not load model routing from {self.ROUTING_PATH}, using defaults: {e}")
+
+    def get(self, description_code=None, task=None):
+        """
+        Resolve the settings for a request
+
+        Description code settings override the defaults and task settings
+        override both, e.g. the "shorten" task only lowers the temperature and
+        keeps the code's model and token budget.
+
+        Args:
+            description_code (str, optional): PIES description code
+            task (str, optional): Page task, e.g. "shorten" or "search_normalization"
+
+        Returns:
+            dict: openai_model, ollama_model, max_tokens, temperature and timeout
+        """
+        route = dict(self.default)
+        if not self.ENABLED:
+            return route
+        if description_code:
+            route.update(self.codes.get(description_code, {}))
+        if task:
+            route.update(self.tasks.get(task, {}))
+        return route
+
+    def model_for(self, backend, selected_model, description_code=None, task=None):
+        """
+        Return the model to use for a backend
+
+        A model the user selected always wins; the routed model is only used
+        when none was selected (None), and the client default when the route
+        doesn't name one either.
+        """
+        return selected_model or self.get(description_code, task).get(f"{backend}_model")
+
+    def route_models(self, models=None, description_code=None, task=None):
+        """Return the model per backend for the LLM router, applying routed models over the selected ones"""
+        models = dict(models or {})
+        route = self.get(description_code, task)
+        for backend in ("openai", "ollama"):
+            if route.get(f"{backend}_model"):
+                models[backend] = route[f"{backend}_model"]
+        return models
+
+    def client_params(self, description_code=None, task=None):
+        """Return the max_tokens, temperature and timeout keyword arguments for the AI clients"""
+        route = self.get(description_code, task)
+        return {key: route[key] for key in ("max_tokens", "temperature", "timeout")}
+
+    def apply_to_payload(self, payload, description_code=None, task=None):
+        """
+        Fill a chat completions payload from the routing table
+
+        Settings the caller already put in the payload (such as a temperature
+        chosen on the page) are kept.
+
+        Returns:
+            tuple: (payload, timeout)
+        """
+        route = self.get(description_code, task)
+        payload = dict(payload)
+        if route.get("openai_model"):
+            payload["model"] = route["openai_model"]
+        payload.setdefault("max_tokens", route["max_tokens"])
+        payload.setdefault("temperature", route["temperature"])
+        return payload, route["timeout"]
+
+model_routing = Model_Routing_Policy()
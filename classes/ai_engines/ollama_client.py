@@ -2,7 +2,15 @@ import os
 import requests
 import json
 import logging
+import time
+import threading
 import traceback
+from classes.ai_engines.llm_transport import llm_transport
+from classes.ai_engines.llm_telemetry import llm_telemetry
+from classes.ai_engines.single_flight import single_flight
+from classes.ai_engines.response_cache import llm_response_cache
+from classes.ai_engines.ollama_model_catalog import ollama_model_catalog
+from classes.ai_engines.circuit_breaker import circuit_breakers, Circuit_Open_Error
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,26 +21,136 @@ class Ollama_Client:
         """Initialize the Ollama client"""
         self.OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
         self.DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
+        # How long Ollama keeps a model in memory after a request (e.g. "30m", "-1" for forever)
+        self.KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
 
     # Function to fetch available Ollama models
-    def get_ollama_models(self,ollama_url):
-        """Fetch available models from Ollama server"""
+    def get_ollama_models(self, ollama_url, refresh=False):
+        """Fetch available models from Ollama server (served from the model catalog)"""
         try:
-            response = requests.get(f"{ollama_url}/api/tags")
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                return [model["name"] for model in models]
+            models = ollama_model_catalog.get_model_names(ollama_url, refresh=refresh)
+            if models:
+                return models
             return ["llama2"]  # Default fallback
         except Exception as e:
             return ["llama2"]  # Default fallback
 
-    def generate_with_ollama(self, prompt, model=None):
+    def _build_payload(self, prompt, model, stream=False, response_format=None, max_tokens=None, temperature=None):
+        """Build the /api/generate request body for a prompt"""
+        # Create the system prompt
+        system_prompt = "You are a professional product description writer specializing in concise, engaging, and accurate descriptions for automotive parts."
+        full_prompt = f"{system_prompt}\n\n{prompt}"
+        
+        payload = {
+            "model": model,
+            "prompt": full_prompt,
+            # Sampling settings are only honoured inside options
+            "options": {
+                "temperature": 0.7 if temperature is None else temperature,
+                "num_predict": max_tokens or 500
+            },
+            "keep_alive": self.KEEP_ALIVE,
+            "stream": stream
+        }
+        if response_format:
+            # Ollama takes "json" or a JSON schema for structured output
+            payload["format"] = response_format
+        return payload
+
+    @staticmethod
+    def _cache_key(payload):
+        """Build the response cache key for an /api/generate payload"""
+        return llm_response_cache.make_key(
+            payload["model"],
+            [{"role": "user", "content": payload["prompt"]}],
+            payload["options"]["temperature"],
+            payload.get("format"),
+            backend="ollama",
+            max_tokens=payload["options"]["num_predict"]
+        )
+
+    def stream_with_ollama(self, prompt, model=None, max_chars=None, use_cache=True, max_tokens=None, temperature=None, timeout=None):
+        """
+        Stream generated text from the Ollama API token by token
+        
+        Args:
+            prompt (str): The prompt to send to Ollama
+            model (str, optional): The model to use. Defaults to the one in .env
+            max_chars (int, optional): Stop the generation once the text is longer than this. The text is then
+                unfinished, so leave headroom over a length limit and rewrite rather than fit a stopped text
+            use_cache (bool, optional): Replay a cached response for an identical request
+            max_tokens (int, optional): Output token budget. Defaults to 500
+            temperature (float, optional): Sampling temperature. Defaults to 0.7
+            timeout (float, optional): Request timeout in seconds. Defaults to 60
+            
+        Yields:
+            str: Text fragments as they are generated
+        """
+        model = model or self.DEFAULT_MODEL
+        payload = self._build_payload(prompt, model, stream=True, max_tokens=max_tokens, temperature=temperature)
+        
+        cache_key = None
+        if use_cache:
+            cache_key = self._cache_key(payload)
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for model {model}")
+                llm_telemetry.record("ollama", model, "/api/generate", 0.0, cache_hit=True)
+                yield cached
+                return
+
+        # The stop length is part of the request identity, a shared stream stops where its leader would
+        flight_key = f"{cache_key}:{max_chars}" if cache_key else None
+        yield from single_flight.stream(flight_key, lambda: self._stream_live(payload, model, max_chars, timeout, cache_key))
+
+    def _stream_live(self, payload, model, max_chars, timeout, cache_key):
+        """Send a streamed /api/generate request and yield its text fragments"""
+        response = None
+        try:
+            response = llm_transport.post(f"{self.OLLAMA_URL}/api/generate", backend="ollama", json=payload, timeout=timeout or 60, stream=True)
+            if response.status_code != 200:
+                yield f"Error generating description: Error from Ollama API: {response.status_code} - {response.text}"
+                return
+            
+            content = ""
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                fragment = chunk.get("response", "")
+                if fragment:
+                    content += fragment
+                    yield fragment
+                if chunk.get("done"):
+                    if cache_key and content.strip():
+                        llm_response_cache.set(cache_key, content.strip(), model=model)
+                    break
+                # Closing the response below stops the generation on the server
+                if max_chars and len(content) > max_chars:
+                    break
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error streaming from Ollama: {e}")
+            yield f"Error: Could not stream from Ollama server at {self.OLLAMA_URL}. {e}"
+        except ValueError as e:
+            # A truncated or non-JSON line, e.g. from a proxy cutting the stream
+            logger.error(f"Invalid stream data from Ollama: {e}")
+            yield f"Error generating description: {e}"
+        finally:
+            if response is not None:
+                response.close()
+
+    def generate_with_ollama(self, prompt, model=None, use_cache=True, response_format=None, max_tokens=None, temperature=None, timeout=None):
         """
         Generate text using Ollama API
         
         Args:
             prompt (str): The prompt to send to Ollama
             model (str, optional): The model to use. Defaults to the one in .env
+            use_cache (bool, optional): Reuse a cached response for an identical request
+            response_format (dict or str, optional): JSON schema (or "json") the response must follow
+            max_tokens (int, optional): Output token budget. Defaults to 500
+            temperature (float, optional): Sampling temperature. Defaults to 0.7
+            timeout (float, optional): Request timeout in seconds. Defaults to 60
             
         Returns:
             str: The generated description
@@ -40,24 +158,29 @@ class Ollama_Client:
         model = model or self.DEFAULT_MODEL
         api_url = f"{self.OLLAMA_URL}/api/generate"
         
-        # Create the system prompt
-        system_prompt = "You are a professional product description writer specializing in concise, engaging, and accurate descriptions for automotive parts."
-        full_prompt = f"{system_prompt}\n\n{prompt}"
-        
-        payload = {
-            "model": model,
-            "prompt": full_prompt,
-            "temperature": 0.7,
-            "max_tokens": 500,
-            "stream": False  # Explicitly set to False to avoid streaming
-        }
+        payload = self._build_payload(prompt, model, stream=False, response_format=response_format, max_tokens=max_tokens, temperature=temperature)
         
+        # Serve identical requests from the response cache
+        cache_key = None
+        if use_cache:
+            cache_key = self._cache_key(payload)
+            cached = llm_response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"LLM cache hit for model {model}")
+                llm_telemetry.record("ollama", model, "/api/generate", 0.0, cache_hit=True)
+                return cached
+
+        # Identical requests already in flight share one call
+        return single_flight.do(cache_key, lambda: self._generate_live(api_url, payload, model, timeout, cache_key))
+
+    def _generate_live(self, api_url, payload, model, timeout, cache_key):
+        """Send a non-streamed /api/generate request, returning the text or an error string"""
         logger.info(f"Sending request to Ollama at: {api_url}")
         logger.info(f"Using model: {model}")
         
         try:
-            # Increase timeout to 60 seconds for model loading
-            response = requests.post(api_url, json=payload, timeout=60)
+            # Default to 60 seconds to allow for model loading
+            response = llm_transport.post(api_url, backend="ollama", json=payload, timeout=timeout or 60)
             
             logger.info(f"Response status code: {response.status_code}")
             
@@ -67,6 +190,8 @@ class Ollama_Client:
                     response_json = json.loads(response.text)
                     result = response_json.get("response", "").strip()
                     logger.info("Successfully generated text with Ollama")
+                    if cache_key and result:
+                        llm_response_cache.set(cache_key, result, model=model)
                     return result
                 except json.JSONDecodeError:
                     logger.info("Response appears to be streaming JSON. Trying to parse line by line.")
@@ -84,6 +209,8 @@ class Ollama_Client:
                         
                         if full_response:
                             logger.info("Successfully assembled response from streaming JSON")
+                            if cache_key:
+                                llm_response_cache.set(cache_key, full_response.strip(), model=model)
                             return full_response.strip()
                         else:
                             error_message = f"No valid response content found in streaming output: {response.text[:100]}..."
@@ -96,26 +223,26 @@ class Ollama_Client:
             else:
                 error_message = f"Error from Ollama API: {response.status_code} - {response.text}"
                 logger.error(error_message)
-                # Try to check if Ollama is reachable
+                # Explain the failure from the cached model catalog instead of another /api/tags call
                 try:
-                    health_check = requests.get(f"{self.OLLAMA_URL}/api/tags", timeout=5)
-                    logger.info(f"Ollama server is reachable: Status {health_check.status_code}")
-                    if health_check.status_code == 200:
-                        try:
-                            models = health_check.json().get("models", [])
-                            logger.info(f"Available models: {[m.get('name') for m in models]}")
-                            if not models:
-                                return f"Error: No models found in Ollama. Please pull the model '{model}' first."
-                            elif not any(m.get('name') == model for m in models):
-                                return f"Error: Model '{model}' not found. Available models: {[m.get('name') for m in models]}"
-                        except json.JSONDecodeError:
-                            logger.error("Could not parse JSON from health check")
-                except Exception as health_e:
-                    logger.error(f"Health check failed: {health_e}")
+                    catalog = ollama_model_catalog.get_entry(self.OLLAMA_URL)
+                    if catalog["reachable"]:
+                        model_names = [m["name"] for m in catalog["models"]]
+                        logger.info(f"Available models: {model_names}")
+                        if not model_names:
+                            return f"Error: No models found in Ollama. Please pull the model '{model}' first."
+                        elif model not in model_names:
+                            return f"Error: Model '{model}' not found. Available models: {model_names}"
+                except Exception as catalog_e:
+                    logger.error(f"Model catalog lookup failed: {catalog_e}")
                     
                 return f"Error generating description: {error_message}"
+        except Circuit_Open_Error as coe:
+            # Ollama is known to be down, fail fast instead of waiting for another timeout
+            logger.warning(str(coe))
+            return f"Error: {coe}"
         except requests.exceptions.Timeout:
-            error = "Request to Ollama timed out after 60 seconds. The model might be loading or too large."
+            error = f"Request to Ollama timed out after {timeout or 60} seconds. The model might be loading or too large."
             logger.error(error)
             return f"Error: {error}"
         except requests.exceptions.ConnectionError as ce:
@@ -128,5 +255,225 @@ class Ollama_Client:
             logger.error(error)
             logger.error(traceback.format_exc())
             return f"Error generating description: {e}" 
+
+    def start_chat(self, model=None, system_prompt=None, max_tokens=None, temperature=None, timeout=None):
+        """
+        Start a multi-turn /api/chat session, e.g. for shorten and refine loops
+
+        Follow-up turns only add a short message to the conversation, so Ollama
+        reuses the already evaluated prompt from its KV cache instead of
+        processing the whole description again.
+
+        Args:
+            model (str, optional): The model to use. Defaults to the one in .env
+            system_prompt (str, optional): System message for the conversation
+            max_tokens (int, optional): Output token budget per turn. Defaults to 500
+            temperature (float, optional): Sampling temperature. Defaults to 0.7
+            timeout (float, optional): Request timeout in seconds. Defaults to 60
+
+        Returns:
+            Ollama_Chat_Session: The session to send turns to
+        """
+        return Ollama_Chat_Session(
+            self.OLLAMA_URL,
+            model or self.DEFAULT_MODEL,
+            system_prompt=system_prompt,
+            keep_alive=self.KEEP_ALIVE,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout
+        )
+
+class Ollama_Chat_Session:
+    def __init__(self, ollama_url, model, system_prompt=None, keep_alive=None, max_tokens=None, temperature=None, timeout=None):
+        """A conversation with one Ollama model whose history is resent on every turn"""
+        self.ollama_url = ollama_url
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = timeout or 60
+        self.options = {
+            "temperature": 0.7 if temperature is None else temperature,
+            "num_predict": max_tokens or 500
+        }
+        self.messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+
+        self.turns = 0
+        # Prompt tokens Ollama actually evaluated per turn, low values mean the KV cache was reused
+        self.prompt_eval_counts = []
+        self.prompt_eval_seconds = 0.0
+
+    def send(self, content, response_format=None):
+        """
+        Add a user message and return the model's reply
+
+        Args:
+            content (str): The user message
+            response_format (dict or str, optional): JSON schema (or "json") the reply must follow
+
+        Returns:
+            str: The reply, or an error string starting with "Error"
+        """
+        messages = self.messages + [{"role": "user", "content": content}]
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "options": self.options,
+            "keep_alive": self.keep_alive,
+            "stream": False
+        }
+        if response_format:
+            payload["format"] = response_format
+
+        try:
+            response = llm_transport.post(f"{self.ollama_url}/api/chat", backend="ollama", json=payload, timeout=self.timeout)
+            if response.status_code != 200:
+                error_message = f"Error from Ollama API: {response.status_code} - {response.text}"
+                logger.error(error_message)
+                return f"Error generating description: {error_message}"
+            data = response.json()
+        except Circuit_Open_Error as coe:
+            logger.warning(str(coe))
+            return f"Error: {coe}"
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Error in Ollama chat: {e}")
+            return f"Error generating description: {e}"
+
+        reply = (data.get("message") or {}).get("content", "").strip()
+        # Only a successful turn becomes part of the conversation
+        self.messages = messages + [{"role": "assistant", "content": reply}]
+        self.turns += 1
+        self.prompt_eval_counts.append(data.get("prompt_eval_count", 0))
+        self.prompt_eval_seconds += data.get("prompt_eval_duration", 0) / 1e9
+        return reply
+
+class Ollama_Model_Manager:
+    def __init__(self):
+        """Initialize the Ollama model warm-up and keep-alive manager"""
+        self.OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+        self.DEFAULT_MODEL = os.getenv("OLLAMA_MODEL", "llama3.2:latest")
+        self.KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        # Seconds between keep-alive pings for scheduled models, should be shorter than KEEP_ALIVE
+        self.WARMUP_INTERVAL = float(os.getenv("OLLAMA_WARMUP_INTERVAL", "600"))
+        # Loading a large model from disk can take minutes
+        self.LOAD_TIMEOUT = float(os.getenv("OLLAMA_LOAD_TIMEOUT", "300"))
+
+        self._states = {}
+        self._scheduled = {}
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self._started = False
+
+    def _set_state(self, model, **state):
+        """Update the recorded load state of a model"""
+        with self._lock:
+            self._states.setdefault(model, {"state": "unknown"}).update(state)
+
+    def preload(self, model=None, ollama_url=None):
+        """
+        Load a model into memory and keep it resident for KEEP_ALIVE
+
+        An /api/generate request without a prompt only loads the model.
+
+        Returns:
+            bool: True if the model is loaded
+        """
+        model = model or self.DEFAULT_MODEL
+        ollama_url = ollama_url or self.OLLAMA_URL
+        self._set_state(model, state="loading", error=None)
+        start = time.perf_counter()
+        try:
+            response = llm_transport.post(
+                f"{ollama_url}/api/generate",
+                json={"model": model, "keep_alive": self.KEEP_ALIVE, "stream": False},
+                timeout=self.LOAD_TIMEOUT
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"{response.status_code} - {response.text}")
+            load_seconds = time.perf_counter() - start
+            self._set_state(model, state="loaded", loaded_at=time.time(), load_seconds=load_seconds)
+            logger.info(f"Ollama model {model} loaded in {load_seconds:.1f}s (keep_alive={self.KEEP_ALIVE})")
+            return True
+        except Exception as e:
+            self._set_state(model, state="error", error=str(e))
+            logger.error(f"Could not preload Ollama model {model}: {e}")
+            return False
+
+    def preload_async(self, model=None, ollama_url=None):
+        """Preload a model in a background thread"""
+        thread = threading.Thread(target=self.preload, args=(model, ollama_url), daemon=True, name="ollama_preload")
+        thread.start()
+        return thread
+
+    def start(self):
+        """Preload the configured OLLAMA_MODEL once per process and keep it warm"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.schedule_warmup(self.DEFAULT_MODEL)
+
+    def schedule_warmup(self, model, ollama_url=None):
+        """
+        Warm a model up now and keep pinging it so it stays resident
+
+        Args:
+            model (str): Model selected by the user
+            ollama_url (str, optional): Ollama server URL
+        """
+        ollama_url = ollama_url or self.OLLAMA_URL
+        with self._lock:
+            already_scheduled = self._scheduled.get(model) == ollama_url
+            self._scheduled[model] = ollama_url
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._keep_warm, daemon=True, name="ollama_keep_warm")
+                self._scheduler.start()
+        if not already_scheduled:
+            self.preload_async(model, ollama_url)
+
+    def _keep_warm(self):
+        """Background loop that re-pings every scheduled model"""
+        while True:
+            time.sleep(self.WARMUP_INTERVAL)
+            with self._lock:
+                scheduled = list(self._scheduled.items())
+            for model, ollama_url in scheduled:
+                self.preload(model, ollama_url)
+
+    def refresh_load_state(self, ollama_url=None):
+        """Ask Ollama which models are currently loaded (/api/ps) and update the recorded state"""
+        ollama_url = ollama_url or self.OLLAMA_URL
+        try:
+            response = llm_transport.get(f"{ollama_url}/api/ps", timeout=5)
+            response.raise_for_status()
+            running = {m.get("name"): m for m in response.json().get("models", [])}
+        except Exception as e:
+            logger.error(f"Could not read Ollama load state: {e}")
+            return self.load_state()
+
+        with self._lock:
+            for model, state in self._states.items():
+                if model in running:
+                    state.update(state="loaded", expires_at=running[model].get("expires_at"))
+                elif state.get("state") == "loaded":
+                    state.update(state="unloaded")
+            for model, info in running.items():
+                if model not in self._states:
+                    self._states[model] = {"state": "loaded", "expires_at": info.get("expires_at")}
+        return self.load_state()
+
+    def load_state(self, model=None):
+        """
+        Report the load state of one model, or of every known model
+
+        Returns:
+            dict: state is one of unknown, loading, loaded, unloaded or error
+        """
+        with self._lock:
+            if model:
+                return dict(self._states.get(model, {"state": "unknown"}))
+            return {name: dict(state) for name, state in self._states.items()}
         
 ollama_client = Ollama_Client()
+ollama_model_manager = Ollama_Model_Manager()
+# The breaker closes again as soon as /api/tags answers (this also refreshes the model catalog)
+circuit_breakers.set_probe("ollama", lambda: ollama_model_catalog.refresh(ollama_client.OLLAMA_URL)["reachable"])
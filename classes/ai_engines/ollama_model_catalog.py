@@ -0,0 +1,134 @@
+import os
+import time
+import logging
+import threading
+
+from classes.ai_engines.llm_transport import llm_transport
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("ollama_model_catalog")
+
+class Ollama_Model_Catalog:
+    def __init__(self):
+        """Initialize the cached Ollama model catalog"""
+        self.OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+        # Seconds a successful /api/tags listing is served before it is refreshed in the background
+        self.TTL = float(os.getenv("OLLAMA_CATALOG_TTL", "300"))
+        # Seconds a failed listing is remembered, so an unreachable server isn't polled on every request
+        self.ERROR_TTL = float(os.getenv("OLLAMA_CATALOG_ERROR_TTL", "30"))
+
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def _is_fresh(self, entry):
+        """Check whether a catalog entry is still within its TTL"""
+        ttl = self.TTL if entry["reachable"] else self.ERROR_TTL
+        return time.time() - entry["fetched_at"] < ttl
+
+    def refresh(self, ollama_url=None):
+        """
+        Fetch the model list from /api/tags and store it
+
+        Returns:
+            dict: The catalog entry (models, reachable, error, fetched_at)
+        """
+        ollama_url = ollama_url or self.OLLAMA_URL
+        entry = {"models": [], "reachable": False, "error": None, "fetched_at": time.time()}
+        try:
+            response = llm_transport.get(f"{ollama_url}/api/tags", timeout=5)
+            entry["reachable"] = True
+            if response.status_code == 200:
+                entry["models"] = [
+                    {
+                        "name": model.get("name"),
+                        "size": model.get("size"),
+                        "digest": model.get("digest"),
+                        "modified_at": model.get("modified_at"),
+                        "details": model.get("details", {})
+                    }
+                    for model in response.json().get("models", [])
+                ]
+            else:
+                entry["error"] = f"{response.status_code} - {response.text}"
+        except Exception as e:
+            entry["error"] = str(e)
+            logger.error(f"Could not fetch Ollama models from {ollama_url}: {e}")
+
+        with self._lock:
+            # Keep the last known model list if the server is temporarily unreachable
+            previous = self._entries.get(ollama_url)
+            if not entry["reachable"] and previous:
+                entry["models"] = previous["models"]
+            self._entries[ollama_url] = entry
+        return entry
+
+    def _refresh_in_background(self, ollama_url):
+        """Start a background refresh unless one is already running for this server"""
+        with self._lock:
+            if ollama_url in self._refreshing:
+                return
+            self._refreshing.add(ollama_url)
+
+        def run():
+            try:
+                self.refresh(ollama_url)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(ollama_url)
+
+        threading.Thread(target=run, daemon=True, name="ollama_catalog_refresh").start()
+
+    def get_entry(self, ollama_url=None, refresh=False):
+        """
+        Return the catalog entry for a server
+
+        A stale entry is returned immediately while it is refreshed in the
+        background; only the very first lookup waits for /api/tags.
+
+        Args:
+            ollama_url (str, optional): Ollama server URL
+            refresh (bool): Force a synchronous refresh
+        """
+        ollama_url = ollama_url or self.OLLAMA_URL
+        with self._lock:
+            entry = self._entries.get(ollama_url)
+
+        if refresh:
+            return self.refresh(ollama_url)
+        if entry is None:
+            # Let concurrent first lookups share one request
+            with self._fetch_lock:
+                with self._lock:
+                    entry = self._entries.get(ollama_url)
+                if entry is None:
+                    entry = self.refresh(ollama_url)
+            return entry
+        if not self._is_fresh(entry):
+            self._refresh_in_background(ollama_url)
+        return entry
+
+    def get_models(self, ollama_url=None, refresh=False):
+        """Return the models (name, size, digest, modified_at, details) on a server"""
+        return self.get_entry(ollama_url, refresh=refresh)["models"]
+
+    def get_model_names(self, ollama_url=None, refresh=False):
+        """Return the names of the models on a server"""
+        return [model["name"] for model in self.get_models(ollama_url, refresh=refresh)]
+
+    def has_model(self, model, ollama_url=None):
+        """Check whether a model has been pulled on a server"""
+        return model in self.get_model_names(ollama_url)
+
+    def is_reachable(self, ollama_url=None):
+        """Report whether the last /api/tags call reached the server"""
+        return self.get_entry(ollama_url)["reachable"]
+
+    def invalidate(self, ollama_url=None):
+        """Drop the cached listing for a server (e.g. after pulling a model)"""
+        with self._lock:
+            self._entries.pop(ollama_url or self.OLLAMA_URL, None)
+
+ollama_model_catalog = Ollama_Model_Catalog()
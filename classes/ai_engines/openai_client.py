@@ -1,44 +1,125 @@
 import os
-from openai import OpenAI
+from classes.ai_engines.llm_transport import llm_transport
 
 class OpenAI_Client:
     def __init__(self):
         self.api_key = os.getenv("OwadmasdujU")
         self.DEFAULT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-nano")
 
-    def generate_with_openai(self, prompt, model=None, language_code=None):
+    def _get_api_key(self):
+        """Return the API key to use, raising if none is set"""
+        if not self.api_key and not os.getenv("OPENAI_API_KEY"):
+            raise ValueError("OpenAI API key is not set")
+        return os.getenv("OPENAI_API_KEY") or self.api_key
+
+    def _build_payload(self, prompt, model, response_format=None, max_tokens=None, temperature=None):
+        """Build the chat completions request body for a prompt"""
+        payload = {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": "You are a professional product description writer specializing in concise, engaging, and accurate descriptions for automotive parts."},
+                {"role": "user", "content": prompt}
+            ],
+            "max_tokens": max_tokens or 500,
+            "temperature": 0.7 if temperature is None else temperature
+        }
+        if response_format:
+            payload["response_format"] = response_format
+        return payload
+
+    def generate_with_openai(self, prompt, model=None, language_code=None, use_cache=True, response_format=None, max_tokens=None, temperature=None, timeout=None):
         """
         Generate text using OpenAI API
-        
+
         Args:
             prompt (str): The prompt to send to OpenAI
             model (str, optional): The model to use. Defaults to the one in .env
-            
+            use_cache (bool, optional): Reuse a cached response for an identical request
+            response_format (dict, optional): Structured output format, e.g. a json_schema response format
+            max_tokens (int, optional): Output token budget. Defaults to 500
+            temperature (float, optional): Sampling temperature. Defaults to 0.7
+            timeout (float, optional): Request timeout in seconds
+
         Returns:
             str: The generated description
         """
-        if not self.api_key and not os.getenv("OPENAI_API_KEY"):
-            raise ValueError("OpenAI API key is not set")
-        
+        api_key = self._get_api_key()
         model = model or self.DEFAULT_MODEL
-        
+
         try:
-            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY") or self.api_key)
-            
-            response = client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "You are a professional product description writer specializing in concise, engaging, and accurate descriptions for automotive parts."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            return response.choices[0].message.content.strip()
+            payload = self._build_payload(prompt, model, response_format=response_format, max_tokens=max_tokens, temperature=temperature)
+
+            # Shared pooled transport so repeated calls reuse open connections
+            response = llm_transport.chat_completion(payload, api_key, timeout=timeout, use_cache=use_cache)
+
+            return response["choices"][0]["message"]["content"].strip()
         except Exception as e:
             print(f"Error generating with OpenAI: {e}")
-            return f"Error generating description: {e}" 
-        
+            return f"Error generating description: {e}"
+
+    def generate_candidates_with_openai(self, prompt, n, model=None, use_cache=True, temperature=1.0, max_tokens=None, timeout=None):
+        """
+        Generate several alternative completions for one prompt in a single request
+
+        Args:
+            prompt (str): The prompt to send to OpenAI
+            n (int): Number of candidates to generate
+            model (str, optional): The model to use. Defaults to the one in .env
+            use_cache (bool, optional): Reuse cached candidates for an identical request
+            temperature (float, optional): Sampling temperature, higher gives more varied candidates
+            max_tokens (int, optional): Output token budget per candidate. Defaults to 500
+            timeout (float, optional): Request timeout in seconds
+
+        Returns:
+            list: The candidate texts, or a single error string
+        """
+        api_key = self._get_api_key()
+        model = model or self.DEFAULT_MODEL
+
+        try:
+            payload = self._build_payload(prompt, model, max_tokens=max_tokens, temperature=temperature)
+            payload["n"] = n
+
+            # The prompt is only billed once, each extra candidate costs its output tokens
+            response = llm_transport.chat_completion(payload, api_key, timeout=timeout, use_cache=use_cache)
+
+            return [choice["message"]["content"].strip() for choice in response["choices"]]
+        except Exception as e:
+            print(f"Error generating candidates with OpenAI: {e}")
+            return [f"Error generating description: {e}"]
+
+    def stream_with_openai(self, prompt, model=None, max_chars=None, use_cache=True, max_tokens=None, temperature=None, timeout=None):
+        """
+        Stream generated text from the OpenAI API token by token
+
+        Args:
+            prompt (str): The prompt to send to OpenAI
+            model (str, optional): The model to use. Defaults to the one in .env
+            max_chars (int, optional): Stop the generation once the text is longer than this. The text is then
+                unfinished, so leave headroom over a length limit and rewrite rather than fit a stopped text
+            use_cache (bool, optional): Replay a cached response for an identical request
+            max_tokens (int, optional): Output token budget. Defaults to 500
+            temperature (float, optional): Sampling temperature. Defaults to 0.7
+            timeout (float, optional): Request timeout in seconds
+
+        Yields:
+            str: Text fragments as they are generated
+        """
+        api_key = self._get_api_key()
+        model = model or self.DEFAULT_MODEL
+
+        try:
+            generated = 0
+            payload = self._build_payload(prompt, model, max_tokens=max_tokens, temperature=temperature)
+            for fragment in llm_transport.stream_chat_completion(payload, api_key, timeout=timeout, use_cache=use_cache):
+                yield fragment
+                generated += len(fragment)
+                # Leaving the loop closes the stream and cancels the generation
+                if max_chars and generated > max_chars:
+                    break
+        except Exception as e:
+            print(f"Error streaming with OpenAI: {e}")
+            yield f"Error generating description: {e}"
+
 
 openai_client = OpenAI_Client()
@@ -0,0 +1,216 @@
+import os
+import re
+import time
+import random
+import logging
+import threading
+import email.utils
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("rate_limiter")
+
+# Default (requests per minute, tokens per minute) per backend; 0 means unlimited
+DEFAULT_LIMITS = {
+    "openai": (500, 200000),
+    "ollama": (0, 0)
+}
+
+def parse_duration(value):
+    """
+    Parse a rate-limit reset duration such as "1s", "6m0s", "20ms" or "0.5"
+
+    Returns:
+        float: Seconds, or None if the value can't be parsed
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value)
+    if not parts:
+        return None
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+def parse_retry_after(headers):
+    """
+    Read the server-requested wait from retry-after style headers
+
+    Returns:
+        float: Seconds to wait, or None if the server didn't say
+    """
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        seconds = parse_duration(retry_after_ms)
+        if seconds is not None:
+            return seconds / 1000
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    seconds = parse_duration(retry_after)
+    if seconds is not None:
+        return seconds
+    # retry-after may also be an HTTP date
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(payload):
+    """Roughly estimate the tokens a request will consume (about 4 characters per token plus the output budget)"""
+    if not isinstance(payload, dict):
+        return 0
+    characters = len(payload.get("prompt") or "")
+    for message in payload.get("messages") or []:
+        content = message.get("content")
+        characters += len(content) if isinstance(content, str) else len(str(content or ""))
+    max_tokens = payload.get("max_tokens") or payload.get("max_completion_tokens") or (payload.get("options") or {}).get("num_predict") or 0
+    return characters // 4 + int(max_tokens)
+
+class Token_Bucket:
+    def __init__(self, per_minute):
+        """A token bucket refilled continuously at per_minute tokens per minute (0 disables it)"""
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        """Add the tokens earned since the last update"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount):
+        """
+        Take tokens from the bucket, going into debt if needed
+
+        Returns:
+            float: Seconds the caller must wait before the reserved tokens are available
+        """
+        if self.capacity <= 0 or amount <= 0:
+            return 0.0
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def sync(self, remaining, limit=None):
+        """Align the bucket with the remaining budget reported by the provider"""
+        with self._lock:
+            if limit:
+                self.capacity = float(limit)
+                self.rate = self.capacity / 60.0
+            if self.capacity <= 0:
+                return
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, float(remaining))
+
+class Rate_Limiter:
+    def __init__(self, name, requests_per_minute=0, tokens_per_minute=0):
+        """Pace callers of one backend by requests per minute and tokens per minute"""
+        self.name = name
+        self.requests = Token_Bucket(requests_per_minute)
+        self.tokens = Token_Bucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, estimated_tokens=0):
+        """
+        Block until a request with the estimated token count may be sent
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        wait = max(
+            self.requests.reserve(1),
+            self.tokens.reserve(estimated_tokens),
+            self._paused_until - time.monotonic()
+        )
+        if wait > 0:
+            logger.info(f"Rate limiter '{self.name}' pacing request for {wait:.2f}s")
+            time.sleep(wait)
+            return wait
+        return 0.0
+
+    def pause(self, seconds):
+        """Hold back every caller of this backend for the given number of seconds"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers):
+        """Sync the buckets with x-ratelimit-* response headers"""
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        if remaining_requests is not None:
+            try:
+                self.requests.sync(int(remaining_requests), int(headers.get("x-ratelimit-limit-requests") or 0))
+                if int(remaining_requests) <= 0:
+                    reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                    if reset:
+                        self.pause(reset)
+            except ValueError:
+                pass
+
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            try:
+                self.tokens.sync(int(remaining_tokens), int(headers.get("x-ratelimit-limit-tokens") or 0))
+                if int(remaining_tokens) <= 0:
+                    reset = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+                    if reset:
+                        self.pause(reset)
+            except ValueError:
+                pass
+
+class Rate_Limiter_Registry:
+    def __init__(self):
+        """Process-wide rate limiters, one per backend"""
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def get(self, backend):
+        """Return the limiter for a backend, configured from {BACKEND}_RPM / {BACKEND}_TPM"""
+        with self._lock:
+            limiter = self._limiters.get(backend)
+            if limiter is None:
+                default_rpm, default_tpm = DEFAULT_LIMITS.get(backend, (0, 0))
+                limiter = Rate_Limiter(
+                    backend,
+                    requests_per_minute=int(os.getenv(f"{backend.upper()}_RPM", str(default_rpm))),
+                    tokens_per_minute=int(os.getenv(f"{backend.upper()}_TPM", str(default_tpm)))
+                )
+                self._limiters[backend] = limiter
+            return limiter
+
+class Retry_Policy:
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self):
+        """Jittered exponential backoff settings"""
+        self.MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self.BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+        self.BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        Seconds to wait before retry number attempt + 1 (full jitter)
+
+        Args:
+            attempt (int): Number of retries already made
+            retry_after (float, optional): Wait requested by the server
+        """
+        delay = random.uniform(0, min(self.BACKOFF_MAX, self.BACKOFF_BASE * (2 ** attempt)))
+        if retry_after is not None:
+            # Never retry before the server asked us to, and spread out the callers that were told the same time
+            delay = max(delay, retry_after + random.uniform(0, self.BACKOFF_BASE))
+        return delay
+
+rate_limiters = Rate_Limiter_Registry()
+retry_policy = Retry_Policy()
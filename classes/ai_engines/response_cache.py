@@ -0,0 +1,164 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from classes.db.database import DB_DIR
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("response_cache")
+
+class LLM_Response_Cache:
+    def __init__(self, db_path=None):
+        """Initialize the SQLite-backed LLM response cache"""
+        self.db_path = db_path or os.getenv("LLM_CACHE_PATH", os.path.join(DB_DIR, "llm_cache.db"))
+        self.ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        # Entries older than the TTL are treated as misses (default 7 days)
+        self.TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+        # Least recently used entries are evicted beyond this size
+        self.MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self):
+        """Open the cache database on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_cache (last_accessed)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(model, messages, temperature=None, response_format=None, **params):
+        """
+        Build a cache key from the request parameters that determine the output
+
+        Args:
+            model (str): Model name
+            messages (list): Chat messages sent to the model
+            temperature (float, optional): Sampling temperature
+            response_format (dict, optional): Requested response format
+            **params: Any other parameters that change the output (backend, max_tokens, ...)
+
+        Returns:
+            str: SHA-256 hex digest of the canonical request
+        """
+        canonical = json.dumps({
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "response_format": response_format,
+            "params": params
+        }, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Returns:
+            The cached response (str or dict), or None on a miss
+        """
+        if not self.ENABLED:
+            return None
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row is None or now - row[1] > self.TTL:
+                    self.misses += 1
+                    return None
+                conn.execute(
+                    "UPDATE llm_cache SET last_accessed = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                    (now, key)
+                )
+                conn.commit()
+                self.hits += 1
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.error(f"Error reading LLM cache: {e}")
+            return None
+
+    def set(self, key, response, model=None):
+        """Store a response and evict the least recently used entries beyond the size limit"""
+        if not self.ENABLED:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                conn.execute(
+                    """
+                    INSERT INTO llm_cache (cache_key, model, response, created_at, last_accessed)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(cache_key) DO UPDATE SET
+                        response = excluded.response,
+                        created_at = excluded.created_at,
+                        last_accessed = excluded.last_accessed
+                    """,
+                    (key, model, json.dumps(response, ensure_ascii=False), now, now)
+                )
+                conn.execute(
+                    """
+                    DELETE FROM llm_cache WHERE cache_key IN (
+                        SELECT cache_key FROM llm_cache ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+                    )
+                    """,
+                    (self.MAX_ENTRIES,)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing LLM cache: {e}")
+
+    def purge_expired(self):
+        """Delete entries older than the TTL"""
+        with self._lock:
+            conn = self._get_connection()
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.TTL,))
+            conn.commit()
+
+    def clear(self):
+        """Delete every cached response and reset the counters"""
+        with self._lock:
+            conn = self._get_connection()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored entries"""
+        with self._lock:
+            entries = self._get_connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+llm_response_cache = LLM_Response_Cache()
@@ -0,0 +1,151 @@
+import os
+import logging
+import threading
+from concurrent.futures import Future
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("single_flight")
+
+class Shared_Stream:
+    def __init__(self, source):
+        """A streamed answer read once from the source and replayed to every subscriber"""
+        self.source = source
+        self.fragments = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self._lock = threading.Lock()
+
+    def fragment(self, index):
+        """
+        Return fragment number index, reading it from the source if nobody has yet
+
+        Whichever subscriber is furthest ahead pulls the next fragment, so the
+        stream keeps going when the first caller leaves early.
+
+        Returns:
+            str: The fragment, or None at the end of the stream
+        """
+        with self._lock:
+            while len(self.fragments) <= index and not self.done:
+                try:
+                    self.fragments.append(next(self.source))
+                except StopIteration:
+                    self.done = True
+                except Exception as e:
+                    self.error = e
+                    self.done = True
+            if index < len(self.fragments):
+                return self.fragments[index]
+            if self.error is not None:
+                raise self.error
+            return None
+
+    def close(self):
+        """Close the source, which stops the generation on the server"""
+        with self._lock:
+            self.source.close()
+
+class Single_Flight:
+    def __init__(self):
+        """Initialize in-flight request coalescing"""
+        self.ENABLED = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+
+        self.leaders = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Run fn once for all concurrent callers with the same key
+
+        The first caller runs fn; callers arriving while it is in flight wait
+        for the same result (or exception) instead of sending their own request.
+
+        Args:
+            key (str): Request identity, e.g. the response cache key
+            fn (callable): Makes the request and returns its result
+
+        Returns:
+            The result of fn
+        """
+        if not self.ENABLED or key is None:
+            return fn()
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            logger.info("Joined an identical in-flight LLM request")
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stream(self, key, factory):
+        """
+        Share one streamed answer between all concurrent callers with the same key
+
+        Args:
+            key (str): Request identity, e.g. the response cache key
+            factory (callable): Returns a new generator of fragments for the request
+
+        Yields:
+            str: Fragments, to every subscriber in the same order
+        """
+        if not self.ENABLED or key is None:
+            yield from factory()
+            return
+
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is None:
+                shared = Shared_Stream(factory())
+                self._streams[key] = shared
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+                logger.info("Joined an identical in-flight LLM stream")
+            shared.subscribers += 1
+
+        index = 0
+        try:
+            while True:
+                fragment = shared.fragment(index)
+                if fragment is None:
+                    return
+                index += 1
+                yield fragment
+        finally:
+            with self._lock:
+                shared.subscribers -= 1
+                last = shared.subscribers == 0
+                if (shared.done or last) and self._streams.get(key) is shared:
+                    del self._streams[key]
+            # Only when everyone has left is the generation stopped
+            if last and not shared.done:
+                shared.close()
+
+    def stats(self):
+        with self._lock:
+            return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": len(self._calls) + len(self._streams)}
+
+single_flight = Single_Flight()
@@ -15,6 +15,50 @@ CREATE TABLE IF NOT EXISTS parts (
     UNIQUE (part_number)
 );
 
+-- Indexes for browsing parts by category or brand in part number order
+CREATE INDEX IF NOT EXISTS idx_parts_category ON parts (product_category, part_number);
+CREATE INDEX IF NOT EXISTS idx_parts_brand ON parts (brand, part_number);
+
+-- Full-text index over the parts catalog, kept in sync by triggers
+-- External content table: the text lives in parts, the index only stores tokens
+CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5(
+    part_number,
+    product_category,
+    brand,
+    part_type,
+    engine_application,
+    fitment,
+    content='parts',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- Rank part number matches first, then category and brand
+INSERT INTO parts_fts (parts_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 4.0, 2.0, 1.0, 1.0)');
+
+-- Keep the index in sync with parts
+CREATE TRIGGER IF NOT EXISTS parts_fts_insert AFTER INSERT ON parts BEGIN
+    INSERT INTO parts_fts (rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES (new.id, new.part_number, new.product_category, new.brand, new.part_type, new.engine_application, new.fitment);
+END;
+
+CREATE TRIGGER IF NOT EXISTS parts_fts_delete AFTER DELETE ON parts BEGIN
+    INSERT INTO parts_fts (parts_fts, rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES ('delete', old.id, old.part_number, old.product_category, old.brand, old.part_type, old.engine_application, old.fitment);
+END;
+
+-- Upserts that rewrite a part with the same values leave the index alone
+CREATE TRIGGER IF NOT EXISTS parts_fts_update AFTER UPDATE OF part_number, product_category, brand, part_type, engine_application, fitment ON parts
+WHEN old.part_number IS NOT new.part_number OR old.product_category IS NOT new.product_category OR old.brand IS NOT new.brand
+    OR old.part_type IS NOT new.part_type OR old.engine_application IS NOT new.engine_application OR old.fitment IS NOT new.fitment
+BEGIN
+    INSERT INTO parts_fts (parts_fts, rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES ('delete', old.id, old.part_number, old.product_category, old.brand, old.part_type, old.engine_application, old.fitment);
+    INSERT INTO parts_fts (rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES (new.id, new.part_number, new.product_category, new.brand, new.part_type, new.engine_application, new.fitment);
+END;
+
 -- Descriptions table to store generated descriptions
 CREATE TABLE IF NOT EXISTS descriptions (
     id INTEGER PRIMARY KEY,
@@ -78,6 +122,35 @@ CREATE TABLE IF NOT EXISTS export_history (
     FOREIGN KEY (part_id) REFERENCES parts(id) ON DELETE SET NULL
 );
 
+-- Create table for per-call LLM telemetry (latency, tokens, cost)
+CREATE TABLE IF NOT EXISTS generation_logs (
+    id INTEGER PRIMARY KEY,
+    product_id INT,
+    prompt TEXT,
+    engine VARCHAR(20),
+    result TEXT,
+    page VARCHAR(100),
+    backend VARCHAR(20),
+    model VARCHAR(100),
+    endpoint VARCHAR(100),
+    status INT,
+    wall_time_ms REAL,
+    ttft_ms REAL,
+    prompt_tokens INT,
+    completion_tokens INT,
+    cached_tokens INT,
+    retry_count INT NOT NULL DEFAULT 0,
+    cache_hit INT NOT NULL DEFAULT 0,
+    cost_usd REAL,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_generation_logs_created_at ON generation_logs (created_at);
+CREATE INDEX IF NOT EXISTS idx_generation_logs_page ON generation_logs (page, created_at);
+CREATE INDEX IF NOT EXISTS idx_generation_logs_model ON generation_logs (model, created_at);
+CREATE INDEX IF NOT EXISTS idx_generation_logs_product ON generation_logs (product_id);
+
 -- Create users table for authentication (if needed)
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY,
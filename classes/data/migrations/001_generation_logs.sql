@@ -0,0 +1,28 @@
+-- Per-call LLM telemetry, written by classes/ai_engines/llm_telemetry.py
+CREATE TABLE IF NOT EXISTS generation_logs (
+    id INTEGER PRIMARY KEY,
+    product_id INT,
+    prompt TEXT,
+    engine VARCHAR(20),
+    result TEXT,
+    page VARCHAR(100),
+    backend VARCHAR(20),
+    model VARCHAR(100),
+    endpoint VARCHAR(100),
+    status INT,
+    wall_time_ms REAL,
+    ttft_ms REAL,
+    prompt_tokens INT,
+    completion_tokens INT,
+    cached_tokens INT,
+    retry_count INT NOT NULL DEFAULT 0,
+    cache_hit INT NOT NULL DEFAULT 0,
+    cost_usd REAL,
+    error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_generation_logs_created_at ON generation_logs (created_at);
+CREATE INDEX IF NOT EXISTS idx_generation_logs_page ON generation_logs (page, created_at);
+CREATE INDEX IF NOT EXISTS idx_generation_logs_model ON generation_logs (model, created_at);
+CREATE INDEX IF NOT EXISTS idx_generation_logs_product ON generation_logs (product_id);
@@ -0,0 +1,42 @@
+-- Full-text index over the parts catalog, searched by Database.search_parts
+-- External content table: the text lives in parts, the index only stores tokens
+CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5(
+    part_number,
+    product_category,
+    brand,
+    part_type,
+    engine_application,
+    fitment,
+    content='parts',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+-- Rank part number matches first, then category and brand
+INSERT INTO parts_fts (parts_fts, rank) VALUES ('rank', 'bm25(10.0, 4.0, 4.0, 2.0, 1.0, 1.0)');
+
+-- Keep the index in sync with parts
+CREATE TRIGGER IF NOT EXISTS parts_fts_insert AFTER INSERT ON parts BEGIN
+    INSERT INTO parts_fts (rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES (new.id, new.part_number, new.product_category, new.brand, new.part_type, new.engine_application, new.fitment);
+END;
+
+CREATE TRIGGER IF NOT EXISTS parts_fts_delete AFTER DELETE ON parts BEGIN
+    INSERT INTO parts_fts (parts_fts, rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES ('delete', old.id, old.part_number, old.product_category, old.brand, old.part_type, old.engine_application, old.fitment);
+END;
+
+-- Upserts that rewrite a part with the same values leave the index alone
+CREATE TRIGGER IF NOT EXISTS parts_fts_update AFTER UPDATE OF part_number, product_category, brand, part_type, engine_application, fitment ON parts
+WHEN old.part_number IS NOT new.part_number OR old.product_category IS NOT new.product_category OR old.brand IS NOT new.brand
+    OR old.part_type IS NOT new.part_type OR old.engine_application IS NOT new.engine_application OR old.fitment IS NOT new.fitment
+BEGIN
+    INSERT INTO parts_fts (parts_fts, rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES ('delete', old.id, old.part_number, old.product_category, old.brand, old.part_type, old.engine_application, old.fitment);
+    INSERT INTO parts_fts (rowid, part_number, product_category, brand, part_type, engine_application, fitment)
+    VALUES (new.id, new.part_number, new.product_category, new.brand, new.part_type, new.engine_application, new.fitment);
+END;
+
+-- Index the parts that existed before the table
+INSERT INTO parts_fts (parts_fts) VALUES ('rebuild');
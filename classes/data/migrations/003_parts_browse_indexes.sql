@@ -0,0 +1,3 @@
+-- Indexes for Database.browse_parts: filtered pages are read in part number order
+CREATE INDEX IF NOT EXISTS idx_parts_category ON parts (product_category, part_number);
+CREATE INDEX IF NOT EXISTS idx_parts_brand ON parts (brand, part_number);
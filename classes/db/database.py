@@ -1,23 +1,104 @@
 import os
+import re
+import atexit
 import sqlite3
 import datetime
+import threading
 
 # Define the path to the database
 DB_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(DB_DIR, 'pies.db')
 
+# Descriptions are unique per part, code, sequence and language; a new text replaces the stored one
+DESCRIPTION_UPSERT_QUERY = """
+INSERT INTO descriptions (part_id, language_code, maintenance_type, description_code, sequence, description_text)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(part_id, description_code, sequence, language_code) DO UPDATE SET
+    maintenance_type = excluded.maintenance_type,
+    description_text = excluded.description_text,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
 class Database:
     def __init__(self, db_path=DB_PATH):
         self.db_path = db_path
+        # NORMAL is safe with WAL: a power loss can only lose the last commits, never corrupt the file
+        self.SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+        # Bytes of the database file read through memory mapping, 0 turns it off
+        self.MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+        # Page cache per connection; negative values are KiB, positive values pages
+        self.CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-65536"))
+        # Milliseconds a writer waits for another writer's lock before failing
+        self.BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))
+
+        self._local = threading.local()
+        # Connection per owning thread, so connections of finished threads can be handed on
+        self._owners = {}
+        self._lock = threading.Lock()
         
-    def get_connection(self):
-        """Get a database connection"""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self):
+        """Open and configure a new connection"""
+        # The connection is only ever used by its owning thread, but ownership moves to a new
+        # thread once the old one has finished (Streamlit runs every rerun in a new thread)
+        conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT / 1000, check_same_thread=False)
+        # WAL lets readers continue while a background thread writes
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute(f"PRAGMA synchronous = {self.SYNCHRONOUS}")
+        conn.execute(f"PRAGMA mmap_size = {self.MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = {self.CACHE_SIZE}")
+        conn.execute(f"PRAGMA busy_timeout = {self.BUSY_TIMEOUT}")
         # Enable foreign keys
         conn.execute("PRAGMA foreign_keys = ON")
         # Set row factory to return rows as dictionaries
         conn.row_factory = self._dict_factory
         return conn
+
+    def get_connection(self):
+        """
+        Get this thread's database connection
+
+        The connection stays open and is reused by every query of the thread;
+        callers must not close it. A thread without a connection takes over
+        the connection of a thread that has finished, or opens a new one.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        thread = threading.current_thread()
+        with self._lock:
+            for owner in list(self._owners):
+                if not owner.is_alive():
+                    conn = self._owners.pop(owner)
+                    break
+            if conn is None:
+                conn = self._connect()
+            self._owners[thread] = conn
+        self._local.conn = conn
+        return conn
+
+    def close_connection(self):
+        """Close this thread's connection, the next query opens a new one"""
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        with self._lock:
+            self._owners.pop(threading.current_thread(), None)
+        if conn is not None:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def close_all(self):
+        """Close every connection, e.g. at interpreter exit"""
+        with self._lock:
+            connections = list(self._owners.values())
+            self._owners = {}
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
     
     @staticmethod
     def _dict_factory(cursor, row):
@@ -25,16 +106,17 @@ class Database:
         return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
     
     def connection_status(self):
-        """Check if the database connection is successful"""
-        try:
-            conn = self.get_connection()
-            conn.close()
-            return True
-        except Exception as e:
-            return False
+        """Check if the database is reachable, reconnecting once if this thread's connection broke"""
+        for _ in range(2):
+            try:
+                self.get_connection().execute("SELECT 1").fetchone()
+                return True
+            except sqlite3.Error:
+                self.close_connection()
+        return False
 
     def execute_query(self, query, params=None, fetch_all=True):
-        """Execute a query and return results"""
+        """Execute a query on this thread's connection and return results"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
@@ -49,14 +131,18 @@ class Database:
                 return cursor.lastrowid
             else:
                 if fetch_all:
-                    return cursor.fetchall()
+                    rows = cursor.fetchall()
                 else:
-                    return cursor.fetchone()
+                    rows = cursor.fetchone()
+                # The connection is reused, so no statement may leave a transaction open
+                if conn.in_transaction:
+                    conn.commit()
+                return rows
         except Exception as e:
             conn.rollback()
             raise e
         finally:
-            conn.close()
+            cursor.close()
     
     def get_products(self, limit=None):
         """Get all products from the database"""
@@ -70,6 +156,175 @@ class Database:
         query = "SELECT * FROM products WHERE id = ?"
         return self.execute_query(query, (product_id,), fetch_all=False)
     
+    def get_parts(self, part_numbers=None, limit=None):
+        """Get parts, optionally restricted to a list of part numbers"""
+        query = "SELECT * FROM parts"
+        params = ()
+        if part_numbers:
+            placeholders = ", ".join("?" for _ in part_numbers)
+            query += f" WHERE part_number IN ({placeholders})"
+            params = tuple(part_numbers)
+        query += " ORDER BY part_number"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return self.execute_query(query, params)
+    
+    @staticmethod
+    def _part_filter_conditions(category=None, brand=None):
+        """WHERE conditions and parameters for the category and brand filters"""
+        conditions = []
+        params = []
+        if category:
+            conditions.append("product_category = ?")
+            params.append(category)
+        if brand:
+            conditions.append("brand = ?")
+            params.append(brand)
+        return conditions, params
+
+    def browse_parts(self, after=None, limit=50, category=None, brand=None):
+        """
+        Get one page of parts in part number order
+
+        Pages are keyset paginated: the next page starts after the last part
+        number of the previous one, so a page deep into the catalog costs the
+        same as the first one.
+
+        Args:
+            after (str, optional): Last part number of the previous page
+            limit (int): Parts per page
+            category (str, optional): Only parts of this product category
+            brand (str, optional): Only parts of this brand
+
+        Returns:
+            list: Up to limit parts
+        """
+        conditions, params = self._part_filter_conditions(category, brand)
+        if after is not None:
+            conditions.append("part_number > ?")
+            params.append(after)
+        query = "SELECT * FROM parts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY part_number LIMIT ?"
+        params.append(int(limit))
+        return self.execute_query(query, tuple(params))
+
+    def count_parts(self, category=None, brand=None):
+        """Count the parts matching the browse filters"""
+        conditions, params = self._part_filter_conditions(category, brand)
+        query = "SELECT COUNT(*) AS parts FROM parts"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        return self.execute_query(query, tuple(params), fetch_all=False)["parts"]
+
+    def iter_parts(self, category=None, brand=None, page_size=1000):
+        """
+        Yield every part matching the browse filters, reading one keyset page at a time
+
+        Yields:
+            dict: Parts in part number order
+        """
+        after = None
+        while True:
+            page = self.browse_parts(after=after, limit=page_size, category=category, brand=brand)
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1]["part_number"]
+
+    def get_part_filters(self):
+        """
+        Get the product categories and brands in the catalog, for browse filters
+
+        Returns:
+            dict: Sorted 'categories' and 'brands' lists
+        """
+        # Steps through the index one distinct value at a time instead of scanning every part
+        distinct_query = """
+        WITH RECURSIVE distinct_values(value) AS (
+            SELECT MIN({column}) FROM parts
+            UNION ALL
+            SELECT (SELECT MIN({column}) FROM parts WHERE {column} > value) FROM distinct_values WHERE value IS NOT NULL
+        )
+        SELECT value FROM distinct_values WHERE value IS NOT NULL
+        """
+        return {
+            "categories": [row["value"] for row in self.execute_query(distinct_query.format(column="product_category"))],
+            "brands": [row["value"] for row in self.execute_query(distinct_query.format(column="brand"))]
+        }
+    
+    def search_parts(self, query, limit=20):
+        """
+        Find parts by prefix search over part number, category, brand, type, engine and fitment
+
+        Every word of the query must match the start of a word in the part
+        (e.g. "ic-55 spark" finds IC-5501 from SparkMaster). An exact part
+        number match comes first, then the best ranked matches.
+
+        Args:
+            query (str): What the user typed
+            limit (int): Maximum number of parts returned
+
+        Returns:
+            list: Matching parts, best match first
+        """
+        terms = re.findall(r"\w+", query or "")
+        if not terms:
+            return self.get_parts(limit=limit)
+        # Quoted so words like AND or NOT are searched for instead of read as operators
+        match = " ".join(f'"{term}"*' for term in terms)
+        # The limit inside the FTS query lets FTS5 keep only the best ranked rows instead of sorting every match
+        fts_query = """
+        SELECT p.*
+        FROM (SELECT rowid, rank FROM parts_fts WHERE parts_fts MATCH ? ORDER BY rank LIMIT ?) f
+        JOIN parts p ON p.id = f.rowid
+        ORDER BY f.rank
+        LIMIT ?
+        """
+        try:
+            rows = self.execute_query(fts_query, (match, int(limit), int(limit)))
+        except sqlite3.OperationalError as e:
+            if "parts_fts" not in str(e):
+                raise
+            # Database created before the full-text index migration
+            like_query = "SELECT * FROM parts WHERE part_number LIKE ? OR product_category LIKE ? OR brand LIKE ? ORDER BY part_number LIMIT ?"
+            pattern = f"%{query.strip()}%"
+            rows = self.execute_query(like_query, (pattern, pattern, pattern, int(limit)))
+
+        # A part number typed in full comes first, even if it wasn't among the ranked matches
+        exact = self.execute_query("SELECT * FROM parts WHERE part_number = ?", (query.strip(),), fetch_all=False)
+        if exact:
+            rows = [exact] + [row for row in rows if row["id"] != exact["id"]][:int(limit) - 1]
+        return rows
+    
+    def save_description(self, part_id, description_code, description_text, language_code, sequence=1, maintenance_type='A'):
+        """Insert a description or update the existing one for the same part, code, sequence and language"""
+        return self.execute_query(DESCRIPTION_UPSERT_QUERY, (part_id, language_code, maintenance_type, description_code, sequence, description_text))
+
+    def save_descriptions(self, rows):
+        """
+        Upsert many descriptions in one transaction
+
+        Args:
+            rows (list): (part_id, language_code, maintenance_type, description_code, sequence, description_text) tuples
+        """
+        conn = self.get_connection()
+        try:
+            conn.executemany(DESCRIPTION_UPSERT_QUERY, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_saved_description(self, part_id, description_code, language_code, sequence=1):
+        """Get the stored description for a part, code, language and sequence, or None"""
+        query = """
+        SELECT * FROM descriptions
+        WHERE part_id = ? AND description_code = ? AND sequence = ? AND language_code = ?
+        """
+        return self.execute_query(query, (part_id, description_code, sequence, language_code), fetch_all=False)
+    
     def add_generation_log(self, product_id, prompt, engine, result):
         """Add a generation log entry"""
         query = """
@@ -88,5 +343,35 @@ class Database:
             query = "SELECT * FROM generation_logs"
             return self.execute_query(query)
 
+    def get_generation_log_summary(self, hours=24):
+        """
+        Summarize the LLM call telemetry of the last hours per page, backend and model
+
+        Returns:
+            list: One row per page/backend/model with call counts, latency, tokens and cost
+        """
+        since = (datetime.datetime.now() - datetime.timedelta(hours=hours)).isoformat()
+        query = """
+        SELECT page, backend, model,
+               COUNT(*) AS calls,
+               SUM(cache_hit) AS cache_hits,
+               SUM(retry_count) AS retries,
+               SUM(error IS NOT NULL) AS errors,
+               ROUND(AVG(CASE WHEN cache_hit = 0 THEN wall_time_ms END)) AS avg_wall_ms,
+               MAX(wall_time_ms) AS max_wall_ms,
+               ROUND(AVG(ttft_ms)) AS avg_ttft_ms,
+               SUM(prompt_tokens) AS prompt_tokens,
+               SUM(cached_tokens) AS cached_tokens,
+               ROUND(100.0 * SUM(cached_tokens) / NULLIF(SUM(prompt_tokens), 0), 1) AS cached_pct,
+               SUM(completion_tokens) AS completion_tokens,
+               ROUND(SUM(cost_usd), 4) AS cost_usd
+        FROM generation_logs
+        WHERE created_at >= ? AND backend IS NOT NULL
+        GROUP BY page, backend, model
+        ORDER BY calls DESC
+        """
+        return self.execute_query(query, (since,))
+
 # Create singleton instance
-db = Database() 
\ No newline at end of file
+db = Database()
+atexit.register(db.close_all)
\ No newline at end of file
@@ -0,0 +1,156 @@
+import os
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
+
+from classes.db.database import db
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("description_writer")
+
+class Description_Writer:
+    def __init__(self):
+        """Initialize the write-behind buffer for generated descriptions"""
+        # Descriptions are written in batches of this size, or after FLUSH_INTERVAL seconds
+        self.BATCH_SIZE = int(os.getenv("DESCRIPTION_WRITE_BATCH_SIZE", "200"))
+        self.FLUSH_INTERVAL = float(os.getenv("DESCRIPTION_WRITE_FLUSH_INTERVAL", "1"))
+        # Beyond this many unwritten descriptions, save() waits for the writer instead of growing the buffer
+        self.QUEUE_SIZE = int(os.getenv("DESCRIPTION_WRITE_QUEUE_SIZE", "10000"))
+        # Longest flush() waits for the writer, so a stuck database can't hold up interpreter shutdown
+        self.FLUSH_TIMEOUT = float(os.getenv("DESCRIPTION_WRITE_FLUSH_TIMEOUT", "30"))
+
+        self.written = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        # Latest unwritten text per key, so lookups see a description before it reaches the table
+        self._pending = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(part_id, description_code, language_code, sequence):
+        return (part_id, description_code, int(sequence), language_code)
+
+    def save(self, part_id, description_code, description_text, language_code, sequence=1, maintenance_type="A"):
+        """
+        Queue a description for the descriptions table; returns without waiting for the write
+
+        Args:
+            part_id (int): ID of the part in the parts table
+            description_code (str): PIES description code
+            description_text (str): The description
+            language_code (str): PIES language code
+            sequence (int): PIES sequence number
+            maintenance_type (str): PIES maintenance type, A, D or N
+        """
+        row = (part_id, language_code, maintenance_type[:1], description_code, int(sequence), description_text)
+        key = self._key(part_id, description_code, language_code, sequence)
+        with self._lock:
+            self._pending[key] = row
+        self._queue.put(row)
+        self._ensure_writer()
+
+    def lookup(self, part_id, description_code, language_code, sequence=1):
+        """
+        Return the saved description text, including one still waiting to be written
+
+        Returns:
+            str: The description, or None if none was saved
+        """
+        with self._lock:
+            row = self._pending.get(self._key(part_id, description_code, language_code, sequence))
+        if row is not None:
+            return row[5]
+        saved = db.get_saved_description(part_id, description_code, language_code, sequence)
+        return saved["description_text"] if saved else None
+
+    # --- Writer ---------------------------------------------------------------
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="description_writer", daemon=True)
+                    self._thread.start()
+
+    def _write(self, batch):
+        """Upsert a batch; a row the table rejects doesn't stop the others"""
+        # Only the latest text per key is written
+        rows = list({self._key(row[0], row[3], row[1], row[4]): row for row in batch}.values())
+        try:
+            db.save_descriptions(rows)
+            self.written += len(rows)
+        except sqlite3.IntegrityError:
+            for row in rows:
+                try:
+                    db.save_descriptions([row])
+                    self.written += 1
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Error saving {row[3]} for part {row[0]}: {e}")
+        except Exception as e:
+            # Any error, including one while opening the connection, fails the batch but not the writer
+            self.failed += len(rows)
+            logger.error(f"Error saving {len(rows)} descriptions: {e}")
+        finally:
+            # Written or failed, lookups must fall back to the table instead of serving unwritten text forever
+            with self._lock:
+                for row in rows:
+                    key = self._key(row[0], row[3], row[1], row[4])
+                    # A newer text queued meanwhile stays pending
+                    if self._pending.get(key) is row:
+                        del self._pending[key]
+
+    def _run(self):
+        """Drain the queue into the descriptions table with one transaction per batch"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.error(f"Error saving {len(batch)} descriptions: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self, timeout=None):
+        """
+        Wait until every queued description has been written
+
+        Args:
+            timeout (float, optional): Seconds to wait at most. Defaults to DESCRIPTION_WRITE_FLUSH_TIMEOUT
+
+        Returns:
+            bool: True if the queue was drained in time
+        """
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + (self.FLUSH_TIMEOUT if timeout is None else timeout)
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._thread.is_alive():
+                    logger.warning(f"{self._queue.unfinished_tasks} descriptions were not saved before the flush timeout")
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "written": self.written, "failed": self.failed}
+
+description_writer = Description_Writer()
+atexit.register(description_writer.flush)
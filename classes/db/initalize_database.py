@@ -11,6 +11,35 @@ class InitializeDatabase:
         self.DB_DIR = os.path.join(self.BASE_DIR, 'classes', 'db')
         self.DB_PATH = os.path.join(self.DB_DIR, 'pies.db')
         self.SQL_FILE = os.path.join(self.BASE_DIR, 'classes', 'data', 'db_setup.sql')
+        self.MIGRATIONS_DIR = os.path.join(self.BASE_DIR, 'classes', 'data', 'migrations')
+
+    def get_migrations(self):
+        """Return the (version, path) of every migration file, oldest first"""
+        migrations = []
+        if os.path.isdir(self.MIGRATIONS_DIR):
+            for name in sorted(os.listdir(self.MIGRATIONS_DIR)):
+                version = name.split('_', 1)[0]
+                if name.endswith('.sql') and version.isdigit():
+                    migrations.append((int(version), os.path.join(self.MIGRATIONS_DIR, name)))
+        return migrations
+
+    def apply_migrations(self, conn):
+        """
+        Bring an existing database up to date with the migration files
+
+        The applied version is kept in PRAGMA user_version, so every migration
+        runs once per database.
+        """
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, path in self.get_migrations():
+            if version <= current_version:
+                continue
+            with open(path, 'r') as f:
+                conn.executescript(f.read())
+            # PRAGMA doesn't take parameters; version is an int parsed from the file name
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+            print(f"Applied database migration {os.path.basename(path)}")
 
     def create_database(self):
         """Create the SQLite database and necessary tables"""
@@ -20,6 +49,13 @@ class InitializeDatabase:
         # Check if database already exists
         if os.path.exists(self.DB_PATH):
             print(f"Database already exists at {self.DB_PATH}")
+            conn = sqlite3.connect(self.DB_PATH)
+            try:
+                self.apply_migrations(conn)
+            except sqlite3.Error as e:
+                print(f"Error applying database migrations: {e}")
+            finally:
+                conn.close()
             return
         
         # Check if SQL file exists
@@ -46,6 +82,10 @@ class InitializeDatabase:
         # Execute the SQL commands
         try:
             cursor.executescript(sql_script)
+            # db_setup.sql already contains everything the migrations add
+            migrations = self.get_migrations()
+            if migrations:
+                cursor.execute(f"PRAGMA user_version = {migrations[-1][0]}")
             conn.commit()
             print("Sample data loaded successfully")
         except sqlite3.Error as e:
@@ -0,0 +1,298 @@
+import os
+import io
+import time
+import logging
+import argparse
+import xml.etree.ElementTree as ET
+
+from classes.db.database import db
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("parts_importer")
+
+PART_COLUMNS = ("part_number", "product_category", "brand", "part_type", "engine_application", "material", "fitment")
+
+# Supplier header names (lowercase, without spaces, dashes or underscores) per parts column
+COLUMN_ALIASES = {
+    "part_number": ("partnumber", "partno", "part#", "pn", "sku", "itemnumber", "item"),
+    "product_category": ("productcategory", "category", "productline", "partterminologyname", "terminology"),
+    "brand": ("brand", "brandlabel", "brandname", "manufacturer", "mfr"),
+    "part_type": ("parttype", "type", "subcategory"),
+    "engine_application": ("engineapplication", "engine", "application"),
+    "material": ("material",),
+    "fitment": ("fitment", "fitmentnotes", "vehiclefitment", "position")
+}
+
+# Existing values are kept when the import has none, so a partial file doesn't blank out columns
+UPSERT_QUERY = """
+INSERT INTO parts (part_number, product_category, brand, part_type, engine_application, material, fitment)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(part_number) DO UPDATE SET
+    product_category = COALESCE(NULLIF(excluded.product_category, ''), parts.product_category),
+    brand = COALESCE(NULLIF(excluded.brand, ''), parts.brand),
+    part_type = COALESCE(excluded.part_type, parts.part_type),
+    engine_application = COALESCE(excluded.engine_application, parts.engine_application),
+    material = COALESCE(excluded.material, parts.material),
+    fitment = COALESCE(excluded.fitment, parts.fitment),
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+class Parts_Importer:
+    def __init__(self):
+        """Initialize the streaming parts importer"""
+        # Rows read and sent to SQLite per executemany
+        self.BATCH_SIZE = int(os.getenv("PARTS_IMPORT_BATCH_SIZE", "5000"))
+        # Rows written per transaction
+        self.COMMIT_ROWS = int(os.getenv("PARTS_IMPORT_COMMIT_ROWS", "50000"))
+
+    @staticmethod
+    def _normalize_header(name):
+        return "".join(ch for ch in str(name or "").strip().lower() if ch not in " -_.")
+
+    def map_columns(self, headers):
+        """
+        Match supplier headers to parts columns
+
+        Args:
+            headers (list): Header row of the file
+
+        Returns:
+            dict: Index in the row per parts column that was found
+        """
+        normalized = [self._normalize_header(header) for header in headers]
+        mapping = {}
+        for column in PART_COLUMNS:
+            names = (self._normalize_header(column),) + COLUMN_ALIASES[column]
+            for name in names:
+                if name in normalized and normalized.index(name) not in mapping.values():
+                    mapping[column] = normalized.index(name)
+                    break
+        if "part_number" not in mapping:
+            raise ValueError(f"No part number column found in headers: {', '.join(str(header) for header in headers)}")
+        return mapping
+
+    @staticmethod
+    def _clean(value):
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value or None
+
+    def _row_from_values(self, values, mapping):
+        """Build a parts row tuple, or None when the row has no part number"""
+        record = {column: self._clean(values[index]) if index < len(values) else None for column, index in mapping.items()}
+        return self._row(record)
+
+    def _row(self, record):
+        if not record.get("part_number"):
+            return None
+        return (
+            record["part_number"],
+            # Both are NOT NULL in the parts table
+            record.get("product_category") or "",
+            record.get("brand") or "",
+            record.get("part_type"),
+            record.get("engine_application"),
+            record.get("material"),
+            record.get("fitment")
+        )
+
+    # --- Readers, each yields parts row tuples without holding the file in memory ---
+
+    def read_csv(self, source, delimiter=None):
+        """Stream rows from a CSV (or tab separated) file in chunks"""
+        import pandas as pd
+
+        if delimiter is None:
+            name = getattr(source, "name", source if isinstance(source, str) else "")
+            delimiter = "\t" if str(name).lower().endswith((".tsv", ".txt")) else ","
+        # Every value is read as text, so part numbers like 00123 keep their leading zeros
+        chunks = pd.read_csv(
+            source, sep=delimiter, dtype=str, keep_default_na=False,
+            chunksize=self.BATCH_SIZE, encoding_errors="replace"
+        )
+        mapping = None
+        for chunk in chunks:
+            if mapping is None:
+                mapping = self.map_columns(list(chunk.columns))
+            for values in chunk.itertuples(index=False, name=None):
+                yield self._row_from_values(values, mapping)
+
+    def read_excel(self, source, sheet_name=None):
+        """Stream rows from an .xlsx workbook without loading the whole sheet"""
+        import openpyxl
+
+        # Read-only mode parses the sheet XML as it is iterated
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
+            mapping = None
+            for values in rows:
+                if mapping is None:
+                    # Leading empty rows come before the header in some supplier sheets
+                    if not any(value not in (None, "") for value in values):
+                        continue
+                    mapping = self.map_columns(list(values))
+                    continue
+                if not any(value not in (None, "") for value in values):
+                    continue
+                yield self._row_from_values(values, mapping)
+        finally:
+            workbook.close()
+
+    @staticmethod
+    def _local_name(tag):
+        """Tag without its XML namespace"""
+        return tag.rsplit("}", 1)[-1]
+
+    def _pies_item(self, item):
+        """Read one PIES <Item> into a parts row"""
+        record = {}
+        descriptions = {}
+        attributes = {}
+        found = {}
+        for element in item.iter():
+            name = self._local_name(element.tag)
+            text = self._clean(element.text)
+            if not text:
+                continue
+            if name == "Description":
+                descriptions.setdefault(element.get("DescriptionCode"), text)
+            elif name == "ProductAttribute":
+                attributes[self._normalize_header(element.get("AttributeID"))] = text
+            else:
+                # The item's own elements come first; interchange and package blocks repeat some names later
+                found.setdefault(name, text)
+
+        record["part_number"] = found.get("PartNumber")
+        if found.get("BrandLabel") or found.get("BrandAAIAID"):
+            record["brand"] = found.get("BrandLabel") or found.get("BrandAAIAID")
+        terminology = found.get("PartTerminologyID")
+
+        # Product attributes use the same names suppliers use as column headers
+        for column in PART_COLUMNS[1:]:
+            for name in (self._normalize_header(column),) + COLUMN_ALIASES[column]:
+                if name in attributes:
+                    record.setdefault(column, attributes[name])
+                    break
+        # Without a category attribute the short description names the product best
+        record.setdefault("product_category", descriptions.get("SHO") or descriptions.get("DES") or terminology)
+        record.setdefault("part_type", descriptions.get("DES") if descriptions.get("SHO") else None)
+        return self._row(record)
+
+    def read_pies_xml(self, source):
+        """Stream items from a PIES 7.x XML file with incremental parsing"""
+        parents = []
+        for event, element in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                parents.append(element)
+                continue
+            parents.pop()
+            if self._local_name(element.tag) != "Item":
+                continue
+            # Deleted items are left in the database; descriptions may still reference them
+            if element.get("MaintenanceType") == "D":
+                yield None
+            else:
+                yield self._pies_item(element)
+            # Drop the parsed item so memory stays flat however many items follow
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+
+    def read(self, source, file_type=None):
+        """Pick the reader from the file type or extension"""
+        name = getattr(source, "name", source if isinstance(source, str) else "")
+        file_type = (file_type or os.path.splitext(str(name))[1].lstrip(".")).lower()
+        if file_type in ("csv", "tsv", "txt"):
+            return self.read_csv(source)
+        if file_type in ("xlsx", "xlsm"):
+            return self.read_excel(source)
+        if file_type == "xml":
+            return self.read_pies_xml(source)
+        raise ValueError(f"Unsupported file type: {file_type or 'unknown'}. Use CSV, XLSX or PIES XML.")
+
+    # --- Import ---------------------------------------------------------------
+
+    def import_file(self, source, file_type=None, on_progress=None):
+        """
+        Upsert every part of a supplier file into the parts table
+
+        Rows are written with one executemany per batch, and a transaction is
+        committed every PARTS_IMPORT_COMMIT_ROWS rows.
+
+        Args:
+            source (str or file): Path or binary file object (e.g. a Streamlit upload)
+            file_type (str, optional): 'csv', 'xlsx' or 'xml'; taken from the file name when omitted
+            on_progress (callable, optional): Called with the running stats after every batch
+
+        Returns:
+            dict: rows (upserted), skipped (no part number or deleted), batches, elapsed, rows_per_second
+        """
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        rows = self.read(source, file_type)
+
+        conn = db.get_connection()
+        stats = {"rows": 0, "skipped": 0, "batches": 0, "elapsed": 0.0, "rows_per_second": 0.0}
+        start = time.perf_counter()
+        uncommitted = 0
+        batch = []
+
+        def write(batch):
+            nonlocal uncommitted
+            conn.executemany(UPSERT_QUERY, batch)
+            uncommitted += len(batch)
+            stats["rows"] += len(batch)
+            stats["batches"] += 1
+            if uncommitted >= self.COMMIT_ROWS:
+                conn.commit()
+                uncommitted = 0
+            stats["elapsed"] = time.perf_counter() - start
+            stats["rows_per_second"] = stats["rows"] / stats["elapsed"] if stats["elapsed"] else 0.0
+            if on_progress:
+                on_progress(dict(stats))
+
+        try:
+            for row in rows:
+                if row is None:
+                    stats["skipped"] += 1
+                    continue
+                batch.append(row)
+                if len(batch) >= self.BATCH_SIZE:
+                    write(batch)
+                    batch = []
+            if batch:
+                write(batch)
+            conn.commit()
+        except Exception:
+            # Batches committed before the error stay imported
+            conn.rollback()
+            raise
+
+        stats["elapsed"] = time.perf_counter() - start
+        stats["rows_per_second"] = stats["rows"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        logger.info(f"Imported {stats['rows']} parts ({stats['skipped']} skipped) in {stats['elapsed']:.1f}s, {stats['rows_per_second']:.0f} rows/s")
+        return stats
+
+parts_importer = Parts_Importer()
+
+def main():
+    """Import a supplier file from the command line"""
+    parser = argparse.ArgumentParser(description="Upsert parts from a CSV, Excel or PIES XML file into pies.db")
+    parser.add_argument("path", help="CSV, TSV, XLSX or PIES XML file")
+    parser.add_argument("--type", default=None, help="File type when the extension doesn't tell (csv, xlsx, xml)")
+    args = parser.parse_args()
+
+    from classes.db.initalize_database import initialize_database
+    initialize_database.create_database()
+    stats = parts_importer.import_file(
+        args.path, file_type=args.type,
+        on_progress=lambda stats: print(f"{stats['rows']:,} rows, {stats['rows_per_second']:,.0f} rows/s", end="\r")
+    )
+    print(f"Imported {stats['rows']:,} parts ({stats['skipped']:,} skipped) in {stats['elapsed']:.1f}s, {stats['rows_per_second']:,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.utils.pies_prompt_builder import pies_prompt_builder
+from classes.utils.pies_length_fitter import pies_length_fitter
+from classes.utils.pies_candidate_generator import pies_candidate_generator
+from classes.utils.pies_translator import pies_translator
+from classes.ai_engines.openai_client import openai_client
+from classes.ai_engines.ollama_client import ollama_client
+from classes.ai_engines.llm_router import llm_router
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
+from classes.db.description_writer import description_writer
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("pies_batch_generator")
+
+class PIES_Batch_Generator:
+    def __init__(self):
+        """Initialize the batch generator"""
+        self.DEFAULT_CONCURRENCY = int(os.getenv("PIES_BATCH_CONCURRENCY", "8"))
+
+    def build_jobs(self, parts, description_codes, language_codes):
+        """
+        Expand parts x description codes x language codes into jobs, one part at a time
+
+        Args:
+            parts (iterable): Part rows from the parts table, e.g. a list or db.iter_parts()
+            description_codes (list): PIES description codes
+            language_codes (list): PIES language codes (ENGL, SPAN, ...)
+
+        Yields:
+            dict: One job per description to generate
+        """
+        for part in parts:
+            for description_code in description_codes:
+                for language_code in language_codes:
+                    yield {"part": part, "description_code": description_code, "language_code": language_code}
+
+    def _generate(self, prompt, model_source, model_name, use_cache, description_code=None):
+        """Blocking call to the selected AI client, using the routed settings for the description code"""
+        params = model_routing.client_params(description_code)
+        if model_source == "Ollama":
+            model = model_routing.model_for("ollama", model_name, description_code)
+            return ollama_client.generate_with_ollama(prompt, model, use_cache=use_cache, **params)
+        if model_source == "Auto":
+            # model_name holds the model per backend, e.g. {"ollama": "llama3.2", "openai": "gpt-4.1-nano"}
+            models = model_routing.route_models(model_name if isinstance(model_name, dict) else None, description_code)
+            return llm_router.generate(prompt, models, use_cache=use_cache, **params)
+        model = model_routing.model_for("openai", model_name, description_code)
+        return openai_client.generate_with_openai(prompt, model, use_cache=use_cache, **params)
+
+    def _shorten(self, description, description_code, language_code, model_source, model_name, use_cache):
+        """Ask the model once for a shorter version, cutting the text only if that doesn't fit either"""
+        max_length = pies_prompt_builder.get_pies_description_max_lengths().get(description_code, 255)
+        prompt = pies_prompt_builder.build_pies_shorten_prompt(description, description_code)
+        params = model_routing.client_params(description_code, task="shorten")
+        if model_source == "Ollama":
+            shorter = ollama_client.generate_with_ollama(prompt, model_routing.model_for("ollama", model_name, description_code, task="shorten"), use_cache=use_cache, **params)
+        elif model_source == "Auto":
+            models = model_routing.route_models(model_name if isinstance(model_name, dict) else None, description_code, task="shorten")
+            shorter = llm_router.generate(prompt, models, use_cache=use_cache, **params)
+        else:
+            shorter = openai_client.generate_with_openai(prompt, model_routing.model_for("openai", model_name, description_code, task="shorten"), use_cache=use_cache, **params)
+        if shorter and not shorter.startswith("Error"):
+            for char in pies_prompt_builder.invalid_characters:
+                shorter = shorter.replace(char, "")
+            fit = pies_length_fitter.fit(shorter, max_length, language_code)
+            if fit["fitted"]:
+                return dict(fit, method="rewrite")
+            description = fit["text"]
+        return pies_length_fitter.fit(description, max_length, language_code, allow_trim=True)
+
+    async def _run_job(self, job, semaphore, executor, model_source, model_name, save, use_cache, reuse_saved=False):
+        """Generate, clean, validate and optionally store a single description"""
+        part = job["part"]
+        description_code = job["description_code"]
+        language_code = job["language_code"]
+        result = {
+            "part_id": part.get("id"),
+            "part_number": part.get("part_number"),
+            "description_code": description_code,
+            "language_code": language_code,
+            "description": None,
+            "is_valid": False,
+            "issues": [],
+            "fit_method": None,
+            "translated_from": job.get("source_language"),
+            "from_memory": False,
+            "error": None,
+            "saved": False,
+            "reused": False,
+            "elapsed": 0.0
+        }
+
+        loop = asyncio.get_running_loop()
+        if reuse_saved and result["part_id"] is not None:
+            # The lookup may read the database, which must not block the event loop
+            saved = await loop.run_in_executor(
+                executor, functools.partial(description_writer.lookup, result["part_id"], description_code, language_code)
+            )
+            # A saved description that fails validation is generated again instead of served back
+            validation = pies_prompt_builder.validate_pies_description(description_code, saved) if saved else None
+            if validation and validation["is_valid"]:
+                result.update(description=saved, is_valid=True, issues=[], saved=True, reused=True)
+                return result
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if job.get("source_text"):
+                    # Translate the finished description instead of generating it again from the part
+                    translation = await loop.run_in_executor(
+                        executor,
+                        llm_telemetry.bind(functools.partial(
+                            pies_translator.translate, job["source_text"], description_code, language_code,
+                            model_source, model_name, job["source_language"], use_cache
+                        ))
+                    )
+                    description = translation["description"] or translation["error"]
+                    result["from_memory"] = translation["from_memory"]
+                elif pies_candidate_generator.is_speculative(description_code):
+                    prompt = pies_prompt_builder.build_pies_prompt(part, description_code, language_code)
+                    # Tight limits: keep the first valid of several candidates
+                    candidate_result = await loop.run_in_executor(
+                        executor,
+                        llm_telemetry.bind(functools.partial(pies_candidate_generator.generate, prompt, description_code, language_code, model_source, model_name, use_cache=use_cache))
+                    )
+                    description = candidate_result["description"] or candidate_result["error"]
+                else:
+                    prompt = pies_prompt_builder.build_pies_prompt(part, description_code, language_code)
+                    description = await loop.run_in_executor(
+                        executor,
+                        llm_telemetry.bind(functools.partial(self._generate, prompt, model_source, model_name, use_cache, description_code))
+                    )
+            except Exception as e:
+                description = f"Error generating description: {e}"
+            result["elapsed"] = time.perf_counter() - start
+
+        # Error text must never end up in the descriptions table
+        if not description or description.startswith("Error"):
+            result["error"] = description or "Empty response"
+            return result
+
+        for char in pies_prompt_builder.invalid_characters:
+            description = description.replace(char, "")
+        # Shorten over-long text by rule before another model round trip
+        max_length = pies_prompt_builder.get_pies_description_max_lengths().get(description_code, 255)
+        fit = pies_length_fitter.fit(description, max_length, language_code)
+        if not fit["fitted"]:
+            async with semaphore:
+                try:
+                    fit = await loop.run_in_executor(
+                        executor,
+                        llm_telemetry.bind(functools.partial(self._shorten, fit["text"], description_code, language_code, model_source, model_name, use_cache))
+                    )
+                except Exception as e:
+                    logger.error(f"Error shortening {description_code} for part {result['part_number']}: {e}")
+        description = fit["text"]
+        result["fit_method"] = fit["method"]
+        validation = pies_prompt_builder.validate_pies_description(description_code, description)
+        result["description"] = description
+        result["is_valid"] = validation["is_valid"]
+        result["issues"] = validation["issues"]
+
+        # Only valid descriptions are stored, since saved ones are reused instead of generated
+        if save and result["part_id"] is not None and result["is_valid"]:
+            # Written behind by the description writer, batched with the other results
+            description_writer.save(result["part_id"], description_code, description, language_code)
+            result["saved"] = True
+        return result
+
+    async def generate(self, parts, description_codes, language_codes, model_source="OpenAI", model_name=None, concurrency=None, save=True, use_cache=True, translate=False, reuse_saved=False):
+        """
+        Generate descriptions concurrently and yield each result as soon as it finishes
+
+        Jobs are started as earlier ones finish, with at most twice the
+        concurrency waiting at a time, so a batch over the whole catalog
+        doesn't hold a task per description in memory.
+
+        Args:
+            parts (iterable): Part rows from the parts table, e.g. a list or db.iter_parts()
+            description_codes (list): PIES description codes
+            language_codes (list): PIES language codes
+            model_source (str): 'OpenAI', 'Ollama' or 'Auto'
+            model_name (str or dict, optional): The model to use, or the model per backend for 'Auto',
+                e.g. {"ollama": "llama3.2", "openai": "gpt-4.1-nano"}
+            concurrency (int, optional): Maximum number of requests in flight
+            save (bool): Write successful descriptions to the descriptions table
+            use_cache (bool): Allow responses to be served from the LLM response cache
+            translate (bool): Generate only the first language (English if selected) and translate
+                each finished description into the other languages
+            reuse_saved (bool): Return valid descriptions already in the descriptions table instead of generating them
+
+        Yields:
+            dict: The result of one part/code/language combination
+        """
+        concurrency = concurrency or self.DEFAULT_CONCURRENCY
+        source_language = "ENGL" if "ENGL" in language_codes else language_codes[0]
+        target_languages = [code for code in language_codes if code != source_language] if translate else []
+        jobs = self.build_jobs(parts, description_codes, [source_language] if translate else language_codes)
+        logger.info(f"Starting batch with concurrency {concurrency}")
+
+        semaphore = asyncio.Semaphore(concurrency)
+        executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="pies_batch")
+        # Enough tasks queued behind the running ones that no slot waits for the next job to be built
+        max_in_flight = concurrency * 2
+        translations = deque()
+        pending = set()
+
+        def fill():
+            # Translations go first, so their source descriptions don't pile up
+            while len(pending) < max_in_flight:
+                job = translations.popleft() if translations else next(jobs, None)
+                if job is None:
+                    return
+                pending.add(asyncio.ensure_future(self._run_job(job, semaphore, executor, model_source, model_name, save, use_cache, reuse_saved)))
+
+        try:
+            fill()
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    # Each finished source description fans out into its translations
+                    if target_languages and result["translated_from"] is None and result["description"]:
+                        for language_code in target_languages:
+                            translations.append({
+                                # Translating only needs the source text, not the part row
+                                "part": {"id": result["part_id"], "part_number": result["part_number"]},
+                                "description_code": result["description_code"],
+                                "language_code": language_code,
+                                "source_text": result["description"],
+                                "source_language": source_language
+                            })
+                    yield result
+                fill()
+        finally:
+            for task in pending:
+                task.cancel()
+            executor.shutdown(wait=False)
+
+    def run(self, parts, description_codes, language_codes, on_result=None, **kwargs):
+        """
+        Run a batch from synchronous code (e.g. a Streamlit page)
+
+        Args:
+            on_result (callable, optional): Called with each result as it finishes
+            **kwargs: Passed through to generate()
+
+        Returns:
+            list: All results in completion order
+        """
+        async def collect():
+            results = []
+            async for result in self.generate(parts, description_codes, language_codes, **kwargs):
+                results.append(result)
+                if on_result:
+                    on_result(result)
+            return results
+
+        return asyncio.run(collect())
+
+pies_batch_generator = PIES_Batch_Generator()
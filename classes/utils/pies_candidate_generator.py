@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from classes.utils.pies_prompt_builder import pies_prompt_builder
+from classes.utils.pies_length_fitter import pies_length_fitter
+from classes.ai_engines.openai_client import openai_client
+from classes.ai_engines.ollama_client import ollama_client
+from classes.ai_engines.llm_router import llm_router
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("pies_candidate_generator")
+
+class PIES_Candidate_Generator:
+    def __init__(self):
+        """Initialize the speculative candidate generator"""
+        # Codes with limits so tight that generating alternatives beats shortening one answer serially
+        self.CODES = [code.strip() for code in os.getenv("PIES_SPECULATIVE_CODES", "SHORT_DESC,CONDENSED_DESC,INVOICE_DESC").split(",") if code.strip()]
+        self.CANDIDATES = int(os.getenv("PIES_CANDIDATES", "4"))
+        # Sampling temperature of every candidate; too low and the candidates come back nearly identical
+        self.TEMPERATURE = float(os.getenv("PIES_CANDIDATE_TEMPERATURE", "1.0"))
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv("PIES_CANDIDATE_WORKERS", "16")), thread_name_prefix="pies_candidate")
+
+    def is_speculative(self, description_code):
+        """Check whether a description code is generated with parallel candidates"""
+        return description_code in self.CODES and self.CANDIDATES > 1
+
+    def _check(self, text, description_code, language_code):
+        """
+        Clean, fit and validate one candidate
+
+        Returns:
+            dict: description, is_valid, issues and fit_method, or None for an error answer
+        """
+        if not text or text.startswith("Error"):
+            return None
+        for char in pies_prompt_builder.invalid_characters:
+            text = text.replace(char, "")
+        max_length = pies_prompt_builder.get_pies_description_max_lengths().get(description_code, 255)
+        fit = pies_length_fitter.fit(text, max_length, language_code)
+        validation = pies_prompt_builder.validate_pies_description(description_code, fit["text"])
+        return {
+            "description": fit["text"],
+            "is_valid": validation["is_valid"],
+            "issues": validation["issues"],
+            "fit_method": fit["method"]
+        }
+
+    def _stream_candidate(self, prompt, model_name, max_chars, cancelled, params):
+        """Stream one Ollama candidate, abandoning it as soon as another candidate has won"""
+        fragments = ollama_client.stream_with_ollama(prompt, model_name, max_chars=max_chars, use_cache=False, **params)
+        text = ""
+        try:
+            for fragment in fragments:
+                if cancelled.is_set():
+                    return None
+                text += fragment
+        finally:
+            # Closes the HTTP response, which stops the generation on the server
+            fragments.close()
+        return text.strip()
+
+    def generate(self, prompt, description_code, language_code="ENGL", model_source="OpenAI", model_name=None, k=None, use_cache=True, use_routing=True):
+        """
+        Generate k candidates for one description and keep the first valid one
+
+        OpenAI returns all candidates from one request (the n parameter). Ollama
+        candidates are streamed in parallel; once one passes validation the
+        others are closed, which stops their generation.
+
+        Args:
+            prompt (str): The prompt built for the description code
+            description_code (str): PIES description code
+            language_code (str): PIES language code
+            model_source (str): 'OpenAI', 'Ollama' or 'Auto'
+            model_name (str or dict): The model to use, or the model per backend for 'Auto'
+            k (int, optional): Number of candidates. Defaults to PIES_CANDIDATES
+            use_cache (bool): Allow cached OpenAI candidates
+            use_routing (bool): Use the model, token budget and timeout routed for the description code
+
+        Returns:
+            dict: description, is_valid, issues, fit_method, candidates (number received) and error
+        """
+        k = k or self.CANDIDATES
+        start = time.perf_counter()
+        result = {"description": None, "is_valid": False, "issues": [], "fit_method": None, "candidates": 0, "error": None, "elapsed": 0.0}
+
+        routed_code = description_code if use_routing else None
+        if model_source == "Auto":
+            # Send every candidate to the backend the router would pick for a single request
+            models = model_routing.route_models(model_name if isinstance(model_name, dict) else None, routed_code)
+            backend, model_name = llm_router.candidates(models)[0]
+            model_source = "Ollama" if backend == "ollama" else "OpenAI"
+        else:
+            model_name = model_routing.model_for("ollama" if model_source == "Ollama" else "openai", model_name, routed_code)
+        # Candidates are sampled at their own, higher temperature on both backends so they differ from each other
+        params = model_routing.client_params(routed_code)
+        params["temperature"] = self.TEMPERATURE
+
+        best = None
+        if model_source == "Ollama":
+            max_length = pies_prompt_builder.get_pies_description_max_lengths().get(description_code, 255)
+            cancelled = threading.Event()
+            # Candidates far over the limit can't be fitted, stop streaming them early
+            futures = [
+                self._executor.submit(llm_telemetry.bind(self._stream_candidate), prompt, model_name, max_length * 2, cancelled, params)
+                for _ in range(k)
+            ]
+            for future in as_completed(futures):
+                checked = self._check(future.result(), description_code, language_code)
+                if checked is None:
+                    continue
+                result["candidates"] += 1
+                if checked["is_valid"]:
+                    best = checked
+                    cancelled.set()
+                    for other in futures:
+                        other.cancel()
+                    break
+                best = best or checked
+        else:
+            texts = openai_client.generate_candidates_with_openai(prompt, k, model_name, use_cache=use_cache, **params)
+            checked_candidates = [self._check(text, description_code, language_code) for text in texts]
+            checked_candidates = [checked for checked in checked_candidates if checked is not None]
+            result["candidates"] = len(checked_candidates)
+            if not checked_candidates and texts:
+                result["error"] = texts[0]
+            # Prefer a candidate that fits as written over one the rules had to shorten
+            valid = sorted(
+                (checked for checked in checked_candidates if checked["is_valid"]),
+                key=lambda checked: checked["fit_method"] != "unchanged"
+            )
+            best = valid[0] if valid else (checked_candidates[0] if checked_candidates else None)
+
+        if best:
+            result.update(best)
+        elif not result["error"]:
+            result["error"] = "Error generating description: no candidate was generated"
+        result["elapsed"] = time.perf_counter() - start
+        logger.info(f"{description_code}: {result['candidates']} candidates, valid={result['is_valid']} in {result['elapsed']:.2f}s")
+        return result
+
+pies_candidate_generator = PIES_Candidate_Generator()
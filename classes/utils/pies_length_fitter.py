@@ -0,0 +1,206 @@
+import os
+import re
+import logging
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("pies_length_fitter")
+
+class PIES_Length_Fitter:
+    def __init__(self):
+        """Initialize the rule-based description shortener"""
+        # Common automotive aftermarket abbreviations (none may use a PIES invalid character), longest phrases are applied first
+        self.abbreviations = {
+            "Assembly": "Assy",
+            "Front": "Frt",
+            "Rear": "Rr",
+            "Left Hand": "LH",
+            "Right Hand": "RH",
+            "Driver Side": "LH",
+            "Passenger Side": "RH",
+            "Upper": "Upr",
+            "Lower": "Lwr",
+            "Inner": "Inr",
+            "Outer": "Otr",
+            "Automatic": "Auto",
+            "Transmission": "Trans",
+            "Engine": "Eng",
+            "Cylinder": "Cyl",
+            "Ignition": "Ign",
+            "Oxygen": "O2",
+            "Sensor": "Snsr",
+            "Switch": "Sw",
+            "Bracket": "Brkt",
+            "Bearing": "Brg",
+            "Housing": "Hsg",
+            "Mounting": "Mtg",
+            "Mount": "Mt",
+            "Gasket": "Gskt",
+            "Module": "Mod",
+            "Control": "Ctrl",
+            "Valve": "Vlv",
+            "Pressure": "Press",
+            "Temperature": "Temp",
+            "Exhaust": "Exh",
+            "Intake": "Intk",
+            "Manifold": "Manif",
+            "Radiator": "Rad",
+            "Condenser": "Cond",
+            "Compressor": "Comp",
+            "Alternator": "Alt",
+            "Starter": "Strtr",
+            "Battery": "Batt",
+            "Suspension": "Susp",
+            "Steering": "Strg",
+            "Replacement": "Repl",
+            "Universal": "Univ",
+            "Heavy Duty": "HD",
+            "Performance": "Perf",
+            "Stainless Steel": "SS",
+            "Aluminum": "Alum",
+            "Premium": "Prem",
+            "Professional": "Pro",
+            "Standard": "Std",
+            "Original Equipment": "OE",
+            "Vehicle": "Veh",
+            "Vehicles": "Veh",
+            "Electrical": "Elec",
+            "Electric": "Elec",
+            "Connector": "Conn",
+            "Harness": "Hrns",
+            "Pump": "Pmp",
+            "Filter": "Fltr",
+            "Hose": "Hse",
+            "Brake": "Brk",
+            "Rotor": "Rtr",
+            "Caliper": "Clpr",
+            "Wheel": "Whl",
+            "Cover": "Cvr",
+            "Light": "Lt",
+            "Lamp": "Lmp",
+            "Mirror": "Mirr",
+            "Window": "Wndw",
+            "Regulator": "Reg",
+            "Motor": "Mtr",
+            "Injector": "Inj",
+            "Throttle": "Thrtl",
+            "Position": "Pos",
+            "Speed": "Spd",
+            "Camshaft": "Cam",
+            "Crankshaft": "Crank",
+            "Thermostat": "Tstat",
+            "Includes": "Incl",
+            "Including": "Incl",
+            "Package": "Pkg",
+            "Quantity": "Qty",
+            "Diameter": "Dia",
+            "Length": "Lg",
+            "Millimeter": "mm"
+        }
+        # Left and Right are only abbreviated next to a position ("Right Front", "Left Side"), elsewhere they can be part of a name
+        self.sides = {"Left": "LH", "Right": "RH"}
+        self.position_words = ("Front", "Rear", "Side", "Upper", "Lower", "Inner", "Outer", "Frt", "Rr", "Upr", "Lwr", "Inr", "Otr")
+        # Words that can be removed without losing the meaning of a short label
+        self.stop_words = {"a", "an", "the", "of", "for", "to", "in", "on", "at", "by", "is", "are", "this", "that", "your", "its", "from", "designed", "provides", "features", "high", "quality"}
+        # Trimming may not throw away more than this share of the text, otherwise the model is asked instead
+        self.MIN_KEEP_RATIO = float(os.getenv("PIES_FIT_MIN_KEEP_RATIO", "0.6"))
+
+        ordered = sorted(self.abbreviations.items(), key=lambda item: len(item[0]), reverse=True)
+        self._abbreviation_patterns = [
+            (re.compile(rf"\b{re.escape(phrase)}\b", re.IGNORECASE), short)
+            for phrase, short in ordered
+        ]
+        positions = "|".join(self.position_words)
+        for side, short in self.sides.items():
+            self._abbreviation_patterns.append((re.compile(rf"\b{side}(?=\s+(?:{positions})\b)", re.IGNORECASE), short))
+            self._abbreviation_patterns.append((re.compile(rf"\b((?:{positions})\s+){side}\b", re.IGNORECASE), rf"\g<1>{short}"))
+
+    def compact(self, text):
+        """Collapse whitespace and drop trailing punctuation"""
+        text = re.sub(r"\s+", " ", text).strip()
+        text = re.sub(r"\s+([,.!?])", r"\1", text)
+        return text.rstrip(" ,.;-")
+
+    def abbreviate(self, text, max_length=None):
+        """Replace words with their abbreviations, stopping once the text fits max_length"""
+        for pattern, short in self._abbreviation_patterns:
+            if max_length and len(text) <= max_length:
+                break
+            text = pattern.sub(short, text)
+        return text
+
+    def drop_stop_words(self, text, max_length=None):
+        """Remove stop words from the end of the text forwards, keeping the first word"""
+        words = text.split(" ")
+        for index in range(len(words) - 1, 0, -1):
+            if max_length and len(" ".join(words)) <= max_length:
+                break
+            if words[index].lower().strip(",.") in self.stop_words:
+                del words[index]
+        return " ".join(words)
+
+    def trim(self, text, max_length):
+        """Cut the text at the last word boundary that fits max_length"""
+        if len(text) <= max_length:
+            return text
+        cut = text[:max_length + 1]
+        boundary = cut.rfind(" ")
+        text = cut[:boundary] if boundary > 0 else text[:max_length]
+        # Don't end on a dangling joining word
+        words = text.split(" ")
+        while len(words) > 1 and (words[-1].lower() in self.stop_words or words[-1].lower() in ("and", "with", "-")):
+            words.pop()
+        return self.compact(" ".join(words))
+
+    def fit(self, text, max_length, language_code="ENGL", allow_trim=False):
+        """
+        Shorten a description to max_length with deterministic rules
+
+        Cutting the text off is not one of the rules: it is a last resort
+        (allow_trim) for callers whose model rewrite already failed, and only
+        for English, where abbreviations and stop words were tried first.
+
+        Args:
+            text (str): The description to shorten
+            max_length (int): The PIES character limit
+            language_code (str): PIES language code; abbreviations and stop words are English only
+            allow_trim (bool): Cut the text at a word boundary when the rules aren't enough
+
+        Returns:
+            dict: text, fitted (bool), method ("unchanged", "rules", "trim" or "none") and the steps applied
+        """
+        result = {"text": text, "fitted": False, "method": "none", "steps": []}
+        if text is None:
+            return result
+        if len(text) <= max_length:
+            result.update(fitted=True, method="unchanged")
+            return result
+
+        original_length = len(text)
+        steps = [("compact", self.compact)]
+        if language_code == "ENGL":
+            steps.append(("abbreviate", lambda value: self.abbreviate(value, max_length)))
+            steps.append(("drop_stop_words", lambda value: self.drop_stop_words(value, max_length)))
+
+        current = text
+        for name, step in steps:
+            shorter = step(current)
+            if shorter != current:
+                result["steps"].append(name)
+                current = shorter
+            if len(current) <= max_length:
+                result.update(text=current, fitted=True, method="rules")
+                return result
+
+        # Trim only when most of the content survives, otherwise the text would lose its meaning
+        if allow_trim and language_code == "ENGL" and max_length >= self.MIN_KEEP_RATIO * len(current):
+            current = self.trim(current, max_length)
+            result["steps"].append("trim")
+            result.update(text=current, fitted=len(current) <= max_length, method="trim")
+            return result
+
+        logger.info(f"Rules could only shorten {original_length} to {len(current)} characters (limit {max_length})")
+        result["text"] = current
+        return result
+
+pies_length_fitter = PIES_Length_Fitter()
@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import logging
+
+from classes.utils.pies_prompt_builder import pies_prompt_builder
+from classes.utils.pies_length_fitter import pies_length_fitter
+from classes.ai_engines.openai_client import openai_client
+from classes.ai_engines.ollama_client import ollama_client
+from classes.ai_engines.llm_router import llm_router
+from classes.ai_engines.model_routing import model_routing
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("pies_multi_generator")
+
+class PIES_Multi_Generator:
+    def __init__(self):
+        """Initialize the multi-code generator"""
+        # Follow-up calls allowed for codes that come back invalid
+        self.MAX_ROUNDS = int(os.getenv("PIES_MULTI_MAX_ROUNDS", "3"))
+
+    def _max_tokens(self, description_codes):
+        """Output token budget for a JSON answer holding every requested code"""
+        max_lengths = pies_prompt_builder.get_pies_description_max_lengths()
+        characters = sum(max_lengths.get(code, 255) for code in description_codes)
+        # About 4 characters per token, plus keys and JSON punctuation
+        return max(500, characters // 3 + 20 * len(description_codes))
+
+    def _params(self, description_codes):
+        """Routed temperature and timeout for the multi-code task, with the budget for the requested codes"""
+        params = model_routing.client_params(task="pies_multi")
+        params["max_tokens"] = self._max_tokens(description_codes)
+        return params
+
+    def _generate(self, prompt, description_codes, model_source, model_name, use_cache):
+        """Blocking structured-output call to the selected AI client with the routed multi-code settings"""
+        response_format = pies_prompt_builder.build_pies_multi_schema(description_codes)
+        params = self._params(description_codes)
+        if model_source == "Ollama":
+            model = model_routing.model_for("ollama", model_name, task="pies_multi")
+            return ollama_client.generate_with_ollama(
+                prompt, model, use_cache=use_cache,
+                response_format=response_format["json_schema"]["schema"], **params
+            )
+        if model_source == "Auto":
+            # The backends take different structured-output formats, so routed requests rely on the prompt's JSON instructions
+            models = model_routing.route_models(model_name if isinstance(model_name, dict) else None, task="pies_multi")
+            return llm_router.generate(prompt, models, use_cache=use_cache, **params)
+        model = model_routing.model_for("openai", model_name, task="pies_multi")
+        return openai_client.generate_with_openai(
+            prompt, model, use_cache=use_cache, response_format=response_format, **params
+        )
+
+    @staticmethod
+    def parse_response(text, description_codes):
+        """
+        Read the descriptions out of a JSON answer
+
+        Returns:
+            dict: Description per code; codes missing from the answer are left out
+        """
+        if not text:
+            return {}
+        text = text.strip()
+        # Some models wrap JSON in a code fence despite the instructions
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text[text.find("{"):]
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end == -1:
+            return {}
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+        return {
+            code: str(data[code]).strip()
+            for code in description_codes
+            if isinstance(data, dict) and data.get(code) not in (None, "")
+        }
+
+    def generate(self, product_info, description_codes, language_code, model_source="OpenAI", model_name=None, max_rounds=None, use_cache=True):
+        """
+        Generate several PIES descriptions for one part with one structured call
+
+        Every description is validated against the PIES limits; only the codes
+        that fail are asked for again, together with the reason they failed.
+
+        Args:
+            product_info (dict): Information about the automotive part
+            description_codes (list): PIES description codes to generate
+            language_code (str): PIES language code
+            model_source (str): 'OpenAI', 'Ollama' or 'Auto'
+            model_name (str or dict): The model to use, or the model per backend for 'Auto'
+            max_rounds (int, optional): Calls allowed in total. Defaults to PIES_MULTI_MAX_ROUNDS
+            use_cache (bool): Allow responses from the LLM response cache
+
+        Returns:
+            dict: descriptions (per code: description, is_valid, issues, fit_method, attempts), calls, elapsed and error
+        """
+        max_rounds = max_rounds or self.MAX_ROUNDS
+        start = time.perf_counter()
+        max_lengths = pies_prompt_builder.get_pies_description_max_lengths()
+        results = {}
+        pending = list(description_codes)
+        issues = {}
+        calls = 0
+        error = None
+
+        # Ollama re-requests continue one conversation, so the part context isn't evaluated again
+        chat_session = None
+        if model_source == "Ollama":
+            chat_session = ollama_client.start_chat(
+                model_routing.model_for("ollama", model_name, task="pies_multi"), **self._params(description_codes)
+            )
+
+        while pending and calls < max_rounds:
+            calls += 1
+            if chat_session is not None:
+                if chat_session.turns:
+                    prompt = pies_prompt_builder.build_pies_multi_followup_prompt(issues)
+                else:
+                    prompt = pies_prompt_builder.build_pies_multi_prompt(product_info, pending, language_code)
+                schema = pies_prompt_builder.build_pies_multi_schema(pending)["json_schema"]["schema"]
+                text = chat_session.send(prompt, response_format=schema)
+            else:
+                prompt = pies_prompt_builder.build_pies_multi_prompt(product_info, pending, language_code, previous_issues=issues)
+                text = self._generate(prompt, pending, model_source, model_name, use_cache)
+            if not text or text.startswith("Error"):
+                error = text or "Error: empty response from model"
+                logger.error(f"Multi-code generation failed: {error}")
+                break
+
+            parsed = self.parse_response(text, pending)
+            issues = {}
+            for code in pending:
+                description = parsed.get(code)
+                if description is None:
+                    issues[code] = ["Description was missing from the response"]
+                    continue
+                # Remove invalid characters
+                for char in pies_prompt_builder.invalid_characters:
+                    description = description.replace(char, "")
+                # Fit over-long fields by rule, only what the rules can't fix is re-requested; the last round may cut the text
+                fit = pies_length_fitter.fit(description, max_lengths.get(code, 255), language_code, allow_trim=calls >= max_rounds)
+                description = fit["text"]
+                validation = pies_prompt_builder.validate_pies_description(code, description)
+                # Keep the latest attempt even if it is invalid, it is better than nothing after the last round
+                results[code] = {
+                    "description": description,
+                    "is_valid": validation["is_valid"],
+                    "issues": validation["issues"],
+                    "fit_method": fit["method"],
+                    "attempts": calls
+                }
+                if not validation["is_valid"]:
+                    issues[code] = validation["issues"] + [f"It was {len(description)} characters"]
+            pending = list(issues)
+            if pending:
+                logger.info(f"Re-requesting {len(pending)} invalid descriptions: {pending}")
+
+        for code in description_codes:
+            results.setdefault(code, {
+                "description": None,
+                "is_valid": False,
+                "issues": issues.get(code) or [error or "Description was not generated"],
+                "fit_method": None,
+                "attempts": calls
+            })
+
+        return {
+            "descriptions": {code: results[code] for code in description_codes},
+            "calls": calls,
+            "elapsed": time.perf_counter() - start,
+            "error": error
+        }
+
+pies_multi_generator = PIES_Multi_Generator()
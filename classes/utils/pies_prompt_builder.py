@@ -114,22 +114,14 @@ class PIES_Prompt_Builder:
         # Convert language code to language name
         language_name = self.convert_language_code_to_name(language_code)
         
-        # Map description types to their context
-        description_contexts = self.get_pies_description_codes()
-        
         # Get context for the description type
-        context = description_contexts.get(description_type, "product description")
-        
-        # Set max length based on description type
-        max_lengths = self.get_pies_description_max_lengths()
-        max_length = max_lengths.get(description_type, 255)
-        adjusted_max_length = max_length - (max_length * 0.2)
+        context = self.get_pies_description_codes().get(description_type, "product description")
         
-        # Build the base prompt
-        prompt = f"""You are a professional automotive aftermarket content writer specializing in PIES-compliant product descriptions. It is extremely IMPORTANT that you should make sure that the description is not longer than {max_length} characters.
-
+        # Instructions are the same for every part, so they go first and the part data last
+        prompt = self.build_pies_instructions(description_type)
+        prompt += f"""
 Write a {context} for part number {part_number}, which is a {product_category} from {brand}. This must be written in {language_name}.
-        """
+"""
         
         # Add part type if available
         if part_type:
@@ -146,6 +138,40 @@ Write a {context} for part number {part_number}, which is a {product_category} f
         # Add fitment information if available
         if fitment:
             prompt += f"Fitment information: {fitment}.\n"
+
+        return prompt 
+
+    # Function to build the static part of a PIES prompt
+    def build_pies_instructions(self, description_type):
+        """
+        Build the instructions for a PIES description code, without any part data
+
+        The text only depends on the description code, so it is byte-identical
+        for every part and providers can serve it from their prompt cache.
+
+        Args:
+            description_type (str): PIES description code
+
+        Returns:
+            str: The instruction prefix of the prompt
+        """
+        # Set max length based on description type
+        max_lengths = self.get_pies_description_max_lengths()
+        max_length = max_lengths.get(description_type, 255)
+        adjusted_max_length = max_length - (max_length * 0.2)
+
+        # Shared by every description code
+        prompt = f"""You are a professional automotive aftermarket content writer specializing in PIES-compliant product descriptions.
+
+PIES XML COMPLIANCE REQUIREMENTS:
+1. Do not include HTML or XML tags in your description
+2. IMPORTANT: Must NOT include special characters like {', '.join(self.invalid_characters)}. Do not include line breaks in your description.
+3. Do not include marketing slogans or excessive capitalization
+4. Focus on factual, specific information about the part
+5. Respond with ONLY the description text, nothing else
+
+It is extremely IMPORTANT that you should make sure that the description is not longer than {max_length} characters.
+        """
         
         # Add specific instructions based on description type
         # TODO: Clean up to be more dynamic and not hardcoded
@@ -316,18 +342,166 @@ For this TECHNICAL TIP DETAIL:
 6. Do not include any fitment information
             """
         
-        # Add PIES compliance instructions
-        prompt += f"""
+        # Add character limit instruction
+        prompt += f"\nIMPORTANT: Maximum length is {adjusted_max_length} characters. Do not exceed this limit.\n"
+
+        return prompt 
+
+    # Function to build one prompt for several PIES descriptions
+    def build_pies_multi_prompt(self, product_info, description_types, language_code, previous_issues=None):
+        """
+        Build a prompt asking for several PIES descriptions of one part in a single JSON response
+
+        Args:
+            product_info (dict): Information about the automotive part (same keys as build_pies_prompt)
+            description_types (list): PIES description codes to generate
+            language_code (str): PIES language code
+            previous_issues (dict, optional): Validation issues per code from an earlier attempt
+
+        Returns:
+            str: A formatted prompt for the AI
+        """
+        language_name = self.convert_language_code_to_name(language_code)
+        description_contexts = self.get_pies_description_codes()
+        max_lengths = self.get_pies_description_max_lengths()
+
+        # Static instructions first, the codes and part data of this request last
+        prompt = f"""You are a professional automotive aftermarket content writer specializing in PIES-compliant product descriptions.
+
 PIES XML COMPLIANCE REQUIREMENTS:
-1. Do not include HTML or XML tags in your description
-2. IMPORTANT: Must NOT include special characters like {', '.join(self.invalid_characters)}. Do not include line breaks in your description.
+1. Do not include HTML or XML tags in any description
+2. IMPORTANT: Must NOT include special characters like {', '.join(self.invalid_characters)}. Do not include line breaks in any description.
 3. Do not include marketing slogans or excessive capitalization
 4. Focus on factual, specific information about the part
-5. Respond with ONLY the description text, nothing else
+5. Only FIT_SUMMARY may contain fitment information
+
+Respond with ONLY a JSON object that has exactly one string field per description code listed below.
+"""
+
+        prompt += "\nDESCRIPTIONS TO WRITE (each value must stay under its character limit):\n"
+        for description_type in description_types:
+            max_length = max_lengths.get(description_type, 255)
+            context = description_contexts.get(description_type, "product description")
+            prompt += f"- {description_type} (under {int(max_length * 0.8)} characters, never more than {max_length}): {context}\n"
+
+        prompt += f"\nWrite these descriptions for part number {product_info.get('part_number', '')}, which is a {product_info.get('product_category', '')} from {product_info.get('brand', '')}. All descriptions must be written in {language_name}.\n"
+        # Part context is sent once for every requested code
+        for label, key in [("Specific part type", "part_type"), ("Engine application", "engine_application"), ("Material", "material"), ("Fitment information", "fitment")]:
+            if product_info.get(key):
+                prompt += f"{label}: {product_info[key]}.\n"
+
+        if previous_issues:
+            prompt += "\n"
+            for description_type in description_types:
+                if previous_issues.get(description_type):
+                    prompt += f"Your previous {description_type} was rejected: {'; '.join(previous_issues[description_type])}\n"
+
+        return prompt
+
+    # Function to build a prompt translating a finished PIES description
+    def build_pies_translation_prompt(self, text, description_type, target_language_code, source_language_code="ENGL"):
         """
-        # Add character limit instruction
-        prompt += f"\nIMPORTANT: Maximum length is {adjusted_max_length} characters. Do not exceed this limit."
+        Build a prompt asking the AI to translate a PIES description
 
-        return prompt 
+        Args:
+            text (str): The description to translate
+            description_type (str): PIES description code of the text
+            target_language_code (str): PIES language code to translate into
+            source_language_code (str): PIES language code of the text
+
+        Returns:
+            str: A formatted prompt for the AI
+        """
+        max_length = self.get_pies_description_max_lengths().get(description_type, 255)
+        # The rules are the same for every text, only the languages and the text follow them
+        prompt = f"""You are a professional automotive aftermarket translator specializing in PIES-compliant product descriptions.
+
+RULES:
+1. Keep part numbers, brand names, model names and units exactly as written
+2. Use the terminology automotive parts catalogs use in the target language
+3. The translation must stay within the character limit given below; abbreviate the way catalogs in that language do if needed
+4. IMPORTANT: Must NOT include special characters like {', '.join(self.invalid_characters)}. Do not include line breaks.
+5. Respond with ONLY the translated text, nothing else
+
+Translate the following {description_type} description from {self.convert_language_code_to_name(source_language_code)} into {self.convert_language_code_to_name(target_language_code)}. The translation must be no more than {max_length} characters.
+
+Text to translate:
+{text}"""
+        return prompt
+
+    # Function to build a prompt asking for a shorter version of a description
+    def build_pies_shorten_prompt(self, text, description_type):
+        """
+        Build a prompt asking the AI to rewrite a description that is over its PIES limit
+
+        Args:
+            text (str): The description that is too long
+            description_type (str): PIES description code of the text
+
+        Returns:
+            str: A formatted prompt for the AI
+        """
+        max_length = self.get_pies_description_max_lengths().get(description_type, 255)
+        # Instructions first so every part shares the prefix, the hard limit is repeated after the text
+        prompt = f"""Rewrite the description below to be more concise while retaining the key information.
+Your response must be ONLY the shortened description text.
+
+This {description_type} description is too long. It is {len(text)} characters, but must be no more than {max_length} characters.
+
+Original description:
+{text}
+
+Your response MUST be under {max_length} characters."""
+        return prompt
+
+    # Function to build a follow-up turn for a multi-code conversation
+    def build_pies_multi_followup_prompt(self, previous_issues):
+        """
+        Ask again for the descriptions that failed validation, within the same conversation
+
+        Args:
+            previous_issues (dict): Validation issues per description code
+
+        Returns:
+            str: A short follow-up message; the part context is already in the conversation
+        """
+        max_lengths = self.get_pies_description_max_lengths()
+        prompt = "Some descriptions were rejected. Rewrite only these:\n"
+        for description_type, issues in previous_issues.items():
+            prompt += f"- {description_type} (never more than {max_lengths.get(description_type, 255)} characters): {'; '.join(issues)}\n"
+        prompt += "\nRespond with ONLY a JSON object that has exactly one string field per description code listed above."
+        return prompt
+
+    # Function to build the structured output schema for a multi-code prompt
+    def build_pies_multi_schema(self, description_types):
+        """
+        Build a JSON schema response format with one string field per description code
+
+        Args:
+            description_types (list): PIES description codes requested
+
+        Returns:
+            dict: An OpenAI json_schema response format; its "schema" can be passed to Ollama as format
+        """
+        max_lengths = self.get_pies_description_max_lengths()
+        return {
+            "type": "json_schema",
+            "json_schema": {
+                "name": "pies_descriptions",
+                "strict": True,
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        description_type: {
+                            "type": "string",
+                            "description": f"{description_type}, at most {max_lengths.get(description_type, 255)} characters"
+                        }
+                        for description_type in description_types
+                    },
+                    "required": list(description_types),
+                    "additionalProperties": False
+                }
+            }
+        }
 
 pies_prompt_builder = PIES_Prompt_Builder()
\ No newline at end of file
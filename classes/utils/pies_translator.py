@@ -0,0 +1,228 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from classes.db.database import DB_DIR
+from classes.utils.pies_prompt_builder import pies_prompt_builder
+from classes.utils.pies_length_fitter import pies_length_fitter
+from classes.ai_engines.openai_client import openai_client
+from classes.ai_engines.ollama_client import ollama_client
+from classes.ai_engines.llm_router import llm_router
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("pies_translator")
+
+class PIES_Translation_Memory:
+    def __init__(self, db_path=None):
+        """Initialize the SQLite-backed translation memory"""
+        self.db_path = db_path or os.getenv("TRANSLATION_MEMORY_PATH", os.path.join(DB_DIR, "translation_memory.db"))
+        self.ENABLED = os.getenv("TRANSLATION_MEMORY_ENABLED", "true").lower() == "true"
+
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _get_connection(self):
+        """Open the translation memory database on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS translation_memory (
+                    source_hash TEXT NOT NULL,
+                    target_language TEXT NOT NULL,
+                    source_language TEXT NOT NULL,
+                    source_text TEXT NOT NULL,
+                    translated_text TEXT NOT NULL,
+                    description_code TEXT,
+                    model TEXT,
+                    created_at REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (source_hash, target_language)
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(text, source_language="ENGL"):
+        """Hash the source text with its whitespace normalized"""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{source_language}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, text, target_language, source_language="ENGL"):
+        """
+        Look up an earlier translation
+
+        Returns:
+            str: The translated text, or None if this text was never translated into the language
+        """
+        if not self.ENABLED:
+            return None
+        key = self.make_key(text, source_language)
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                row = conn.execute(
+                    "SELECT translated_text FROM translation_memory WHERE source_hash = ? AND target_language = ?",
+                    (key, target_language)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                conn.execute(
+                    "UPDATE translation_memory SET hit_count = hit_count + 1 WHERE source_hash = ? AND target_language = ?",
+                    (key, target_language)
+                )
+                conn.commit()
+                self.hits += 1
+            return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Error reading translation memory: {e}")
+            return None
+
+    def set(self, text, target_language, translated_text, source_language="ENGL", description_code=None, model=None):
+        """Store a translation"""
+        if not self.ENABLED:
+            return
+        try:
+            with self._lock:
+                conn = self._get_connection()
+                conn.execute(
+                    """
+                    INSERT INTO translation_memory (source_hash, target_language, source_language, source_text, translated_text, description_code, model, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(source_hash, target_language) DO UPDATE SET
+                        translated_text = excluded.translated_text,
+                        model = excluded.model,
+                        created_at = excluded.created_at
+                    """,
+                    (self.make_key(text, source_language), target_language, source_language, text, translated_text, description_code, model, time.time())
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing translation memory: {e}")
+
+    def clear(self):
+        """Delete every stored translation and reset the counters"""
+        with self._lock:
+            conn = self._get_connection()
+            conn.execute("DELETE FROM translation_memory")
+            conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return hit/miss counters and the number of stored translations"""
+        with self._lock:
+            entries = self._get_connection().execute("SELECT COUNT(*) FROM translation_memory").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+class PIES_Translator:
+    def __init__(self):
+        """Initialize the description translator"""
+        self._executor = ThreadPoolExecutor(max_workers=int(os.getenv("PIES_TRANSLATION_WORKERS", "8")), thread_name_prefix="pies_translate")
+
+    def _generate(self, prompt, description_code, model_source, model_name, use_cache):
+        """Blocking call to the selected AI client with the routed translation settings"""
+        params = model_routing.client_params(description_code, task="translate")
+        if model_source == "Ollama":
+            model = model_routing.model_for("ollama", model_name, description_code, task="translate")
+            return ollama_client.generate_with_ollama(prompt, model, use_cache=use_cache, **params)
+        if model_source == "Auto":
+            models = model_routing.route_models(model_name if isinstance(model_name, dict) else None, description_code, task="translate")
+            return llm_router.generate(prompt, models, use_cache=use_cache, **params)
+        model = model_routing.model_for("openai", model_name, description_code, task="translate")
+        return openai_client.generate_with_openai(prompt, model, use_cache=use_cache, **params)
+
+    def translate(self, text, description_code, target_language_code, model_source="OpenAI", model_name=None, source_language_code="ENGL", use_cache=True):
+        """
+        Translate a finished description, reusing the translation memory
+
+        Args:
+            text (str): The description to translate
+            description_code (str): PIES description code of the text
+            target_language_code (str): PIES language code to translate into
+            model_source (str): 'OpenAI', 'Ollama' or 'Auto'
+            model_name (str or dict): The model to use, or the model per backend for 'Auto'
+            source_language_code (str): PIES language code of the text
+            use_cache (bool): Allow translations from the memory and the LLM response cache
+
+        Returns:
+            dict: description, is_valid, issues, from_memory, elapsed and error
+        """
+        start = time.perf_counter()
+        result = {
+            "language_code": target_language_code,
+            "description": None,
+            "is_valid": False,
+            "issues": [],
+            "from_memory": False,
+            "elapsed": 0.0,
+            "error": None
+        }
+        if target_language_code == source_language_code:
+            translated = text
+        else:
+            translated = translation_memory.get(text, target_language_code, source_language_code) if use_cache else None
+            result["from_memory"] = translated is not None
+            if translated is None:
+                prompt = pies_prompt_builder.build_pies_translation_prompt(text, description_code, target_language_code, source_language_code)
+                translated = self._generate(prompt, description_code, model_source, model_name, use_cache)
+                # Error text must never end up in the translation memory
+                if not translated or translated.startswith("Error"):
+                    result["error"] = translated or "Empty response"
+                    result["elapsed"] = time.perf_counter() - start
+                    return result
+                for char in pies_prompt_builder.invalid_characters:
+                    translated = translated.replace(char, "")
+                # Stored before fitting: the same text may be translated for a description code with another length
+                translation_memory.set(text, target_language_code, translated, source_language_code, description_code, model=model_name if isinstance(model_name, str) else None)
+
+        max_length = pies_prompt_builder.get_pies_description_max_lengths().get(description_code, 255)
+        translated = pies_length_fitter.fit(translated, max_length, target_language_code)["text"]
+
+        validation = pies_prompt_builder.validate_pies_description(description_code, translated)
+        result.update(description=translated, is_valid=validation["is_valid"], issues=validation["issues"])
+        result["elapsed"] = time.perf_counter() - start
+        return result
+
+    def translate_all(self, descriptions, target_language_codes, model_source="OpenAI", model_name=None, source_language_code="ENGL", use_cache=True):
+        """
+        Translate several descriptions into several languages concurrently
+
+        Args:
+            descriptions (dict): Source text per PIES description code
+            target_language_codes (list): PIES language codes to translate into
+
+        Returns:
+            dict: Result of translate() per (description_code, language_code)
+        """
+        futures = {
+            (code, language_code): self._executor.submit(
+                llm_telemetry.bind(self.translate), text, code, language_code, model_source, model_name, source_language_code, use_cache
+            )
+            for code, text in descriptions.items()
+            for language_code in target_language_codes
+            if language_code != source_language_code
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+translation_memory = PIES_Translation_Memory()
+pies_translator = PIES_Translator()
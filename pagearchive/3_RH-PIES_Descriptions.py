@@ -74,7 +74,6 @@ if input_mode == "Select from Database":
             st.warning("No parts found in database.")
             input_mode = "Enter Manually"
         cursor.close()
-        conn.close()
     else:
         input_mode = "Enter Manually"
 
@@ -5,6 +5,8 @@ import io
 import base64
 from pathlib import Path
 from classes.ai_engines.openai_client import openai_client
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
@@ -17,6 +19,7 @@ model_name = os.getenv("OPENAI_MODEL")
 
 #---------------- Header with API control --------------
 pagename = "KPI Analyzer"
+llm_telemetry.set_page(pagename)
 pageicon = "📊"
 st.set_page_config(page_title=pagename, layout="wide",page_icon=pageicon)
 st.subheader(f"{pageicon} {pagename}")
@@ -278,8 +281,20 @@ if 'file_loaded' in st.session_state and st.session_state['file_loaded']:
                     else:
                         dimension_summary = "No dimensions selected for grouping."
                     
+                    # Fixed instructions first and the data last, so repeated analyses share the prompt prefix
                     prompt = f"""
-                    As a business intelligence analyst, analyze the following data and create a KPI report focused on {analysis_focus}.
+                    As a business intelligence analyst, analyze the data below and create a KPI report.
+                    
+                    Please provide:
+                    1. An executive summary (3-4 sentences)
+                    2. Key insights (5 bullet points)
+                    3. Recommendations (3 bullet points)
+                    4. Analysis of each metric listed below (2-3 sentences per metric)
+                    
+                    Format your response as a structured report with these clear sections.
+                    
+                    FOCUS: {analysis_focus}
+                    METRICS: {', '.join(selected_metrics)}
                     
                     DATA SAMPLE:
                     {data_sample}
@@ -289,18 +304,10 @@ if 'file_loaded' in st.session_state and st.session_state['file_loaded']:
                     
                     DIMENSION SUMMARY:
                     {dimension_summary}
-                    
-                    Please provide:
-                    1. An executive summary (3-4 sentences)
-                    2. Key insights (5 bullet points)
-                    3. Recommendations (3 bullet points)
-                    4. Analysis of each metric: {', '.join(selected_metrics)} (2-3 sentences per metric)
-                    
-                    Format your response as a structured report with these clear sections.
                     """
                     
                     # Generate AI analysis
-                    ai_analysis = openai_client.generate_with_openai(prompt, model_name)
+                    ai_analysis = openai_client.generate_with_openai(prompt, model_name, **model_routing.client_params(task="kpi_analysis"))
                     
                     # Create PowerPoint presentation
                     progress_container.info("Creating PowerPoint presentation...")
@@ -2,12 +2,16 @@ import streamlit as st
 import json
 import requests
 import os
+from classes.ai_engines.llm_transport import llm_transport
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
 
 # Variables
 model_name = os.getenv("OPENAI_MODEL")
 
 #---------------- Header with API control --------------
 pagename = "Search Normalization"
+llm_telemetry.set_page(pagename)
 pageicon = "🔍"
 st.set_page_config(page_title=pagename, layout="wide",page_icon=pageicon)
 st.subheader(f"{pageicon} {pagename}")
@@ -72,11 +76,6 @@ def query_openai(prompt: str, api_key: str):
         step2.info("🔧 Building API request...")
     
     # Create the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
     payload = {
         "model": model_name,
         "messages": [
@@ -91,24 +90,21 @@ def query_openai(prompt: str, api_key: str):
         ],
         "response_format": {"type": "json_object"}
     }
+    # Token budget, temperature and timeout for this task from the model routing table
+    payload, timeout = model_routing.apply_to_payload(payload, task="search_normalization")
     
     # Step 3: Making the API call
     with status_container:
         step3.warning("🔄 Sending to AI model...")
     
     try:
-        # Direct API call without simulated delays
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
+        # API call through the shared pooled transport
+        result = llm_transport.chat_completion(payload, api_key, timeout=timeout)
         
         with status_container:
             step3.success("✅ Response received")
         
-        return response.json(), status_container
+        return result, status_container
     
     except requests.exceptions.RequestException as e:
         with status_container:
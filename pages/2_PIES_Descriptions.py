@@ -3,13 +3,16 @@ import os
 import json
 import pandas as pd
 import requests
+import sqlite3
 import time
 
 # Variables
-ollama_inactive = True
+ollama_inactive = not os.getenv("OLLAMA_URL")  # Ollama is only offered when a server is configured
 model_source = "OpenAI"
-model_name = os.getenv("OPENAI_MODEL")
+model_name = None  # None lets model routing pick the model per description code, then the client default (OPENAI_MODEL)
 ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")  # Default Ollama URL
+route_models = {}  # Model per backend when the router picks the backend
+use_model_routing = True  # Pick model, token budget, temperature and timeout per description code
 
 #---------------- Header with API control --------------
 pagename = "PIES Description Builder"
@@ -21,7 +24,7 @@ with st.expander(f"Description of {pagename}", expanded=False):
 This tool helps you generate professional product descriptions that comply with Auto Care PIES (Product Information Exchange Standard) requirements using AI technology.
 
 You can:
-- Connect to either OpenAI or Ollama language models { "<i>(Ollama deactivated for demo)</i>" if ollama_inactive else "OpenAI" }
+- Connect to either OpenAI or Ollama language models { "<i>(Ollama is not configured, set OLLAMA_URL to enable it)</i>" if ollama_inactive else "" }
 - Select parts from an existing database or enter new part details manually  
 - Generate accurate, standardized descriptions for automotive parts and components
 - Save generated descriptions for future reference
@@ -70,13 +73,27 @@ loading_placeholder.markdown("""
 # Import utility functions - doing imports after showing loading message
 from classes.utils.pies_prompt_builder import pies_prompt_builder
 from classes.ai_engines.openai_client import openai_client
-from classes.ai_engines.ollama_client import ollama_client
+from classes.ai_engines.ollama_client import ollama_client, ollama_model_manager
+from classes.ai_engines.response_cache import llm_response_cache
+from classes.ai_engines.circuit_breaker import circuit_breakers
+from classes.ai_engines.llm_router import llm_router
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
+from classes.ai_engines.single_flight import single_flight
 from classes.db import db
 from classes.db.initalize_database import initialize_database
+from classes.db.parts_importer import parts_importer
+from classes.db.description_writer import description_writer
+from classes.utils.pies_batch_generator import pies_batch_generator
+from classes.utils.pies_multi_generator import pies_multi_generator
+from classes.utils.pies_length_fitter import pies_length_fitter
+from classes.utils.pies_candidate_generator import pies_candidate_generator
+from classes.utils.pies_translator import pies_translator, translation_memory
 
-# Disable Ollama option for the demo
-# Look at the README.md file for more information
-ollama_inactive = True
+llm_telemetry.set_page(pagename)
+
+# Parts shown per page when browsing the catalog
+BROWSE_PAGE_SIZE = int(os.getenv("PIES_BROWSE_PAGE_SIZE", "50"))
 
 # Database initialization
 db_initialized = False
@@ -93,6 +110,16 @@ if not os.path.exists(db_path):
     # Create the database
     initialize_database.create_database()
     db_initialized = True
+else:
+    # An existing database gets new migrations (full-text index, browse indexes) before anything queries it.
+    # Applied migrations are tracked in PRAGMA user_version, so this is a single PRAGMA on most reruns
+    migration_conn = sqlite3.connect(db_path)
+    try:
+        initialize_database.apply_migrations(migration_conn)
+    except sqlite3.Error as e:
+        st.error(f"Error applying database migrations: {e}")
+    finally:
+        migration_conn.close()
 
 # Verify database connection
 if not db.connection_status():
@@ -118,32 +145,62 @@ else:
 loading_placeholder.empty()
 
 # Function to generate PIES description
-def generate_description(prompt, model_source, model_name, api_key=None, ollama_url=None):
-    """Generate description using selected AI model"""
+def generate_description(prompt, model_source, model_name, api_key=None, ollama_url=None, use_cache=True, description_code=None, task=None):
+    """Generate description using selected AI model, with the routed settings for the description code or task"""
+    params = model_routing.client_params(description_code, task)
     try:
         if model_source == 'OpenAI':
             # API key is already set in the sidebar
-            return openai_client.generate_with_openai(prompt, model_name)
+            model = model_routing.model_for("openai", model_name, description_code, task)
+            return openai_client.generate_with_openai(prompt, model, use_cache=use_cache, **params)
         elif model_source == 'Ollama':
             # Override URL for this request
             os.environ["OLLAMA_URL"] = ollama_url
-            return ollama_client.generate_with_ollama(prompt, model_name)
+            model = model_routing.model_for("ollama", model_name, description_code, task)
+            return ollama_client.generate_with_ollama(prompt, model, use_cache=use_cache, **params)
+        elif model_source == 'Auto':
+            models = model_routing.route_models(route_models, description_code, task)
+            return llm_router.generate(prompt, models, use_cache=use_cache, **params)
     except Exception as e:
         st.error(f"Error generating description: {e}")
         return None
 
-def check_and_shorten_description(description, description_type, model_source, model_name, api_key=None, ollama_url=None, max_retries=5):
+def stream_description(prompt, model_source, model_name, ollama_url=None, max_chars=None, use_cache=True, description_code=None):
+    """Stream description tokens from the selected AI model, stopping early once max_chars is exceeded"""
+    params = model_routing.client_params(description_code)
+    try:
+        if model_source == 'OpenAI':
+            model = model_routing.model_for("openai", model_name, description_code)
+            yield from openai_client.stream_with_openai(prompt, model, max_chars=max_chars, use_cache=use_cache, **params)
+        elif model_source == 'Ollama':
+            # Override URL for this request
+            os.environ["OLLAMA_URL"] = ollama_url
+            model = model_routing.model_for("ollama", model_name, description_code)
+            yield from ollama_client.stream_with_ollama(prompt, model, max_chars=max_chars, use_cache=use_cache, **params)
+        elif model_source == 'Auto':
+            models = model_routing.route_models(route_models, description_code)
+            yield from llm_router.stream(prompt, models, max_chars=max_chars, use_cache=use_cache, **params)
+    except Exception as e:
+        st.error(f"Error generating description: {e}")
+
+def check_and_shorten_description(description, description_type, model_source, model_name, api_key=None, ollama_url=None, max_retries=5, language_code="ENGL", truncated=False):
     """
-    Check if description length is within limits and request shorter descriptions if needed.
+    Check if description length is within limits and shorten it if needed.
+
+    The text is first shortened locally (abbreviations, stop words); the model
+    is only asked for a shorter version when those rules can't reach the limit.
+    English text the model couldn't shorten either is cut at a word boundary as a last resort.
     
     Args:
         description (str): The generated description
         description_type (str): PIES description code
-        model_source (str): Either 'OpenAI' or 'Ollama'
+        model_source (str): 'OpenAI', 'Ollama' or 'Auto'
         model_name (str): The model name to use
         api_key (str, optional): OpenAI API key
         ollama_url (str, optional): Ollama server URL
         max_retries (int): Maximum number of retry attempts
+        language_code (str): PIES language code, local abbreviations are only applied to English
+        truncated (bool): The text was cut off while streaming, so only a model rewrite can complete it
         
     Returns:
         str: The final description (may be shortened)
@@ -155,68 +212,217 @@ def check_and_shorten_description(description, description_type, model_source, m
     max_lengths = pies_prompt_builder.get_pies_description_max_lengths()
     max_length = max_lengths.get(description_type, 255)
     
+    # Try to fit the description by rule before asking the model again; an unfinished text must be rewritten
+    fit = pies_length_fitter.fit(description, max_length, language_code)
+    if fit["fitted"] and not truncated:
+        if fit["method"] == "rules":
+            st.info(f"Description shortened locally to {len(fit['text'])}/{max_length} characters ({', '.join(fit['steps'])}).")
+        return fit["text"]
+
     # Check if description is too long
     retry_count = 0
-    current_desc = description
+    current_desc = description if truncated else fit["text"]
+
+    # On Ollama, retries continue one conversation so the server reuses the already evaluated prompt
+    chat_session = None
+    if model_source == 'Ollama':
+        routed_code = description_type if use_model_routing else None
+        chat_session = ollama_client.start_chat(
+            model_routing.model_for("ollama", model_name, routed_code, task="shorten"),
+            system_prompt="You are a professional product description writer specializing in concise, engaging, and accurate descriptions for automotive parts.",
+            **model_routing.client_params(routed_code, task="shorten")
+        )
     
     while len(current_desc) > max_length and retry_count < max_retries:
-        # Create a prompt asking to shorten the description
-        shorten_prompt = f"""
-The following description for a {description_type} is too long. It is {len(current_desc)} characters, 
-but must be no more than {max_length} characters.
-
-Original description:
-{current_desc}
-
-Please rewrite this to be more concise while retaining the key information. 
-Your response must be ONLY the shortened description text, and MUST be under {max_length} characters.
-"""
+        if chat_session is not None and chat_session.turns:
+            # Follow-up turn: the description is already in the conversation
+            shorten_prompt = f"That is still {len(current_desc)} characters. Shorten it to no more than {max_length} characters. Respond with ONLY the shortened description text."
+        else:
+            shorten_prompt = pies_prompt_builder.build_pies_shorten_prompt(current_desc, description_type)
         
         retry_count += 1
         st.warning(f"Description exceeds maximum length. Attempting to shorten it (Attempt {retry_count}/{max_retries})...")
         
         # Request a shorter version
         with st.spinner(f"Shortening description (attempt {retry_count}/{max_retries})..."):
-            if model_source == 'OpenAI':
-                shorter_desc = openai_client.generate_with_openai(shorten_prompt, model_name)
+            if chat_session is not None:
+                shorter_desc = chat_session.send(shorten_prompt)
             else:
-                shorter_desc = ollama_client.generate_with_ollama(shorten_prompt, model_name)
-            
-            # Clean up invalid characters
-            if shorter_desc:
-                for char in pies_prompt_builder.invalid_characters:
-                    shorter_desc = shorter_desc.replace(char, "")
-                current_desc = shorter_desc
+                shorter_desc = generate_description(
+                    shorten_prompt,
+                    model_source,
+                    model_name,
+                    api_key=api_key,
+                    ollama_url=ollama_url,
+                    description_code=description_type if use_model_routing else None,
+                    task="shorten"
+                )
             
             # If we got back an empty response or error, break the loop
             if not shorter_desc or "Error" in shorter_desc:
                 break
+
+            # Clean up invalid characters
+            for char in pies_prompt_builder.invalid_characters:
+                shorter_desc = shorter_desc.replace(char, "")
+
+            # A model answer that is only slightly too long can still be fitted by rule
+            fit = pies_length_fitter.fit(shorter_desc, max_length, language_code)
+            current_desc = fit["text"]
+            truncated = False
+            if fit["fitted"]:
+                st.info(f"Description shortened by the model in {retry_count} attempt(s){' and fitted locally' if fit['method'] == 'rules' else ''}.")
+                break
+
+    # Cutting the text off is the last resort, once the model couldn't shorten it
+    if len(current_desc) > max_length and not truncated:
+        fit = pies_length_fitter.fit(current_desc, max_length, language_code, allow_trim=True)
+        if fit["method"] == "trim":
+            current_desc = fit["text"]
+            st.warning(f"The model could not shorten the description, so it was cut to {len(current_desc)}/{max_length} characters. Please review it.")
+
+    if chat_session is not None and chat_session.turns > 1:
+        st.caption(f"Prompt tokens evaluated by Ollama per attempt: {', '.join(str(count) for count in chat_session.prompt_eval_counts)} (conversation context reused)")
     
     # Return the final description, even if it's still too long after max retries
     return current_desc
 
+def part_id_for(product_info):
+    """ID of the part in the parts table, or None for a manually entered part that isn't in it"""
+    if product_info.get("id"):
+        return product_info["id"]
+    if product_info.get("part_number"):
+        parts = db.get_parts([product_info["part_number"]])
+        if parts:
+            return parts[0]["id"]
+    return None
+
+def persist_description(description_code, description, language_code, maintenance_type, sequence):
+    """Queue a finished description for the descriptions table without waiting for the write"""
+    part_id = part_id_for(product_info)
+    # Saved descriptions are reused instead of generated, so an invalid one is never stored
+    if part_id is not None and description and pies_prompt_builder.validate_pies_description(description_code, description)["is_valid"]:
+        description_writer.save(part_id, description_code, description, language_code, sequence, maintenance_type)
+
+def saved_description_for(part_id, description_code, language_code, sequence):
+    """Saved description to reuse, or None when there is none or it no longer passes validation"""
+    if part_id is None:
+        return None
+    saved = description_writer.lookup(part_id, description_code, language_code, sequence)
+    if saved and pies_prompt_builder.validate_pies_description(description_code, saved)["is_valid"]:
+        return saved
+    return None
+
+def add_translations(descriptions, source_language_code, target_language_codes, maintenance_type, sequence, use_cache=True):
+    """
+    Translate finished descriptions concurrently and add them to the generated descriptions
+
+    Args:
+        descriptions (dict): Description text per PIES description code
+        source_language_code (str): Language the descriptions were written in
+        target_language_codes (list): Languages to translate into
+    """
+    if not descriptions or not target_language_codes:
+        return
+    with st.spinner(f"Translating into {', '.join(target_language_codes)}..."):
+        translations = pies_translator.translate_all(
+            descriptions,
+            target_language_codes,
+            model_source=model_source,
+            model_name=route_models if model_source == "Auto" else model_name,
+            source_language_code=source_language_code,
+            use_cache=use_cache
+        )
+
+    translation_rows = []
+    for (code, language), translated in translations.items():
+        translation_rows.append({
+            "DescriptionCode": code,
+            "LanguageCode": language,
+            "Description": translated["description"] or translated["error"],
+            "Valid": translated["is_valid"],
+            "FromMemory": translated["from_memory"],
+            "Seconds": round(translated["elapsed"], 2)
+        })
+        # Errors are reported, never stored as a description
+        if translated["description"]:
+            st.session_state.descriptions.append({
+                "LanguageCode": language,
+                "MaintenanceType": maintenance_type,
+                "DescriptionCode": code,
+                "Sequence": sequence,
+                "Description": translated["description"]
+            })
+            persist_description(code, translated["description"], language, maintenance_type, sequence)
+
+    st.subheader("Translations")
+    st.dataframe(pd.DataFrame(translation_rows), hide_index=True, use_container_width=True)
+    memory_stats = translation_memory.stats()
+    st.caption(f"Translation memory: {memory_stats['hits']} reused, {memory_stats['misses']} new, {memory_stats['entries']} stored translations")
+
 # LLM Connection Configuration
 if not ollama_inactive:
     with st.expander("LLM Connection Configuration"):
         st.write("This section allows you to configure the connection to the LLM (Large Language Model). You can choose between OpenAI and Ollama as your LLM provider. If you choose OpenAI, you need to provide your API key. If you choose Ollama, you need to provide the URL of the Ollama server.")
         
-        model_source = st.radio("Choose Model Source:", ["OpenAI", "Ollama"])
+        # Auto fails over between the backends, so it needs both of them
+        model_sources = ["OpenAI", "Ollama", "Auto"] if api_key or os.getenv("OPENAI_API_KEY") else ["OpenAI", "Ollama"]
+        model_source = st.radio("Choose Model Source:", model_sources, help="Auto sends requests to Ollama first and fails over to OpenAI when Ollama is busy, slow or failing.")
 
         if model_source == "OpenAI":
-            model_name = st.selectbox("Select OpenAI Model:", ["gpt-4.1-nano", "gpt-4o-mini"])
+            model_name = st.selectbox(
+                "Select OpenAI Model:", [None, "gpt-4.1-nano", "gpt-4o-mini"],
+                format_func=lambda model: model or "Routed per description type",
+                help="A selected model is used for every description type. Routed picks the model configured per type in classes/data/model_routing.json."
+            )
+
+        elif model_source == "Auto":
+            ollama_models = st.session_state.get("ollama_models", ["llama2", "mistral", "phi3"])
+            route_models = {
+                "ollama": st.selectbox("Ollama Model:", ollama_models),
+                "openai": st.selectbox("OpenAI Fallback Model:", ["gpt-4.1-nano", "gpt-4o-mini"])
+            }
+            model_name = route_models["ollama"]
+            ollama_model_manager.schedule_warmup(route_models["ollama"], ollama_url)
+
+            # Rolling latency per backend, used to decide where requests go
+            router_stats = llm_router.stats()
+            if router_stats:
+                st.dataframe(pd.DataFrame(router_stats), hide_index=True, use_container_width=True)
             
         else:
-            st.warning("Ollama integration is currently not configured for this demo. Please use OpenAI.")
             ollama_url = st.text_input("Ollama Server URL", value=os.getenv("OLLAMA_URL", "http://localhost:11434"), disabled=ollama_inactive)
             
             # Fetch Ollama models button
             if st.button("Fetch Ollama Models", disabled=ollama_inactive):
-                ollama_models = ollama_client.get_ollama_models(ollama_url)
+                ollama_models = ollama_client.get_ollama_models(ollama_url, refresh=True)
                 st.session_state["ollama_models"] = ollama_models
             
             # Use cached models or defaults
             ollama_models = st.session_state.get("ollama_models", ["llama2", "mistral", "phi3"])
-            model_name = st.selectbox("Select Ollama Model:", ollama_models, disabled=ollama_inactive)
+            model_name = st.selectbox(
+                "Select Ollama Model:", [None] + ollama_models, disabled=ollama_inactive,
+                format_func=lambda model: model or "Routed per description type",
+                help="A selected model is used for every description type. Routed picks the model configured per type in classes/data/model_routing.json."
+            )
+            
+            # Load the selected model in the background and keep it resident
+            if model_name and not ollama_inactive:
+                ollama_model_manager.schedule_warmup(model_name, ollama_url)
+                model_state = ollama_model_manager.load_state(model_name)
+                load_time = f" in {model_state['load_seconds']:.1f}s" if model_state.get("load_seconds") else ""
+                st.caption(f"Model state: {model_state['state']}{load_time}")
+
+# Warn when the selected backend is failing fast because it is down
+backend_status = circuit_breakers.get("ollama" if model_source == "Ollama" else "openai").status()
+if model_source == "Auto":
+    # The router fails over on its own, only warn when every backend is down
+    if all(circuit_breakers.get(backend).status()["state"] == "open" for backend in ("ollama", "openai")):
+        st.error("Both Ollama and OpenAI are currently unavailable. Requests will fail until one of them recovers.")
+elif backend_status["state"] == "open":
+    st.error(f"{model_source} is currently unavailable. Requests will fail immediately for the next {backend_status['retry_in']:.0f} seconds while recovery is checked in the background.")
+elif backend_status["state"] == "half_open":
+    st.warning(f"{model_source} is recovering from an outage. The next request will test whether it is back.")
 
 colBody1, colBody2 = st.columns([1,3])
 with colBody1:
@@ -231,58 +437,94 @@ with colBody1:
         product_info = {}
 
         if input_mode == "Select from Database":
-            # Connect to database and fetch part numbers
-            conn = db.get_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT part_number, product_category, brand FROM parts LIMIT 100")
-                parts = cursor.fetchall()
-                
-                if parts:
-                    # Create a selection dataframe
-                    parts_df = pd.DataFrame(parts)
-                    selected_part = st.selectbox(
-                        "Select Part Number:", 
-                        parts_df["part_number"].tolist(),
-                        format_func=lambda x: f"{x} - {parts_df[parts_df['part_number']==x]['product_category'].iloc[0]}"
+            # Search the whole catalog through the full-text index instead of listing the first parts
+            part_query = st.text_input(
+                "Search parts:",
+                placeholder="Part number, category, brand, engine or fitment, e.g. IC-55 or fuel pump",
+                help="Every word matches the start of a word in the part; press Enter to update the results."
+            )
+            parts = []
+            parts_caption = None
+            try:
+                if part_query.strip():
+                    search_start = time.perf_counter()
+                    parts = db.search_parts(part_query, limit=50)
+                    parts_caption = f"{len(parts)} matches in {(time.perf_counter() - search_start) * 1000:.0f} ms"
+                else:
+                    # Without a search, browse the catalog one page at a time with the filters applied in SQL
+                    part_filters = db.get_part_filters()
+                    filter_col1, filter_col2 = st.columns(2)
+                    browse_category = filter_col1.selectbox("Category:", ["All"] + part_filters["categories"])
+                    browse_brand = filter_col2.selectbox("Brand:", ["All"] + part_filters["brands"])
+
+                    # Start of every page visited so far; changing a filter goes back to the first page
+                    browse_filters = (browse_category, browse_brand)
+                    if st.session_state.get("browse_filters") != browse_filters:
+                        st.session_state.browse_filters = browse_filters
+                        st.session_state.browse_cursors = [None]
+                    browse_cursors = st.session_state.browse_cursors
+
+                    # One extra row tells whether there is a next page
+                    parts = db.browse_parts(
+                        after=browse_cursors[-1],
+                        limit=BROWSE_PAGE_SIZE + 1,
+                        category=None if browse_category == "All" else browse_category,
+                        brand=None if browse_brand == "All" else browse_brand
                     )
+                    has_next_page = len(parts) > BROWSE_PAGE_SIZE
+                    parts = parts[:BROWSE_PAGE_SIZE]
+
+                    previous_col, page_col, next_col = st.columns([1, 2, 1])
+                    if previous_col.button("Previous page", disabled=len(browse_cursors) == 1):
+                        browse_cursors.pop()
+                        st.rerun()
+                    if next_col.button("Next page", disabled=not has_next_page):
+                        browse_cursors.append(parts[-1]["part_number"])
+                        st.rerun()
+                    page_col.caption(f"Page {len(browse_cursors)}, parts {parts[0]['part_number'] if parts else '-'} to {parts[-1]['part_number'] if parts else '-'}")
+            except Exception as e:
+                st.warning(f"Could not read parts from the database ({e}). Please enter part information manually.")
+                parts = []
+
+            if parts:
+                # Labels come from a lookup by part number instead of filtering a dataframe per option
+                parts_by_number = {part["part_number"]: part for part in parts}
+                selected_part = st.selectbox(
+                    "Select Part Number:", 
+                    list(parts_by_number),
+                    format_func=lambda x: f"{x} - {parts_by_number[x]['product_category']} ({parts_by_number[x]['brand']})"
+                )
+                if parts_caption:
+                    st.caption(parts_caption)
+                
+                # The search or page already returned the full part row
+                part_details = parts_by_number[selected_part]
+                
+                if part_details:
+                    product_info = part_details
                     
-                    # Fetch detailed part information
-                    cursor.execute(
-                        "SELECT * FROM parts WHERE part_number = ?", 
-                        (selected_part,)
-                    )
-                    part_details = cursor.fetchone()
+                    # Display part details
+                    st.subheader("Part Details")
                     
-                    if part_details:
-                        product_info = part_details
-                        
-                        # Display part details
-                        st.subheader("Part Details")
-                        
-                        # Create data for table
-                        data = {
-                            "Field": ["Part Number", "Product Category", "Brand", "Part Type"],
-                            "Value": [
-                                part_details['part_number'],
-                                part_details['product_category'], 
-                                part_details['brand'],
-                                part_details.get('part_type', 'N/A')
-                            ]
-                        }
-                        
-                        # Convert to DataFrame and display as table
-                        df = pd.DataFrame(data)
-                        # Create a more key-value style table by not transposing
-                        st.table(df.set_index('Field').style.set_properties(**{'width': '75%'}))
-                else:
-                    st.warning("No parts found in database. Please enter part information manually.")
-                    input_mode = "Enter Manually"
-                
-                cursor.close()
-                conn.close()
+                    # Create data for table
+                    data = {
+                        "Field": ["Part Number", "Product Category", "Brand", "Part Type"],
+                        "Value": [
+                            part_details['part_number'],
+                            part_details['product_category'], 
+                            part_details['brand'],
+                            part_details.get('part_type', 'N/A')
+                        ]
+                    }
+                    
+                    # Convert to DataFrame and display as table
+                    df = pd.DataFrame(data)
+                    # Create a more key-value style table by not transposing
+                    st.table(df.set_index('Field').style.set_properties(**{'width': '75%'}))
+            elif part_query:
+                st.warning("No parts match this search. Try fewer or shorter words, or enter the part information manually.")
             else:
-                st.warning("Could not connect to database. Please enter part information manually.")
+                st.warning("No parts found in database. Please enter part information manually.")
                 input_mode = "Enter Manually"
 
         if input_mode == "Enter Manually":
@@ -324,11 +566,24 @@ with colBody2:
     with st.container(border=True):
         # Description type selection
         desc_codes = pies_prompt_builder.get_pies_description_codes()
-        description_type = st.selectbox(
-            "Select Description Type", 
-            list(desc_codes.keys()),
-            format_func=lambda x: f"{x} - {desc_codes[x]}"
+        generation_mode = st.radio(
+            "Generation Mode",
+            ["Single Description", "Multiple Descriptions"],
+            horizontal=True,
+            help="Multiple Descriptions requests every selected type in one call and only re-requests the ones that fail validation."
         )
+        if generation_mode == "Single Description":
+            description_type = st.selectbox(
+                "Select Description Type", 
+                list(desc_codes.keys()),
+                format_func=lambda x: f"{x} - {desc_codes[x]}"
+            )
+        else:
+            description_types = st.multiselect(
+                "Select Description Types",
+                list(desc_codes.keys()),
+                default=list(desc_codes.keys())
+            )
 
         # Advanced options (collapsible)
         with st.expander("Advanced Options"):
@@ -337,6 +592,11 @@ with colBody2:
                 ["ENGL", "SPAN", "FREN", "GERM"],
                 index=0
             )
+            translate_languages = st.multiselect(
+                "Also Translate Into",
+                [code for code in ["ENGL", "SPAN", "FREN", "GERM"] if code != language_code],
+                help="The description is generated once in the language above and then translated into these languages in parallel. Earlier translations of the same text are reused."
+            )
             maintenance_type = st.selectbox(
                 "Maintenance Type", 
                 ["ADD", "DEL", "NOC"],
@@ -348,6 +608,36 @@ with colBody2:
                 }.get(x, x)
             )
             sequence = st.number_input("Sequence", min_value=1, max_value=999, value=1)
+            bypass_cache = st.checkbox(
+                "Bypass response cache",
+                value=False,
+                help="Always send the request to the model, even if an identical request was answered before."
+            )
+            reuse_saved = st.checkbox(
+                "Reuse saved descriptions",
+                value=True,
+                help="Use the description already saved for this part, type, language and sequence instead of generating a new one. Generated descriptions of parts in the database are always saved."
+            )
+            use_model_routing = st.checkbox(
+                "Use per-code model routing",
+                value=True,
+                help="Use the model, token budget, temperature and timeout configured for each description type in classes/data/model_routing.json."
+            )
+            if use_model_routing:
+                routed = model_routing.get(description_type if generation_mode == "Single Description" else None)
+                routed_model = routed["ollama_model" if model_source == "Ollama" else "openai_model"] or "client default"
+                st.caption(f"Routed settings: model {model_name or routed_model}, max_tokens {routed['max_tokens']}, temperature {routed['temperature']}, timeout {routed['timeout']}s")
+            use_candidates = st.checkbox(
+                "Generate parallel candidates for short codes",
+                value=True,
+                help=f"For {', '.join(pies_candidate_generator.CODES)}, request {pies_candidate_generator.CANDIDATES} candidates at once and keep the first one that passes validation."
+            )
+            cache_stats = llm_response_cache.stats()
+            flight_stats = single_flight.stats()
+            st.caption(f"Response cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} stored responses. {flight_stats['coalesced']} requests shared an identical in-flight request.")
+            telemetry_stats = llm_telemetry.stats()
+            if telemetry_stats["prompt_tokens"]:
+                st.caption(f"Provider prompt cache: {telemetry_stats['cached_tokens']:,} of {telemetry_stats['prompt_tokens']:,} prompt tokens ({telemetry_stats['cached_tokens'] / telemetry_stats['prompt_tokens']:.0%}) were served from the cached prompt prefix.")
 
 
 st.divider()
@@ -358,7 +648,89 @@ st.write("""Please click the button below to generate the description. The descr
 
 generate_button = st.button("Generate Description")
 
-if generate_button and product_info.get("product_category"):
+if generate_button and product_info.get("product_category") and generation_mode == "Multiple Descriptions":
+    if not description_types:
+        st.warning("Please select at least one description type.")
+    else:
+        with st.expander("View Prompt"):
+            st.code(pies_prompt_builder.build_pies_multi_prompt(product_info, description_types, language_code))
+
+        # Description types saved earlier for this part are reused, only the others are generated
+        reused_descriptions = {}
+        multi_part_id = part_id_for(product_info) if reuse_saved else None
+        if multi_part_id is not None:
+            for code in description_types:
+                saved_text = saved_description_for(multi_part_id, code, language_code, sequence)
+                if saved_text:
+                    reused_descriptions[code] = saved_text
+        generate_types = [code for code in description_types if code not in reused_descriptions]
+
+        if generate_types:
+            with st.spinner(f"Generating {len(generate_types)} descriptions..."):
+                multi_result = pies_multi_generator.generate(
+                    product_info,
+                    generate_types,
+                    language_code,
+                    model_source=model_source,
+                    model_name=route_models if model_source == "Auto" else model_name,
+                    use_cache=not bypass_cache
+                )
+        else:
+            multi_result = {"descriptions": {}, "calls": 0, "elapsed": 0.0, "error": None}
+        for code, saved_text in reused_descriptions.items():
+            validation = pies_prompt_builder.validate_pies_description(code, saved_text)
+            multi_result["descriptions"][code] = {
+                "description": saved_text,
+                "is_valid": validation["is_valid"],
+                "issues": validation["issues"],
+                "fit_method": "saved",
+                "attempts": 0
+            }
+        multi_result["descriptions"] = {code: multi_result["descriptions"][code] for code in description_types}
+
+        if multi_result["error"]:
+            st.error(multi_result["error"])
+
+        if "descriptions" not in st.session_state:
+            st.session_state.descriptions = []
+
+        multi_rows = []
+        for code, generated in multi_result["descriptions"].items():
+            multi_rows.append({
+                "DescriptionCode": code,
+                "Description": generated["description"],
+                "Length": len(generated["description"] or ""),
+                "Valid": generated["is_valid"],
+                "Issues": "; ".join(generated["issues"]),
+                "Fit": generated["fit_method"],
+                "Attempts": generated["attempts"]
+            })
+            # Errors are reported, never stored as a description
+            if generated["description"]:
+                st.session_state.descriptions.append({
+                    "LanguageCode": language_code,
+                    "MaintenanceType": maintenance_type,
+                    "DescriptionCode": code,
+                    "Sequence": sequence,
+                    "Description": generated["description"]
+                })
+                if code not in reused_descriptions:
+                    persist_description(code, generated["description"], language_code, maintenance_type, sequence)
+
+        st.subheader("Generated Descriptions")
+        st.caption(f"{len(generate_types)} descriptions in {multi_result['calls']} model calls ({multi_result['elapsed']:.1f}s), {len(reused_descriptions)} reused from the database")
+        st.dataframe(pd.DataFrame(multi_rows), hide_index=True, use_container_width=True)
+        invalid_count = sum(1 for row in multi_rows if not row["Valid"])
+        if invalid_count:
+            st.warning(f"{invalid_count} descriptions still have validation issues. Generate them individually in Single Description mode to fix them.")
+        else:
+            st.success("All descriptions are valid according to PIES standards")
+
+        add_translations(
+            {code: generated["description"] for code, generated in multi_result["descriptions"].items() if generated["description"]},
+            language_code, translate_languages, maintenance_type, sequence, use_cache=not bypass_cache
+        )
+elif generate_button and product_info.get("product_category"):
     # Build prompt from product info
     prompt = pies_prompt_builder.build_pies_prompt(product_info, description_type, language_code)
     
@@ -366,20 +738,49 @@ if generate_button and product_info.get("product_category"):
     with st.expander("View Prompt"):
         st.code(prompt)
     
-    # Generate description with selected model
+    # Stream the description as it is generated. Headroom over the PIES limit lets a slightly long answer
+    # finish its sentence for the fitter; only a far too long one is stopped and rewritten by the model
+    max_length = pies_prompt_builder.get_pies_description_max_lengths().get(description_type, 255)
+    stream_max_chars = max_length * 2
+    stream_truncated = False
+    stream_placeholder = st.empty()
+    single_part_id = part_id_for(product_info) if reuse_saved else None
+    saved_description = saved_description_for(single_part_id, description_type, language_code, sequence)
     with st.spinner("Generating description..."):
-        if model_source == "OpenAI":
-            description = generate_description(
-                prompt, model_source, model_name, api_key
+        if saved_description:
+            description = saved_description
+            st.info("Reused the description saved for this part. Uncheck Reuse saved descriptions under Advanced Options to generate a new one.")
+        elif use_candidates and pies_candidate_generator.is_speculative(description_type):
+            # Tight limits: race several candidates instead of shortening one answer serially
+            candidate_result = pies_candidate_generator.generate(
+                prompt,
+                description_type,
+                language_code,
+                model_source=model_source,
+                model_name=route_models if model_source == "Auto" else model_name,
+                use_cache=not bypass_cache,
+                use_routing=use_model_routing
             )
+            description = candidate_result["description"] or candidate_result["error"]
+            st.caption(f"Picked from {candidate_result['candidates']} candidates in {candidate_result['elapsed']:.1f}s")
         else:
-            description = generate_description(
-                prompt, model_source, model_name, ollama_url=ollama_url
-            )
+            with stream_placeholder.container():
+                description = st.write_stream(stream_description(
+                    prompt, model_source, model_name, ollama_url=ollama_url, max_chars=stream_max_chars, use_cache=not bypass_cache,
+                    description_code=description_type if use_model_routing else None
+                ))
+            stream_placeholder.empty()
+            stream_truncated = bool(description) and len(description) > stream_max_chars
+
+        # Errors are reported, never stored as a description
+        if description and description.startswith("Error"):
+            st.error(description)
+            description = None
 
         # Remove invalid characters
-        for char in pies_prompt_builder.invalid_characters:
-            description = description.replace(char, "")
+        if description:
+            for char in pies_prompt_builder.invalid_characters:
+                description = description.replace(char, "")
         
         if description:
             # Check and shorten description if it exceeds max length
@@ -390,7 +791,9 @@ if generate_button and product_info.get("product_category"):
                 model_name, 
                 api_key=api_key, 
                 ollama_url=ollama_url,
-                max_retries=5
+                max_retries=5,
+                language_code=language_code,
+                truncated=stream_truncated
             )
             
             # Store in session state
@@ -405,6 +808,8 @@ if generate_button and product_info.get("product_category"):
                 "Sequence": sequence,
                 "Description": description
             })
+            if description != saved_description:
+                persist_description(description_type, description, language_code, maintenance_type, sequence)
             
             # Validation
             validation = pies_prompt_builder.validate_pies_description(description_type, description)
@@ -420,6 +825,7 @@ if generate_button and product_info.get("product_category"):
             # Update the description in session state if edited
             if edited_description != description:
                 st.session_state.descriptions[-1]["Description"] = edited_description
+                persist_description(description_type, edited_description, language_code, maintenance_type, sequence)
                 
                 # Re-validate after edit
                 validation = pies_prompt_builder.validate_pies_description(description_type, edited_description)
@@ -431,10 +837,120 @@ if generate_button and product_info.get("product_category"):
                     st.warning(f"• {issue}")
             else:
                 st.success("Description is valid according to PIES standards")
+
+            add_translations(
+                {description_type: st.session_state.descriptions[-1]["Description"]},
+                language_code, translate_languages, maintenance_type, sequence, use_cache=not bypass_cache
+            )
 else:
     if generate_button:
         st.warning("Please provide product category information before generating a description.")
 
+# Bulk import of supplier part files into the parts table
+with st.expander("Import Parts"):
+    st.write("Upload a supplier file to add or update parts. CSV, Excel (.xlsx) and PIES 7.x XML are read in batches, so large catalogs import without loading the whole file. Columns are matched by name (part number, category, brand, part type, engine application, material, fitment); existing parts are updated by part number.")
+    import_file = st.file_uploader("Supplier file", type=["csv", "tsv", "txt", "xlsx", "xml"])
+    if import_file is not None and st.button("Import Parts"):
+        import_status = st.empty()
+        try:
+            import_stats = parts_importer.import_file(
+                import_file,
+                on_progress=lambda stats: import_status.info(f"Imported {stats['rows']:,} parts ({stats['rows_per_second']:,.0f} rows/s)...")
+            )
+            import_status.success(f"Imported {import_stats['rows']:,} parts in {import_stats['elapsed']:.1f}s ({import_stats['rows_per_second']:,.0f} rows/s). {import_stats['skipped']:,} rows were skipped (no part number or marked for deletion).")
+        except Exception as e:
+            import_status.error(f"Import failed: {e}")
+
+# Batch generation across many parts, codes and languages
+with st.expander("Batch Generation"):
+    st.write("Generate descriptions for many parts at once. Every combination of the selected parts, description types and languages is sent to the model concurrently, and each finished description is saved to the database.")
+    # Parts are picked through search and filters, the catalog is never loaded as a whole
+    batch_filters = db.get_part_filters()
+    batch_filter_col1, batch_filter_col2 = st.columns(2)
+    batch_category = batch_filter_col1.selectbox("Batch category:", ["All"] + batch_filters["categories"])
+    batch_brand = batch_filter_col2.selectbox("Batch brand:", ["All"] + batch_filters["brands"])
+    batch_category = None if batch_category == "All" else batch_category
+    batch_brand = None if batch_brand == "All" else batch_brand
+    batch_all_parts = st.checkbox("All parts matching the category and brand", value=False)
+
+    # Picked parts are kept across searches; the options are the picked parts plus one page of matches
+    if "batch_selected_parts" not in st.session_state:
+        st.session_state.batch_selected_parts = {}
+    batch_selected = st.session_state.batch_selected_parts
+    batch_query = st.text_input("Find parts to add:", placeholder="Part number, category or brand", disabled=batch_all_parts)
+    if batch_query.strip():
+        batch_candidates = [
+            part for part in db.search_parts(batch_query, limit=BROWSE_PAGE_SIZE)
+            if (not batch_category or part["product_category"] == batch_category) and (not batch_brand or part["brand"] == batch_brand)
+        ]
+    else:
+        batch_candidates = db.browse_parts(limit=BROWSE_PAGE_SIZE, category=batch_category, brand=batch_brand)
+    batch_options = dict(batch_selected)
+    batch_options.update((part["part_number"], part) for part in batch_candidates)
+    batch_part_numbers = st.multiselect(
+        "Parts",
+        list(batch_options),
+        default=list(batch_selected),
+        disabled=batch_all_parts
+    )
+    st.session_state.batch_selected_parts = {number: batch_options[number] for number in batch_part_numbers}
+
+    batch_codes = st.multiselect("Description Types", list(desc_codes.keys()), default=["SHORT_DESC"])
+    batch_languages = st.multiselect("Language Codes", ["ENGL", "SPAN", "FREN", "GERM"], default=["ENGL"])
+    batch_translate = st.checkbox(
+        "Translate instead of generating each language",
+        value=True,
+        disabled=len(batch_languages) < 2,
+        help="Generate each description once (in English if selected) and translate it into the other languages in parallel, reusing earlier translations."
+    )
+    batch_concurrency = st.slider("Concurrent requests", 1, 32, pies_batch_generator.DEFAULT_CONCURRENCY)
+
+    batch_part_count = db.count_parts(batch_category, batch_brand) if batch_all_parts else len(batch_part_numbers)
+    batch_total = batch_part_count * len(batch_codes) * len(batch_languages)
+    st.caption(f"{batch_total} descriptions will be generated.")
+
+    if st.button("Run Batch", disabled=batch_total == 0):
+        batch_progress = st.progress(0.0, text="Starting batch...")
+        batch_table = st.empty()
+        batch_rows = []
+
+        def show_batch_result(result):
+            batch_rows.append({
+                "PartNumber": result["part_number"],
+                "DescriptionCode": result["description_code"],
+                "LanguageCode": result["language_code"],
+                "Description": result["description"] or result["error"],
+                "Valid": result["is_valid"],
+                "Fit": result["fit_method"],
+                "TranslatedFrom": result["translated_from"],
+                "Reused": result["reused"],
+                "Saved": result["saved"],
+                "Seconds": round(result["elapsed"], 2)
+            })
+            batch_progress.progress(len(batch_rows) / batch_total, text=f"{len(batch_rows)}/{batch_total} descriptions generated")
+            batch_table.dataframe(pd.DataFrame(batch_rows))
+
+        # Matching parts are read page by page while the batch runs
+        selected_batch_parts = db.iter_parts(batch_category, batch_brand) if batch_all_parts else [batch_options[number] for number in batch_part_numbers]
+        pies_batch_generator.run(
+            selected_batch_parts,
+            batch_codes,
+            batch_languages,
+            on_result=show_batch_result,
+            model_source=model_source,
+            model_name=route_models if model_source == "Auto" else model_name,
+            concurrency=batch_concurrency,
+            use_cache=not bypass_cache,
+            translate=batch_translate and len(batch_languages) > 1,
+            reuse_saved=reuse_saved
+        )
+        batch_failures = sum(1 for row in batch_rows if not row["Saved"])
+        if batch_failures:
+            st.warning(f"Batch finished with {batch_failures} descriptions that could not be generated or failed validation. Invalid descriptions are not saved.")
+        else:
+            batch_reused = sum(1 for row in batch_rows if row["Reused"])
+            st.success(f"Batch finished. {len(batch_rows) - batch_reused} descriptions generated and saved to the database, {batch_reused} reused.")
+
 # Show all generated descriptions
 if "descriptions" in st.session_state and st.session_state.descriptions:
     st.header("Generated Descriptions")
@@ -1,6 +1,8 @@
 import streamlit as st
 import os
 from classes.ai_engines.openai_client import openai_client
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
 
 #API Key Control and model selection
 secret_value = os.getenv("OwadmasdujU")
@@ -8,6 +10,7 @@ model_name = os.getenv("OPENAI_MODEL")
 
 #---------------- Header with API control --------------
 pagename = "Professional Email Improver"
+llm_telemetry.set_page(pagename)
 pageicon = "✉️"
 st.set_page_config(page_title=pagename, layout="wide",page_icon=pageicon)
 st.subheader(f"{pageicon} {pagename}")
@@ -73,14 +76,12 @@ Improve the following email by making it more professional, personalized, and ef
 
 # Function to improve email with OpenAI
 def improve_email(email_text, model_name, api_key):
-    """Generate improved email using OpenAI"""
+    """Stream the improved email from OpenAI as it is generated"""
     try:
         full_prompt = f"{EXECUTIVE_EDITOR_PROMPT}\n\n{email_text}"
-        improved_email = openai_client.generate_with_openai(full_prompt, model_name)
-        return improved_email
+        yield from openai_client.stream_with_openai(full_prompt, model_name, **model_routing.client_params(task="email_improve"))
     except Exception as e:
         st.error(f"Error improving email: {e}")
-        return None
 
 # Main content
 st.subheader("Email Selection")
@@ -128,7 +129,11 @@ if st.button("Improve Email", key="improve_email_button"):
         st.warning("Please enter your OpenAI API key in the sidebar")
     else:
         with st.spinner("Enhancing your email..."):
-            improved_email = improve_email(email_text, model_name, api_key)
+            # Show the improved email live while it is being written
+            live_placeholder = st.empty()
+            with live_placeholder.container():
+                improved_email = st.write_stream(improve_email(email_text, model_name, api_key))
+            live_placeholder.empty()
             
             if improved_email:
                 # Display results side by side
@@ -1,11 +1,13 @@
 import streamlit as st
 import json
-import requests
 import os
 import io
 import base64
 from PIL import Image
 import random
+from classes.ai_engines.llm_transport import llm_transport
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
 
 # API Key Control and model selection
 secret_value = os.getenv("OwadmasdujU")
@@ -13,6 +15,7 @@ model_name = os.getenv("OPENAI_MODEL")
 
 #---------------- Header with API control --------------
 pagename = "Automotive Ad Generator"
+llm_telemetry.set_page(pagename)
 pageicon = "📃"
 st.set_page_config(page_title=pagename, layout="wide",page_icon=pageicon)
 st.subheader(f"{pageicon} {pagename}")
@@ -304,7 +307,7 @@ Do not include any text in the image."""
     temperature = st.slider("Temperature (Creativity)", 0.0, 1.0, 0.7, 0.1)
 
 # Function to generate ad text
-def generate_ad_text(part_type, brand, ad_style, platform, target_audience, max_length):
+def generate_ad_text(part_type, brand, ad_style, platform, target_audience, max_length, live_placeholder=None):
     # Prepare system prompt
     system_prompt = st.session_state.text_system_prompt_template
     
@@ -319,11 +322,6 @@ def generate_ad_text(part_type, brand, ad_style, platform, target_audience, max_
         max_length=max_length
     )
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
     payload = {
         "model": os.getenv('OPENAI_MODEL', model_name),
         "messages": [
@@ -332,15 +330,19 @@ def generate_ad_text(part_type, brand, ad_style, platform, target_audience, max_
         ],
         "temperature": st.session_state.get('temperature', 0.7)
     }
+    # Token budget, temperature and timeout for this task from the model routing table
+    payload, timeout = model_routing.apply_to_payload(payload, task="ad_generator")
     
     try:
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
-        ad_text = response.json()['choices'][0]['message']['content']
+        # Ads are sampled at the chosen creativity, so they aren't cached and every click writes a new one
+        if live_placeholder is not None:
+            # Stream the ad copy into the page as it is written
+            with live_placeholder.container():
+                ad_text = st.write_stream(llm_transport.stream_chat_completion(payload, api_key, timeout=timeout, use_cache=False))
+            live_placeholder.empty()
+        else:
+            result = llm_transport.chat_completion(payload, api_key, timeout=timeout, use_cache=False)
+            ad_text = result['choices'][0]['message']['content']
         
         # Split text and hashtags
         parts = ad_text.split('\n\n')
@@ -510,11 +512,11 @@ if st.button("Generate Ad", type="primary", use_container_width=True):
     elif not api_key:
         st.warning("Please provide an OpenAI API key to generate the ad.")
     else:
-        # Store temperature in session state
-        st.session_state.temperature = st.session_state.get('temperature', 0.7)
+        # Store the creativity slider value in session state for the request
+        st.session_state.temperature = temperature
         
         with st.spinner("Generating ad content..."):
-            ad_text, hashtags = generate_ad_text(part_type, brand, ad_style, platform, target_audience, max_length)
+            ad_text, hashtags = generate_ad_text(part_type, brand, ad_style, platform, target_audience, max_length, live_placeholder=st.empty())
             
             if ad_text:
                 st.success("Ad text generated!")
@@ -2,12 +2,16 @@ import streamlit as st
 import json
 import requests
 import os
+from classes.ai_engines.llm_transport import llm_transport
+from classes.ai_engines.model_routing import model_routing
+from classes.ai_engines.llm_telemetry import llm_telemetry
 
 # Variables
 model_name = os.getenv("OPENAI_MODEL")
 
 #---------------- Header with API control --------------
 pagename = "Web Description"
+llm_telemetry.set_page(pagename)
 pageicon = "🌐"
 st.set_page_config(page_title=pagename, layout="wide",page_icon=pageicon)
 st.subheader(f"{pageicon} {pagename}")
@@ -58,11 +62,6 @@ def call_openai_api(prompt, system_prompt, api_key, step_name, status_placeholde
     status_placeholder.warning(f"🔄 Processing: {step_name}...")
     
     # Create the API request
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
     payload = {
         "model": model_name,
         "messages": [
@@ -77,18 +76,15 @@ def call_openai_api(prompt, system_prompt, api_key, step_name, status_placeholde
         ],
         "response_format": {"type": "json_object"}
     }
+    # Token budget, temperature and timeout for this task from the model routing table
+    payload, timeout = model_routing.apply_to_payload(payload, task="web_description")
     
     try:
-        # Direct API call
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
+        # API call through the shared pooled transport; sampled copy isn't cached, so generating again gives a new version
+        response = llm_transport.chat_completion(payload, api_key, timeout=timeout, use_cache=False)
         
         # Extract content from response
-        content = response.json()["choices"][0]["message"]["content"]
+        content = response["choices"][0]["message"]["content"]
         result = json.loads(content)
         
         # Update status
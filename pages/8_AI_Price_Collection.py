@@ -1,12 +1,15 @@
 import streamlit as st
-from openai import OpenAI
 import os
+import time
+from classes.ai_engines.llm_transport import llm_transport
+from classes.ai_engines.llm_telemetry import llm_telemetry
 
 # Get API key from environment variable
 model_name = os.getenv("OPENAI_MODEL", "gpt-4o")
 
 #---------------- Header with API control --------------
 pagename = "AI Price Collection"
+llm_telemetry.set_page(pagename)
 pageicon = "💵"
 st.set_page_config(page_title=pagename, layout="wide",page_icon=pageicon)
 st.subheader(f"{pageicon} {pagename}")
@@ -65,8 +68,9 @@ def search_openai_for_price(part_number, retailer_site, part_type):
         search_query = f"Can you search google.com to find the price of the {part_number} {part_type} for the site of {retailer_site}."
         st.write(f"Search Query: {search_query}")
     
-    # Initialize OpenAI client
-    client = OpenAI(api_key=api_key)
+    # Reuse the pooled OpenAI client for this key
+    client = llm_transport.get_openai_client(api_key)
+    request_start = time.perf_counter()
     
     try:
         with log_container:
@@ -109,6 +113,16 @@ def search_openai_for_price(part_number, retailer_site, part_type):
             temperature=0,
             max_output_tokens=2048
         )
+        # The SDK call bypasses the transport, so its telemetry is recorded here
+        usage = getattr(response, "usage", None)
+        input_details = getattr(usage, "input_tokens_details", None)
+        llm_telemetry.record(
+            "openai", model_name, "/v1/responses", time.perf_counter() - request_start,
+            prompt_tokens=getattr(usage, "input_tokens", None),
+            completion_tokens=getattr(usage, "output_tokens", None),
+            cached_tokens=getattr(input_details, "cached_tokens", None),
+            status=200
+        )
         
         # Log the response
         with log_container:
@@ -140,6 +154,7 @@ def search_openai_for_price(part_number, retailer_site, part_type):
         return response.output_text if hasattr(response, 'output_text') else "Could not retrieve price information"
     
     except Exception as e:
+        llm_telemetry.record("openai", model_name, "/v1/responses", time.perf_counter() - request_start, error=e)
         with log_container:
             st.error(f"### Error in API Call: {str(e)}")
             st.error(f"Full error details: {repr(e)}")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app runs from the repository root (streamlit run Home.py), so its modules import as classes.*
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+import pytest
+
+from classes.ai_engines.circuit_breaker import Circuit_Breaker, Circuit_Open_Error
+
+def open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure("connection refused")
+
+def test_opens_after_threshold_failures():
+    breaker = Circuit_Breaker("test", failure_threshold=3, recovery_timeout=60)
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    assert breaker.state == Circuit_Breaker.CLOSED
+    assert breaker.allow_request()
+
+    breaker.record_failure("timeout")
+    assert breaker.state == Circuit_Breaker.OPEN
+    assert not breaker.allow_request()
+    with pytest.raises(Circuit_Open_Error):
+        breaker.check()
+
+def test_success_resets_failure_count():
+    breaker = Circuit_Breaker("test", failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure("timeout")
+    breaker.record_success()
+    breaker.record_failure("timeout")
+    assert breaker.state == Circuit_Breaker.CLOSED
+
+def test_half_open_lets_one_trial_through():
+    breaker = Circuit_Breaker("test", failure_threshold=1, recovery_timeout=0)
+    open_breaker(breaker)
+
+    assert breaker.allow_request()
+    assert breaker.state == Circuit_Breaker.HALF_OPEN
+    # A second request while the trial is in flight fails fast
+    assert not breaker.allow_request()
+
+def test_successful_trial_closes_circuit():
+    breaker = Circuit_Breaker("test", failure_threshold=1, recovery_timeout=0)
+    open_breaker(breaker)
+    assert breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == Circuit_Breaker.CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow_request()
+
+def test_failed_trial_reopens_circuit():
+    breaker = Circuit_Breaker("test", failure_threshold=5, recovery_timeout=60)
+    open_breaker(breaker)
+    breaker.opened_at -= 60
+    assert breaker.allow_request()
+
+    breaker.record_failure("still down")
+    assert breaker.state == Circuit_Breaker.OPEN
+    assert not breaker.allow_request()
+    assert breaker.retry_in() > 0
+
+def test_end_trial_settles_unanswered_trial():
+    breaker = Circuit_Breaker("test", failure_threshold=1, recovery_timeout=60)
+    open_breaker(breaker)
+    breaker.opened_at -= 60
+    assert breaker.allow_request()
+
+    # The trial ended without a response, e.g. the caller was interrupted
+    breaker.end_trial("interrupted")
+    assert breaker.state == Circuit_Breaker.OPEN
+    assert breaker.last_error == "interrupted"
+
+    # Once the timeout passes again, a new trial is allowed instead of the circuit staying stuck
+    breaker.opened_at -= 60
+    assert breaker.allow_request()
+
+def test_end_trial_after_settled_trial_is_noop():
+    breaker = Circuit_Breaker("test", failure_threshold=1, recovery_timeout=0)
+    open_breaker(breaker)
+    assert breaker.allow_request()
+    breaker.record_success()
+
+    breaker.end_trial("late cleanup")
+    assert breaker.state == Circuit_Breaker.CLOSED
+    assert breaker.failures == 0
+
+def test_end_trial_while_closed_is_noop():
+    breaker = Circuit_Breaker("test", failure_threshold=1, recovery_timeout=60)
+    breaker.end_trial("error")
+    assert breaker.state == Circuit_Breaker.CLOSED
+    assert breaker.failures == 0
@@ -0,0 +1,130 @@
+import sqlite3
+import threading
+
+import pytest
+
+from classes.db import description_writer as description_writer_module
+from classes.db.database import Database
+from classes.db.description_writer import Description_Writer
+
+SCHEMA = """
+CREATE TABLE parts (
+    id INTEGER PRIMARY KEY,
+    part_number VARCHAR(50) NOT NULL
+);
+CREATE TABLE descriptions (
+    id INTEGER PRIMARY KEY,
+    part_id INT NOT NULL,
+    language_code VARCHAR(5) NOT NULL DEFAULT 'EN',
+    maintenance_type CHAR(1) NOT NULL DEFAULT 'A',
+    description_code VARCHAR(3) NOT NULL,
+    sequence INT NOT NULL,
+    description_text TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (part_id) REFERENCES parts(id) ON DELETE CASCADE,
+    UNIQUE (part_id, description_code, sequence, language_code)
+);
+INSERT INTO parts (id, part_number) VALUES (1, 'IC-5501'), (2, 'OS-3302');
+"""
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "pies.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.close()
+    database = Database(path)
+    # The writer uses the module-level database; point it at the temporary one
+    monkeypatch.setattr(description_writer_module, "db", database)
+    yield database
+    database.close_all()
+
+@pytest.fixture
+def writer(db, monkeypatch):
+    monkeypatch.setenv("DESCRIPTION_WRITE_FLUSH_INTERVAL", "0.01")
+    return Description_Writer()
+
+def test_flush_without_writes_returns_immediately(writer):
+    assert writer.flush(timeout=0)
+
+def test_saved_description_is_written(writer, db):
+    writer.save(1, "SHORT_DESC", "Ign Coil", "ENGL")
+    assert writer.flush(timeout=5)
+
+    saved = db.get_saved_description(1, "SHORT_DESC", "ENGL")
+    assert saved["description_text"] == "Ign Coil"
+    assert writer.lookup(1, "SHORT_DESC", "ENGL") == "Ign Coil"
+    assert writer.stats() == {"queued": 0, "written": 1, "failed": 0}
+
+def test_lookup_sees_description_before_it_is_written(writer, db, monkeypatch):
+    release = threading.Event()
+    save_descriptions = db.save_descriptions
+    def blocked_save(rows):
+        release.wait(5)
+        save_descriptions(rows)
+    monkeypatch.setattr(db, "save_descriptions", blocked_save)
+
+    writer.save(1, "SHORT_DESC", "Ign Coil", "ENGL")
+    assert writer.lookup(1, "SHORT_DESC", "ENGL") == "Ign Coil"
+    assert db.get_saved_description(1, "SHORT_DESC", "ENGL") is None
+    # Other keys still come from the table
+    assert writer.lookup(1, "SHORT_DESC", "ENGL", sequence=2) is None
+
+    release.set()
+    assert writer.flush(timeout=5)
+    assert writer._pending == {}
+    assert db.get_saved_description(1, "SHORT_DESC", "ENGL")["description_text"] == "Ign Coil"
+
+def test_latest_text_per_key_wins(writer, db):
+    writer.save(1, "SHORT_DESC", "First", "ENGL")
+    writer.save(1, "SHORT_DESC", "Second", "ENGL")
+    assert writer.flush(timeout=5)
+
+    assert writer.lookup(1, "SHORT_DESC", "ENGL") == "Second"
+    assert db.execute_query("SELECT COUNT(*) AS count FROM descriptions", fetch_all=False)["count"] == 1
+
+def test_rejected_row_does_not_stop_the_batch(writer, db):
+    db.execute_query("PRAGMA foreign_keys = ON")
+    writer.save(1, "SHORT_DESC", "Ign Coil", "ENGL")
+    # No part 99, the foreign key rejects it
+    writer.save(99, "SHORT_DESC", "Orphan", "ENGL")
+    writer.save(2, "SHORT_DESC", "O2 Snsr", "ENGL")
+    assert writer.flush(timeout=5)
+
+    assert writer.lookup(1, "SHORT_DESC", "ENGL") == "Ign Coil"
+    assert writer.lookup(2, "SHORT_DESC", "ENGL") == "O2 Snsr"
+    # A failed row isn't served from the buffer forever
+    assert writer.lookup(99, "SHORT_DESC", "ENGL") is None
+    assert writer.stats()["failed"] == 1
+
+def test_failed_write_clears_pending(writer, db, monkeypatch):
+    def broken_save(rows):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(db, "save_descriptions", broken_save)
+
+    writer.save(1, "SHORT_DESC", "Ign Coil", "ENGL")
+    assert writer.flush(timeout=5)
+
+    assert writer._pending == {}
+    assert writer.lookup(1, "SHORT_DESC", "ENGL") is None
+    assert writer.stats()["failed"] == 1
+    # The writer survives the error and saves the next description
+    monkeypatch.undo()
+    monkeypatch.setattr(description_writer_module, "db", db)
+    writer.save(2, "SHORT_DESC", "O2 Snsr", "ENGL")
+    assert writer.flush(timeout=5)
+    assert writer.lookup(2, "SHORT_DESC", "ENGL") == "O2 Snsr"
+
+def test_flush_times_out_on_stuck_database(writer, db, monkeypatch):
+    release = threading.Event()
+    save_descriptions = db.save_descriptions
+    def stuck_save(rows):
+        release.wait(5)
+        save_descriptions(rows)
+    monkeypatch.setattr(db, "save_descriptions", stuck_save)
+
+    writer.save(1, "SHORT_DESC", "Ign Coil", "ENGL")
+    assert not writer.flush(timeout=0.05)
+    release.set()
+    assert writer.flush(timeout=5)
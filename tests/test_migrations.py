@@ -0,0 +1,93 @@
+import sqlite3
+
+import pytest
+
+from classes.db.initalize_database import InitializeDatabase
+
+# Schema of a database created before the migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE parts (
+    id INTEGER PRIMARY KEY,
+    part_number VARCHAR(50) NOT NULL,
+    product_category VARCHAR(100) NOT NULL,
+    brand VARCHAR(100) NOT NULL,
+    part_type VARCHAR(100),
+    engine_application TEXT,
+    material VARCHAR(100),
+    fitment TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (part_number)
+);
+INSERT INTO parts (part_number, product_category, brand, part_type, engine_application, material, fitment) VALUES
+('IC-5501', 'Ignition Coil', 'SparkMaster', 'Pencil Coil', 'V6, 3.5L, 2010-2018 Toyota Camry', 'Copper', 'Direct fit for Toyota Camry'),
+('OS-3302', 'Oxygen Sensor', 'SensorTech', 'Heated O2 Sensor', '2.4L, 2012-2018 Honda Accord', 'Ceramic', 'Downstream');
+"""
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "pies.db"))
+    conn.executescript(BASELINE_SCHEMA)
+    yield conn
+    conn.close()
+
+@pytest.fixture
+def initializer():
+    return InitializeDatabase()
+
+def objects(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+def test_migrations_are_numbered_in_order(initializer):
+    versions = [version for version, _ in initializer.get_migrations()]
+    assert versions
+    assert versions == sorted(versions)
+    assert len(versions) == len(set(versions))
+
+def test_baseline_database_is_migrated_to_latest(conn, initializer):
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+
+    initializer.apply_migrations(conn)
+
+    latest = initializer.get_migrations()[-1][0]
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == latest
+    assert {"generation_logs", "parts_fts"} <= objects(conn, "table")
+    assert {"idx_parts_category", "idx_parts_brand"} <= objects(conn, "index")
+
+def test_existing_parts_are_indexed(conn, initializer):
+    initializer.apply_migrations(conn)
+
+    rows = conn.execute("SELECT rowid FROM parts_fts WHERE parts_fts MATCH 'camry'").fetchall()
+    assert rows == [(1,)]
+
+    # The triggers keep the index in sync with later writes
+    conn.execute("INSERT INTO parts (part_number, product_category, brand) VALUES ('FP-7701', 'Fuel Pump', 'FlowPro')")
+    conn.execute("UPDATE parts SET brand = 'SensorWorks' WHERE id = 2")
+    conn.execute("DELETE FROM parts WHERE id = 1")
+    assert conn.execute("SELECT rowid FROM parts_fts WHERE parts_fts MATCH 'flowpro'").fetchall() == [(3,)]
+    assert conn.execute("SELECT rowid FROM parts_fts WHERE parts_fts MATCH 'sensorworks'").fetchall() == [(2,)]
+    assert conn.execute("SELECT rowid FROM parts_fts WHERE parts_fts MATCH 'sensortech'").fetchall() == []
+    assert conn.execute("SELECT rowid FROM parts_fts WHERE parts_fts MATCH 'camry'").fetchall() == []
+
+def test_migrations_run_once(conn, initializer):
+    initializer.apply_migrations(conn)
+    initializer.apply_migrations(conn)
+
+    # The FTS rank row and index entries would be duplicated by a second run
+    assert conn.execute("SELECT COUNT(*) FROM parts_fts WHERE parts_fts MATCH 'camry'").fetchone()[0] == 1
+
+def test_new_database_is_created_at_latest_version(tmp_path, initializer):
+    initializer.DB_DIR = str(tmp_path)
+    initializer.DB_PATH = str(tmp_path / "pies.db")
+    initializer.create_database()
+
+    conn = sqlite3.connect(initializer.DB_PATH)
+    try:
+        latest = initializer.get_migrations()[-1][0]
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == latest
+        assert "parts_fts" in objects(conn, "table")
+        # Opening it again has nothing left to migrate
+        initializer.apply_migrations(conn)
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == latest
+    finally:
+        conn.close()
@@ -0,0 +1,76 @@
+import pytest
+
+from classes.utils.pies_length_fitter import PIES_Length_Fitter
+
+@pytest.fixture
+def fitter(monkeypatch):
+    monkeypatch.delenv("PIES_FIT_MIN_KEEP_RATIO", raising=False)
+    return PIES_Length_Fitter()
+
+def test_text_within_limit_is_unchanged(fitter):
+    result = fitter.fit("Ignition Coil", 20)
+    assert result == {"text": "Ignition Coil", "fitted": True, "method": "unchanged", "steps": []}
+
+def test_none_text_is_not_fitted(fitter):
+    result = fitter.fit(None, 20)
+    assert result["text"] is None
+    assert not result["fitted"]
+
+def test_abbreviations_fit_text(fitter):
+    result = fitter.fit("Front Brake Caliper Assembly", 20)
+    assert result["fitted"]
+    assert result["method"] == "rules"
+    # Abbreviating stops as soon as the text fits
+    assert result["text"] == "Frt Brake Clpr Assy"
+    assert "abbreviate" in result["steps"]
+
+def test_longest_phrase_is_abbreviated_first(fitter):
+    assert fitter.abbreviate("Left Hand Mirror") == "LH Mirr"
+    assert fitter.abbreviate("Stainless Steel Exhaust") == "SS Exh"
+
+def test_left_and_right_only_abbreviated_next_to_a_position(fitter):
+    assert fitter.abbreviate("Right Front Hub") == "RH Frt Hub"
+    assert fitter.abbreviate("Rear Left Door") == "Rr LH Door"
+    assert fitter.abbreviate("Right Angle Adapter") == "Right Angle Adapter"
+
+def test_stop_words_are_dropped(fitter):
+    result = fitter.fit("Kit for the Pickup and the Van", 24)
+    assert result["fitted"]
+    assert "drop_stop_words" in result["steps"]
+    assert result["text"].startswith("Kit")
+    assert len(result["text"]) <= 24
+
+def test_rules_never_trim_by_default(fitter):
+    text = "Direct fit replacement unit with exceptional durability and longevity guaranteed"
+    result = fitter.fit(text, 60)
+    assert not result["fitted"]
+    assert result["method"] == "none"
+    assert "trim" not in result["steps"]
+    assert len(result["text"]) > 60
+
+def test_allow_trim_cuts_at_word_boundary(fitter):
+    text = "Direct fit unit with exceptional durability and longevity guaranteed by years"
+    result = fitter.fit(text, 60, allow_trim=True)
+    assert result["fitted"]
+    assert result["method"] == "trim"
+    assert len(result["text"]) <= 60
+    assert text.startswith(result["text"])
+    # No dangling joining word at the end
+    assert result["text"].split(" ")[-1].lower() not in ("and", "with")
+
+def test_allow_trim_refuses_to_lose_most_of_the_text(fitter):
+    text = "Direct fit replacement unit with exceptional durability and longevity guaranteed"
+    result = fitter.fit(text, 20, allow_trim=True)
+    assert not result["fitted"]
+    assert result["method"] == "none"
+
+def test_other_languages_are_only_compacted(fitter):
+    text = "Pinza de freno delantera   para camioneta"
+    result = fitter.fit(text, 30, language_code="SPAN", allow_trim=True)
+    assert not result["fitted"]
+    assert result["text"] == "Pinza de freno delantera para camioneta"
+    assert result["steps"] == ["compact"]
+
+    result = fitter.fit(text, 40, language_code="SPAN")
+    assert result["fitted"]
+    assert result["method"] == "rules"
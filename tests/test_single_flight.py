@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+
+from classes.ai_engines.single_flight import Single_Flight
+
+class Tracked_Source:
+    """Generator stand-in that counts how often it was created and whether it was closed"""
+    def __init__(self, fragments, error=None):
+        self.fragments = iter(fragments)
+        self.error = error
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.fragments)
+        except StopIteration:
+            if self.error is not None:
+                raise self.error
+            raise
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def flight(monkeypatch):
+    monkeypatch.setenv("LLM_SINGLE_FLIGHT", "true")
+    return Single_Flight()
+
+def test_single_subscriber_gets_every_fragment(flight):
+    sources = []
+    def factory():
+        sources.append(Tracked_Source(["a", "b", "c"]))
+        return sources[-1]
+
+    assert list(flight.stream("key", factory)) == ["a", "b", "c"]
+    assert len(sources) == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 0, "in_flight": 0}
+
+def test_concurrent_subscribers_share_one_source(flight):
+    sources = []
+    def factory():
+        sources.append(Tracked_Source(["a", "b", "c"]))
+        return sources[-1]
+
+    first = flight.stream("key", factory)
+    second = flight.stream("key", factory)
+    assert next(first) == "a"
+    # The second subscriber joins late and still gets the stream from the start
+    assert list(second) == ["a", "b", "c"]
+    assert list(first) == ["b", "c"]
+    assert len(sources) == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 1, "in_flight": 0}
+
+def test_stream_continues_when_first_subscriber_leaves(flight):
+    source = Tracked_Source(["a", "b", "c"])
+    first = flight.stream("key", lambda: source)
+    second = flight.stream("key", lambda: Tracked_Source(["x"]))
+    assert next(first) == "a"
+    assert next(second) == "a"
+
+    first.close()
+    assert not source.closed
+    assert list(second) == ["b", "c"]
+
+def test_last_subscriber_leaving_closes_source(flight):
+    source = Tracked_Source(["a", "b", "c"])
+    stream = flight.stream("key", lambda: source)
+    assert next(stream) == "a"
+
+    stream.close()
+    assert source.closed
+    assert flight.stats()["in_flight"] == 0
+
+def test_error_is_raised_to_every_subscriber(flight):
+    source = Tracked_Source(["a"], error=ConnectionError("reset"))
+    first = flight.stream("key", lambda: source)
+    second = flight.stream("key", lambda: source)
+    assert next(first) == "a"
+    assert next(second) == "a"
+
+    with pytest.raises(ConnectionError):
+        next(first)
+    with pytest.raises(ConnectionError):
+        next(second)
+    assert flight.stats()["in_flight"] == 0
+
+def test_finished_stream_is_not_reused(flight):
+    calls = []
+    def factory():
+        calls.append(1)
+        return Tracked_Source(["a"])
+
+    assert list(flight.stream("key", factory)) == ["a"]
+    assert list(flight.stream("key", factory)) == ["a"]
+    assert len(calls) == 2
+
+def test_disabled_or_keyless_streams_are_not_shared(monkeypatch):
+    monkeypatch.setenv("LLM_SINGLE_FLIGHT", "false")
+    flight = Single_Flight()
+    calls = []
+    def factory():
+        calls.append(1)
+        return Tracked_Source(["a"])
+
+    first = flight.stream("key", factory)
+    second = flight.stream("key", factory)
+    assert next(first) == "a" and next(second) == "a"
+    assert len(calls) == 2
+
+    enabled = Single_Flight()
+    enabled.ENABLED = True
+    assert list(enabled.stream(None, factory)) == ["a"]
+    assert enabled.stats()["leaders"] == 0
+
+def test_threads_receive_identical_fragments(flight):
+    release = threading.Event()
+    created = []
+    def slow_source():
+        release.wait(5)
+        yield from ["one", "two", "three"]
+    def factory():
+        created.append(1)
+        return slow_source()
+
+    results = [None] * 4
+    def subscriber(index):
+        results[index] = list(flight.stream("key", factory))
+
+    threads = [threading.Thread(target=subscriber, args=(index,)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    # All subscribers are waiting for the first fragment before the source produces any
+    while flight.stats()["leaders"] + flight.stats()["coalesced"] < 4:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [["one", "two", "three"]] * 4
+    assert len(created) == 1